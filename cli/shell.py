@@ -21,6 +21,8 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from engine.lexer import db_manager, Lexer
 from engine.parser import Parser
 from exec.exec import execute
+from exec.planner import AdaptiveIndexing
+from sql_types.temporal import decode_temporal
 
 
 
@@ -84,6 +86,7 @@ class Config:
         self.auto_detect_wide = False   # Default to false - user must explicitly enable
         self.wide_table_threshold = 10  # columns threshold
         self.display_mode = 'auto'  # 'auto', 'force_normal', 'force_wide'
+        self.adaptive_indexing = False  # Range filters crack unindexed columns (database cracking)
         
         # Load config from file if exists
         self.config_file = Path.home() / '.myshell_config.json'
@@ -120,7 +123,8 @@ class Config:
                 'reload_on_error': self.reload_on_error,
                 'auto_detect_wide': self.auto_detect_wide,
                 'wide_table_threshold': self.wide_table_threshold,
-                'display_mode': self.display_mode
+                'display_mode': self.display_mode,
+                'adaptive_indexing': self.adaptive_indexing
             }
             with open(self.config_file, 'w') as f:
                 json.dump(config_data, f, indent=2)
@@ -151,15 +155,17 @@ class SQLCompleter(Completer):
             # DML
             'SELECT', 'FROM', 'WHERE', 'INSERT', 'INTO', 'VALUES', 'UPDATE', 'SET', 'DELETE',
             # DDL
-            'CREATE', 'DROP', 'ALTER', 'TABLE', 'DATABASE', 'INDEX', 'VIEW', 'TRIGGER',
+            'CREATE', 'DROP', 'ALTER', 'TABLE', 'DATABASE', 'INDEX', 'USING', 'BITMAP', 'TRIGRAM', 'FULLTEXT', 'BLOOM', 'VIEW', 'TRIGGER',
+            'CLUSTER', 'CLUSTERED', 'PARTITION', 'PARTITIONS',
             # Constraints
             'PRIMARY', 'KEY', 'UNIQUE', 'NOT', 'NULL', 'DEFAULT',
-            'CHECK', 'CONSTRAINT',
+            'CHECK', 'CONSTRAINT', 'GENERATED', 'ALWAYS', 'STORED',
+            'FOREIGN', 'REFERENCES', 'DEFERRABLE', 'INITIALLY', 'DEFERRED',
             # Data Types
             'INT', 'INTEGER', 'VARCHAR', 'CHAR', 'TEXT',
             'DATE', 'TIME', 'TIMESTAMP', 'BOOLEAN', 'FLOAT', 'DOUBLE',
             # Operators and Functions
-            'AND', 'OR', 'IN', 'LIKE', 'BETWEEN', 'IS', 'EXISTS', 'CASE', 'WHEN', 'THEN',
+            'AND', 'OR', 'IN', 'LIKE', 'ILIKE', 'MATCH', 'BETWEEN', 'IS', 'EXISTS', 'CASE', 'WHEN', 'THEN',
             'ELSE', 'END', 'AS', 'DISTINCT',
             # Grouping and Ordering
             'ORDER', 'BY', 'GROUP', 'HAVING', 'ASC', 'DESC',
@@ -412,6 +418,7 @@ class EnhancedSQLShell:
     
     def __init__(self):
         self.config = Config()
+        AdaptiveIndexing.enabled = self.config.adaptive_indexing
         self.history = EnhancedHistoryManager(self.config)
         self.formatter = TableFormatter(self.config)
         self.query_count = 0
@@ -438,6 +445,8 @@ class EnhancedSQLShell:
             '\\ls': self._cmd_describe_tables,
             '\\d': self._cmd_list_databases,
             '\\dt': self._cmd_list_databases,
+            '\\dt+': self._cmd_describe_tables_memory,
+            '\\advise': self._cmd_advise,
             '\\c': self._cmd_connect,
             '\\connect': self._cmd_connect,
             '\\use': self._cmd_connect,
@@ -700,9 +709,9 @@ class EnhancedSQLShell:
                 self._handle_select_result(result, start_time)
             
             elif token_type == "SHOW":
-                from engine.sql_ast import ShowConstraints
+                from engine.sql_ast import ShowConstraints, ShowMemory
                 ast = parser.parse_request_statement()
-                if isinstance(ast, ShowConstraints):
+                if isinstance(ast, (ShowConstraints, ShowMemory)):
                     result = ast.evaluate()
                     self._handle_select_result(result, start_time)
                 else:
@@ -724,6 +733,11 @@ class EnhancedSQLShell:
                 result = execute(ast, db_manager)
                 self._handle_ddl_result("TRUNCATE TABLE", start_time)
                 db_manager.save_database_file()
+            elif token_type == "CLUSTER":
+                ast = parser.parse_cluster_table()
+                execute(ast, db_manager)
+                self._handle_ddl_result("CLUSTER", start_time)
+                db_manager.save_database_file()
             elif token_type == "CREATE":
                 if next_token_type == "DATABASE":
                     ast = parser.parse_create_database()
@@ -733,6 +747,11 @@ class EnhancedSQLShell:
                     execute(ast, db_manager)
                     db_manager.save_database_file()
                     self._handle_ddl_result("CREATE TABLE", start_time)
+                elif next_token_type == "INDEX" or lexer.tokens[1] == ("CONST", "UNIQUE"):
+                    ast = parser.parse_create_index()
+                    execute(ast, db_manager)
+                    db_manager.save_database_file()
+                    self._handle_ddl_result("CREATE INDEX", start_time)
                 elif next_token_type == "HIGH_PRIORITY_OPERATOR" or next_token_type == "VIEW" or next_token_type == "MATERIALIZED":
                     ast = parser.create_view()
                     result = execute(ast, db_manager)
@@ -754,6 +773,11 @@ class EnhancedSQLShell:
                     result = execute(ast, db_manager)
                     db_manager.save_database_file()
                     self._handle_ddl_result("DROP TABLE", start_time)
+                elif next_token_type == "INDEX":
+                    ast = parser.parse_drop_index()
+                    result = execute(ast, db_manager)
+                    db_manager.save_database_file()
+                    self._handle_ddl_result("DROP INDEX", start_time)
                 elif next_token_type == "VIEW":
                     ast = parser.parse_drop_view()
                     result = execute(ast, db_manager)
@@ -799,6 +823,11 @@ class EnhancedSQLShell:
         """Handle SELECT query results"""
         execution_time = time.time() - start_time
         
+        # DATE/TIME/TIMESTAMP cells travel as integer encodings; decode them for display and export
+        if result:
+            result = [{col: decode_temporal(val) for col, val in row.items()} if isinstance(row, dict) else row
+                      for row in result]
+        
         # Store the result
         self.config.last_result = result
         
@@ -872,6 +901,8 @@ Meta Commands:
   \\q, \\quit, \\exit      Quit the shell
   \\l, \\list              List tables in current database
   \\d, \\dt                List all databases
+  \\dt+                   List tables with estimated memory usage
+  \\advise                Suggest indexes for recent queries, flag unused ones
   \\c <db>, \\connect <db>  Connect to database
   \\clear, \\cls           Clear screen
   
@@ -906,6 +937,7 @@ Configuration Options:
   display_mode          'auto', 'force_normal', 'force_wide'
   auto_reload            Auto-reload modules on file changes
   reload_on_error        Auto-reload on execution errors
+  adaptive_indexing      Range filters crack unindexed columns (true/false)
 
 Multi-Query Support:
   • Separate multiple queries with semicolons (;)
@@ -1022,6 +1054,51 @@ Tips:
         except Exception as e:
             print(f"Failed to describe tables: {e}")
     
+    def _cmd_describe_tables_memory(self, args):
+        """List tables in current database with their estimated memory footprint"""
+        from storage.memory import table_memory, format_bytes
+        current_db = getattr(db_manager, 'active_db', None)
+        if not current_db:
+            print("No database selected")
+            print("Use \\c <database_name> to connect to a database")
+            return
+        
+        print("Tables in current database:\n")
+        
+        tables_info = []
+        for table_name, table_obj in current_db.items():
+            report = table_memory(table_obj)
+            row_count = report['rows']
+            largest = max(report['columns'].items(), key=lambda item: item[1]['bytes'], default=None)
+            tables_info.append({
+                'Table': table_name,
+                'Rows': f"{row_count:,}",
+                'Columns': str(len(report['columns'])),
+                'Size': format_bytes(report['total']),
+                'Per Row': format_bytes(report['total'] // row_count) if row_count else '-',
+                'Cache': format_bytes(report['cache']),
+                'Indexes': format_bytes(report['indexes']),
+                'Largest Column': f"{largest[0]} ({format_bytes(largest[1]['bytes'])})" if largest else '-'
+            })
+        
+        if tables_info:
+            formatted_table = self.formatter.format_table(
+                tables_info, ['Table', 'Rows', 'Columns', 'Size', 'Per Row', 'Cache', 'Indexes', 'Largest Column'])
+            print(formatted_table)
+            print("\nUse SHOW MEMORY <table> for a per-column breakdown")
+        else:
+            print("No tables found in current database")
+    
+    def _cmd_advise(self, args):
+        """Index advice for the recent statements (SELECT * FROM pysql_index_advice)"""
+        from exec.advisor import ADVICE_TABLE
+        if not getattr(db_manager, 'active_db', None):
+            print("No database selected")
+            print("Use \\c <database_name> to connect to a database")
+            return
+        self._execute_query(f"SELECT * FROM {ADVICE_TABLE};")
+        print("\nAdvice is drawn from the statements run in this session")
+
     def _cmd_connect(self, args):
         """Connect to a database"""
         if not args:
@@ -1251,6 +1328,7 @@ Tips:
             print("  display_mode            'auto', 'force_normal', 'force_wide'")
             print("  auto_reload             Auto-reload modules on file changes")
             print("  reload_on_error         Auto-reload on execution errors")
+            print("  adaptive_indexing       Range filters crack unindexed columns (true/false)")
             return
         
         option, value = args[0], args[1]
@@ -1283,6 +1361,11 @@ Tips:
                 self.config.reload_on_error = value.lower() == 'true'
                 status = "enabled" if self.config.reload_on_error else "disabled"
                 print(f"Reload on error {status}")
+            elif option == 'adaptive_indexing':
+                self.config.adaptive_indexing = value.lower() == 'true'
+                AdaptiveIndexing.enabled = self.config.adaptive_indexing
+                status = "enabled" if self.config.adaptive_indexing else "disabled"
+                print(f"Adaptive indexing {status}")
             else:
                 print(f"Unknown option: {option}")
                 return
@@ -1313,6 +1396,7 @@ Tips:
             print(f"display_mode = {getattr(self.config, 'display_mode', 'auto')}")
             print(f"auto_reload = {getattr(self.config, 'auto_reload', True)}")
             print(f"reload_on_error = {getattr(self.config, 'reload_on_error', False)}")
+            print(f"adaptive_indexing = {getattr(self.config, 'adaptive_indexing', False)}")
     
     def _cmd_show_history(self, args):
         """Show command history with enhanced display"""
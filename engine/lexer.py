@@ -25,6 +25,7 @@ class Lexer:
     nullif = NULLIF
     replace = REPLACE
     like = LIKE
+    match = MATCH
     order_by_keys = ORDER_BY_KEYS
     order_by_drc = ORDER_BY_DRC
     group_by_keys = GROUP_BY_KEYS
@@ -100,6 +101,9 @@ class Lexer:
                         if self.tokens[-1][1] == "PRIMARY":
                             self.tokens.pop()
                             self.tokens.append((TokenTypes.CONSTRAINT, TokenTypes.PRIMARY_KEY))
+                        elif self.tokens[-1][1] == "FOREIGN":
+                            self.tokens.pop()
+                            self.tokens.append((TokenTypes.CONSTRAINT, TokenTypes.FOREIGN_KEY))
                         else:
                             raise ValueError("Perhaps You miss PRIMARY key word")
                     else:
@@ -150,6 +154,9 @@ class Lexer:
                         self.tokens.append((TokenTypes.LIKE, TokenTypes.NOT))
                     self.tokens.append((TokenTypes.LIKE, upper_word))
                     
+                elif upper_word in Lexer.match:
+                    self.tokens.append((TokenTypes.MATCH, TokenTypes.MATCH))
+
                 elif upper_word in Lexer.group_by_keys:
                     self.tokens.append((TokenTypes.GROUP_BY, upper_word))
                     
@@ -170,6 +177,10 @@ class Lexer:
                         self.tokens.append((TokenTypes.ORDER_BY, upper_word))
                     elif self.tokens[-1][0] == TokenTypes.GROUP_BY:
                         self.tokens.append((TokenTypes.GROUP_BY, upper_word))
+                    elif self.tokens[-1][0] in (TokenTypes.CLUSTERED, TokenTypes.PARTITION) or (
+                            len(self.tokens) > 1 and self.tokens[-2][0] == TokenTypes.CLUSTER):
+                        # CREATE TABLE ... CLUSTERED BY (col) / PARTITION BY ... / CLUSTER table BY (col)
+                        self.tokens.append((TokenTypes.BY, upper_word))
                     else:
                         raise ValueError ("'BY' keyword Should be Followed by either GROUP or ORDER")
                     
@@ -261,6 +272,13 @@ class Lexer:
                 self.pos += 1
                 continue
 
+            # --- JSON path operators (-> and ->>) ---
+            if char == '-' and self.query.startswith('->', self.pos):
+                operator = '->>' if self.query.startswith('->>', self.pos) else '->'
+                self.tokens.append((TokenTypes.JSON_PATH, operator))
+                self.pos += len(operator)
+                continue
+
             # --- Operators ---
             if char in Lexer.comparison_operators:
                 LOW_PRIORITY_OPERATOR = self.get_operator()
@@ -294,7 +312,7 @@ class Lexer:
     def getFullInput(self):
         key = ""
         while self.pos < len(self.query) and (self.query[self.pos].isalnum() or self.query[self.pos] in Lexer.special_characters) :
-            if self.query[self.pos] == '.':
+            if self.query[self.pos] == '.' or self.query.startswith('->', self.pos):
                 break
             key += self.query[self.pos]
             self.pos += 1
@@ -4,7 +4,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from engine.sql_ast import *
 from exec.exec import execute 
-from utilities import db_manager
+from utilities import db_manager, extract_identifiers
 
 from sql_types.sql_types import *
 from src.constants import *
@@ -132,7 +132,7 @@ class Parser:
                 alias_name = (self.eat(self.current_token()[0])[1]).lower()
                 self._select_aliases[alias_name] = expr
                 # Attach alias to expr
-                if isinstance(expr, (ColumnExpression, BinaryOperation, Function, MathFunction, StringFunction, Replace, Concat, Cast, CoalesceFunction, Extract, CurrentDate, DateDIFF, CaseWhen, LiteralExpression)):
+                if isinstance(expr, (ColumnExpression, BinaryOperation, Function, MathFunction, StringFunction, Replace, Concat, Cast, CoalesceFunction, Extract, CurrentDate, DateDIFF, CaseWhen, LiteralExpression, JsonExtract, Match)):
                     expr.alias = alias_name
             if self._contains_aggregates(expr):
                 function_columns.append(expr)
@@ -250,10 +250,16 @@ class Parser:
         if self.current_token() and self.current_token()[0] == TokenTypes.VIEWS:
             self.parse_list_viws()
             self.eat(TokenTypes.SEMICOLON)
+        elif self.current_token() and str(self.current_token()[1]).upper() == TokenTypes.MEMORY:
+            self.eat(TokenTypes.IDENTIFIER)
+            table_name = None
+            if self.current_token() and self.current_token()[0] == TokenTypes.IDENTIFIER:
+                table_name = self.eat(TokenTypes.IDENTIFIER)[1]
+            return ShowMemory(table_name)
         else:
             col = None
             if self.current_token()[1] != TokenTypes.CONSTRAINTS:
-                raise ValueError("SHOW Must be followed by CONSTRAINTS")
+                raise ValueError("SHOW Must be followed by CONSTRAINTS or MEMORY")
             self.eat(TokenTypes.IDENTIFIER)
             if self.current_token()[0] == TokenTypes.NAMES:
                 self.eat(TokenTypes.NAMES)
@@ -286,14 +292,12 @@ class Parser:
         self.eat(TokenTypes.INTO)
         table = self.parse_insert_table()
         insertion_data = self.parse_insert_cols_vals()
-        if self.current_token() and self.current_token()[0] == TokenTypes.CONFLICT:
-            self.eat(TokenTypes.CONFLICT) # On
+        if self.current_token() and self.current_token()[0] in (TokenTypes.CONFLICT, TokenTypes.ON):
+            self.eat(self.current_token()[0]) # On (lexed as a plain keyword)
             self.eat(TokenTypes.CONFLICT) # Conflict
             conflict = True # set Conflict to be True
             if self.current_token() and self.current_token()[0] == TokenTypes.OPEN_PAREN:
-                self.eat(TokenTypes.OPEN_PAREN)
-                conflict_targets = self.eat(TokenTypes.IDENTIFIER)[1]
-                self.eat(TokenTypes.CLOSE_PAREN)
+                conflict_targets = ", ".join(self.parse_column_list())
             self.eat(TokenTypes.CONFLICT)
             action = self.eat(TokenTypes.ACTION)[1]
             if action == TokenTypes.UPDATE:
@@ -482,10 +486,31 @@ class Parser:
         restrictions = {}
         private_constraints = {}
         constraints_ptr = {}
+        generated = {}
+        unique_keys = []
+        references = {}
         
         is_serial = False
         is_default = False
         while self.current_token() and self.current_token()[0] != TokenTypes.CLOSE_PAREN:
+            # Table-level UNIQUE (col, col, ...)
+            if self.current_token() == (TokenTypes.CONSTRAINT, TokenTypes.UNIQUE):
+                self.eat(TokenTypes.CONSTRAINT)
+                unique_keys.append(self.parse_column_list())
+                if self.current_token() and self.current_token()[0] == TokenTypes.COMMA:
+                    self.eat(TokenTypes.COMMA)
+                continue
+            # Table-level FOREIGN KEY (col) REFERENCES parent (col)
+            if self.current_token() == (TokenTypes.CONSTRAINT, TokenTypes.FOREIGN_KEY):
+                self.eat(TokenTypes.CONSTRAINT)
+                columns = self.parse_column_list()
+                if len(columns) != 1:
+                    raise ValueError("A FOREIGN KEY can only be on a single column")
+                self.add_reference(table_name, columns[0], self.parse_references(), references,
+                                   private_constraints, constraints_ptr)
+                if self.current_token() and self.current_token()[0] == TokenTypes.COMMA:
+                    self.eat(TokenTypes.COMMA)
+                continue
             # Column name
             col_name = self.eat(TokenTypes.IDENTIFIER)[1]
             # Column type
@@ -529,7 +554,18 @@ class Parser:
                             defaults[col_name] = schema[col_name](default_value)
                 else:
                     is_default = False
-                if self.current_token() and self.current_token()[0] == TokenTypes.CONSTRAINT:
+                if self.current_token() and self.current_token()[0] == TokenTypes.GENERATED:
+                    if is_serial or col_name in defaults:
+                        raise ValueError(f"Generated column '{col_name}' cannot be SERIAL or have a DEFAULT value")
+                    self.eat(TokenTypes.GENERATED)
+                    self.eat(TokenTypes.ALWAYS)
+                    self.eat(TokenTypes.AS)
+                    self.eat(TokenTypes.OPEN_PAREN)
+                    generated[col_name] = self.parse_expression(context=None)
+                    self.eat(TokenTypes.CLOSE_PAREN)
+                    self.eat(TokenTypes.STORED)
+                    
+                elif self.current_token() and self.current_token()[0] == TokenTypes.CONSTRAINT:
                     contr = self.eat(TokenTypes.CONSTRAINT)[1]
                     if contr == TokenTypes.NOT_NULL and is_default:
                         raise ValueError("if a Column has DEFAULT VALUE it cannot inheritance  NOT NULL constraints")
@@ -558,6 +594,9 @@ class Parser:
                     private_constraints[col_name].add(key)
                     constraints_ptr[key] = TokenTypes.CHECK
                     
+                elif self.current_token() and self.current_token()[0] == TokenTypes.REFERENCES:
+                    self.add_reference(table_name, col_name, self.parse_references(), references,
+                                       private_constraints, constraints_ptr)
                     
                 # Skip comma if present
                 elif self.current_token() and self.current_token()[0] == TokenTypes.COMMA:
@@ -567,10 +606,140 @@ class Parser:
                     break
 
         self.eat(TokenTypes.CLOSE_PAREN)  # )
+        cluster_key = None
+        if self.current_token() and self.current_token()[0] == TokenTypes.CLUSTERED:
+            # CLUSTERED BY (col): rows are kept sorted by col
+            self.eat(TokenTypes.CLUSTERED)
+            cluster_key = self.parse_cluster_key()
+            if cluster_key not in schema:
+                raise ColumnNotFoundError(cluster_key, table_name)
+        partitioning = None
+        if self.current_token() and self.current_token()[0] == TokenTypes.PARTITION:
+            partitioning = self.parse_partitioning()
+            if partitioning[1] not in schema:
+                raise ColumnNotFoundError(partitioning[1], table_name)
         self.eat(TokenTypes.SEMICOLON)
-    
-        return CreateTableStatement(table_name, schema, defaults, auto, constraints, restrictions, private_constraints, constraints_ptr)
         
+        for col_name, expr in generated.items():
+            if self._contains_aggregates(expr):
+                raise ValueError(f"Aggregate functions are not allowed in generated column '{col_name}'")
+            for ref in extract_identifiers(expr):
+                if ref not in schema:
+                    raise ColumnNotFoundError(ref, table_name)
+                if ref in generated:
+                    raise ValueError(f"Generated column '{col_name}' cannot reference generated column '{ref}'")
+        for columns in unique_keys:
+            for col_name in columns:
+                if col_name not in schema:
+                    raise ColumnNotFoundError(col_name, table_name)
+        for col_name in references:
+            if col_name not in schema:
+                raise ColumnNotFoundError(col_name, table_name)
+    
+        return CreateTableStatement(table_name, schema, defaults, auto, constraints, restrictions, private_constraints, constraints_ptr, generated, unique_keys, cluster_key, references, partitioning)
+        
+    def parse_references(self):
+        """
+        REFERENCES parent [(col)] [DEFERRABLE [INITIALLY DEFERRED]]:
+        (parent, col or None for its primary key, deferred)
+        """
+        self.eat(TokenTypes.REFERENCES)
+        parent = self.eat(TokenTypes.IDENTIFIER)[1]
+        parent_column = None
+        if self.current_token() and self.current_token()[0] == TokenTypes.OPEN_PAREN:
+            columns = self.parse_column_list()
+            if len(columns) != 1:
+                raise ValueError("A FOREIGN KEY can only reference a single column")
+            parent_column = columns[0]
+        deferred = False
+        if self.current_token() and self.current_token()[0] == TokenTypes.DEFERRABLE:
+            # Checked once at the end of each statement instead of row by row
+            self.eat(TokenTypes.DEFERRABLE)
+            deferred = True
+            if self.current_token() and self.current_token()[0] == TokenTypes.INITIALLY:
+                self.eat(TokenTypes.INITIALLY)
+                self.eat(TokenTypes.DEFERRED)
+        return parent, parent_column, deferred
+
+    def add_reference(self, table_name, col_name, reference, references, private_constraints, constraints_ptr):
+        if col_name in references:
+            raise ValueError(f"Column '{col_name}' already has a FOREIGN KEY constraint")
+        references[col_name] = reference
+        key = f"{table_name}_{col_name}_fkey"
+        if col_name not in private_constraints:
+            private_constraints[col_name] = set()
+        private_constraints[col_name].add(key)
+        constraints_ptr[key] = TokenTypes.FOREIGN_KEY
+
+    def parse_column_list(self):
+        """( col [, col ...] )"""
+        columns = []
+        self.eat(TokenTypes.OPEN_PAREN)
+        while True:
+            columns.append(self.eat(TokenTypes.IDENTIFIER)[1])
+            if self.current_token() and self.current_token()[0] == TokenTypes.COMMA:
+                self.eat(TokenTypes.COMMA)
+            else:
+                break
+        self.eat(TokenTypes.CLOSE_PAREN)
+        return columns
+    
+    def parse_create_index(self):
+        unique = False
+        self.eat(TokenTypes.CREATE)
+        if self.current_token() and self.current_token() == (TokenTypes.CONSTRAINT, TokenTypes.UNIQUE):
+            self.eat(TokenTypes.CONSTRAINT)
+            unique = True
+        self.eat(TokenTypes.INDEX)
+        index_name = self.eat(TokenTypes.IDENTIFIER)[1]
+        self.eat(TokenTypes.ON)
+        table_name = self.eat(TokenTypes.IDENTIFIER)[1]
+        method = "BTREE"
+        if self.current_token() and str(self.current_token()[1]).upper() == TokenTypes.USING:
+            self.eat(self.current_token()[0])
+            method = str(self.eat(TokenTypes.IDENTIFIER)[1]).upper()
+            if method not in ("BTREE", "BITMAP", "TRIGRAM", "FULLTEXT", "BLOOM"):
+                raise ValueError(f"Unknown index method '{method}'. Supported methods: BTREE, BITMAP, TRIGRAM, FULLTEXT, BLOOM")
+        columns, expressions = self.parse_index_keys()
+        predicate = None
+        if self.current_token() and self.current_token()[0] == TokenTypes.WHERE:
+            self.eat(TokenTypes.WHERE)
+            predicate = self.parse_expression(context=TokenTypes.WHERE)
+        return CreateIndexStatement(index_name, table_name, columns, unique, method, predicate, expressions)
+
+    def parse_index_keys(self):
+        """
+        Key list of CREATE INDEX: column names, or expressions such as
+        LOWER(email), which are labelled with their source text.
+        Returns (names or labels, expressions or None in parallel).
+        """
+        columns = []
+        expressions = []
+        self.eat(TokenTypes.OPEN_PAREN)
+        while True:
+            start = self.pos
+            expression = self.parse_addition(None)
+            if isinstance(expression, ColumnExpression):
+                columns.append(expression.column_name)
+                expressions.append(None)
+            else:
+                columns.append(self.source_text(start, self.pos))
+                expressions.append(expression)
+            if self.current_token() and self.current_token()[0] == TokenTypes.COMMA:
+                self.eat(TokenTypes.COMMA)
+            else:
+                break
+        self.eat(TokenTypes.CLOSE_PAREN)
+        return columns, expressions
+
+    def source_text(self, start, end):
+        """Approximate SQL text of tokens[start:end]"""
+        words = [f"'{value}'" if kind == "STRING" else str(value) for kind, value in self.tokens[start:end]]
+        text = " ".join(words)
+        for spaced, tight in (("( ", "("), (" )", ")"), (" (", "("), (" ,", ",")):
+            text = text.replace(spaced, tight)
+        return text
+    
     def create_view(self):
         can_be_replaced = False
         self.eat(TokenTypes.CREATE)
@@ -669,6 +838,12 @@ class Parser:
         table_name = self.eat(TokenTypes.IDENTIFIER)[1]
         return DropTable(table_name=table_name)
     
+    def parse_drop_index(self):
+        self.eat(TokenTypes.DROP)
+        self.eat(TokenTypes.INDEX)
+        index_name = self.eat(TokenTypes.IDENTIFIER)[1]
+        return DropIndex(index_name)
+    
     def parse_drop_view(self):
         self.eat(TokenTypes.DROP)
         self.eat(TokenTypes.VIEW)
@@ -688,6 +863,74 @@ class Parser:
         table_name = self.eat(TokenTypes.IDENTIFIER)[1]
         return TruncateTable(table_name)
     
+    def parse_cluster_table(self):
+        """CLUSTER table BY (col)"""
+        self.eat(TokenTypes.CLUSTER)
+        table_name = self.eat(TokenTypes.IDENTIFIER)[1]
+        column = self.parse_cluster_key()
+        if self.current_token() and self.current_token()[0] == TokenTypes.SEMICOLON:
+            self.eat(TokenTypes.SEMICOLON)
+        return ClusterTable(table_name, column)
+
+    def parse_cluster_key(self):
+        """BY (col): the single column a table is clustered by"""
+        self.eat(TokenTypes.BY)
+        columns = self.parse_column_list()
+        if len(columns) != 1:
+            raise ValueError("A table can only be clustered by a single column")
+        return columns[0]
+    
+    def parse_partitioning(self):
+        """
+        PARTITION BY RANGE (col) (PARTITION name VALUES LESS THAN (value), ...)
+        or PARTITION BY HASH (col) PARTITIONS n: (kind, col, definitions) as
+        Table.partition_by() takes them
+        """
+        self.eat(TokenTypes.PARTITION)
+        self.eat(TokenTypes.BY)
+        kind = str(self.eat(TokenTypes.IDENTIFIER)[1]).upper()
+        if kind not in ("RANGE", "HASH"):
+            raise ValueError(f"Unknown partitioning '{kind}'. Supported: RANGE, HASH")
+        columns = self.parse_column_list()
+        if len(columns) != 1:
+            raise ValueError("A table can only be partitioned by a single column")
+        if kind == "HASH":
+            self.eat(TokenTypes.PARTITIONS)
+            count = self.eat(TokenTypes.NUMBER)[1]
+            if not isinstance(count, int) or count < 1:
+                raise ValueError("PARTITIONS takes a positive whole number")
+            return kind, columns[0], [f"p{number}" for number in range(count)]
+        self.eat(TokenTypes.OPEN_PAREN)
+        definitions = [self.parse_range_partition()]
+        while self.current_token() and self.current_token()[0] == TokenTypes.COMMA:
+            self.eat(TokenTypes.COMMA)
+            definitions.append(self.parse_range_partition())
+        self.eat(TokenTypes.CLOSE_PAREN)
+        return kind, columns[0], definitions
+
+    def parse_range_partition(self):
+        """PARTITION name VALUES LESS THAN (value | MAXVALUE): (name, value), value None for MAXVALUE"""
+        self.eat(TokenTypes.PARTITION)
+        name = self.eat(TokenTypes.IDENTIFIER)[1]
+        self.eat(TokenTypes.VALUES)
+        for word in ("LESS", "THAN"):
+            if str(self.eat(TokenTypes.IDENTIFIER)[1]).upper() != word:
+                raise ValueError(f"Expected VALUES LESS THAN (value) for partition '{name}'")
+        parenthesized = self.current_token() and self.current_token()[0] == TokenTypes.OPEN_PAREN
+        if parenthesized:
+            self.eat(TokenTypes.OPEN_PAREN)
+        token = self.current_token()
+        if token and token[0] == TokenTypes.IDENTIFIER and str(token[1]).upper() == "MAXVALUE":
+            value = None
+        elif token and token[0] in (TokenTypes.NUMBER, TokenTypes.STRING):
+            value = token[1]
+        else:
+            raise ValueError(f"VALUES LESS THAN of partition '{name}' takes a number, a string or MAXVALUE")
+        self.eat(token[0])
+        if parenthesized:
+            self.eat(TokenTypes.CLOSE_PAREN)
+        return name, value
+
     def parse_use_statement(self):
         self.eat(TokenTypes.USE)
         db_name = self.eat(TokenTypes.IDENTIFIER)[1]
@@ -699,6 +942,16 @@ class Parser:
         self.eat("CONSTRAINT")
         const_name = self.eat(self.current_token()[0])[1]
         return DropConstraintFromAlterTable(const_name=const_name)
+
+    def parse_drop_partition(self):
+        self.eat(TokenTypes.PARTITION)
+        return DropPartitionFromAlterTable(self.eat(TokenTypes.IDENTIFIER)[1])
+
+    def parse_add_partition(self):
+        """ADD PARTITION name VALUES LESS THAN (value | MAXVALUE)"""
+        name, value = self.parse_range_partition()
+        return AddPartitionFromAlterTable(name, value)
+
     def parse_drop_column(self):
         
         self.eat(TokenTypes.COLUMN)
@@ -783,9 +1036,9 @@ class Parser:
             if self.current_token()[1] == TokenTypes.NOT:
                 is_not = True
                 self.eat(TokenTypes.LIKE)
-            self.eat(TokenTypes.LIKE)
+            case_insensitive = self.eat(TokenTypes.LIKE)[1] == TokenTypes.ILIKE
             arg = LiteralExpression(self.eat("STRING")[1])
-            return LikeCondition(expression, arg, is_not)
+            return LikeCondition(expression, arg, is_not, case_insensitive)
         while self.current_token() and self.current_token()[0] == TokenTypes.NULLCHECK:
             is_null = True
             self.eat(TokenTypes.NULLCHECK)
@@ -833,15 +1086,16 @@ class Parser:
         while self.current_token() and self.current_token()[1] in ("=", "!=", ">", "<", ">=", "<="):
             operator = self.eat(self.current_token()[0])[1]
             right = self.parse_addition(context)
-            
+            # (a, b) > (x, y) compares row values element by element
+            comparison = RowComparison if isinstance(left, RowValue) or isinstance(right, RowValue) else ConditionExpr
             
             if context == TokenTypes.WHERE:
                 self.validate_no_aggregate_in_where(left)
-                left = ConditionExpr(left, operator, right, context=TokenTypes.WHERE)
+                left = comparison(left, operator, right, context=TokenTypes.WHERE)
             elif context == TokenTypes.HAVING:
-                left = ConditionExpr(left, operator, right, context = TokenTypes.HAVING)
+                left = comparison(left, operator, right, context = TokenTypes.HAVING)
             else:
-                left = ConditionExpr(left, operator, right, context = None)
+                left = comparison(left, operator, right, context = None)
         return left
 
 
@@ -881,12 +1135,20 @@ class Parser:
         if token[0] == TokenTypes.OPEN_PAREN:  # (
             self.eat(TokenTypes.OPEN_PAREN)
             expr = self.parse_expression(context)  # Recursively parse inside parentheses
+            if self.current_token() and self.current_token()[0] == TokenTypes.COMMA:
+                # Row value: (a, b, ...)
+                items = [expr]
+                while self.current_token() and self.current_token()[0] == TokenTypes.COMMA:
+                    self.eat(TokenTypes.COMMA)
+                    items.append(self.parse_expression(context))
+                self.eat(TokenTypes.CLOSE_PAREN)
+                return RowValue(items)
             self.eat(TokenTypes.CLOSE_PAREN)
-            return expr
+            return self.parse_json_path(expr)
         
         elif token[0] == TokenTypes.IDENTIFIER:
             self.eat(TokenTypes.IDENTIFIER)    
-            return ColumnExpression(token[1])
+            return self.parse_json_path(ColumnExpression(token[1]))
         
         elif token[0] == TokenTypes.MATH_FUNC:
             name = self.eat(TokenTypes.MATH_FUNC)[1]
@@ -924,6 +1186,15 @@ class Parser:
             self.eat(TokenTypes.CLOSE_PAREN)
             return Replace(expression, old, new)
         
+        elif token[0] == TokenTypes.MATCH:
+            self.eat(TokenTypes.MATCH)
+            self.eat(TokenTypes.OPEN_PAREN)
+            expression = self.parse_expression(context)
+            self.eat(TokenTypes.COMMA)
+            terms = self.parse_expression(context)
+            self.eat(TokenTypes.CLOSE_PAREN)
+            return Match(expression, terms)
+        
         elif token[0] == TokenTypes.CONCAT:
             self.eat(TokenTypes.CONCAT)
             expressions = []
@@ -1014,6 +1285,8 @@ class Parser:
                 return self.parse_drop_column()
             elif self.current_token()[0] == "CONSTRAINT":
                 return self.parse_drop_constraint()
+            elif self.current_token()[0] == TokenTypes.PARTITION:
+                return self.parse_drop_partition()
         
         elif token[0] == TokenTypes.ADD:
             
@@ -1022,6 +1295,8 @@ class Parser:
                 return self.parse_add_column()
             elif self.current_token()[0] == "CONSTRAINT":
                 return self.parse_add_constraint()
+            elif self.current_token()[0] == TokenTypes.PARTITION:
+                return self.parse_add_partition()
         
         elif token[0] == TokenTypes.CASE_WHEN:
             self.eat(TokenTypes.CASE_WHEN)
@@ -1048,7 +1323,7 @@ class Parser:
             self.eat(TokenTypes.DOT)
             table_name = self.eat(self.current_token()[0])[1]
             actual_table = self._pointers.get(table_alias, table_alias)
-            return QualifiedColumnExpression(actual_table, table_name)
+            return self.parse_json_path(QualifiedColumnExpression(actual_table, table_name))
                 
                 
         elif token[0] == TokenTypes.EXISTS:
@@ -1090,6 +1365,20 @@ class Parser:
             raise ValueError(f"Unexpected token in expression: {token}")
         
         
+    def parse_json_path(self, expr):
+        """Postfix -> / ->> steps; consecutive steps are folded into one JsonExtract path"""
+        while self.current_token() and self.current_token()[0] == TokenTypes.JSON_PATH:
+            operator = self.eat(TokenTypes.JSON_PATH)[1]
+            token = self.current_token()
+            if token is None or token[0] not in (TokenTypes.STRING, TokenTypes.NUMBER) or isinstance(token[1], float):
+                raise ValueError(f"{operator} must be followed by a key string or an array index")
+            key = self.eat(token[0])[1]
+            if isinstance(expr, JsonExtract) and not expr.as_text:
+                expr = JsonExtract(expr.expression, expr.path + (key,), as_text=(operator == '->>'))
+            else:
+                expr = JsonExtract(expr, (key,), as_text=(operator == '->>'))
+        return expr
+        
     def _contains_aggregates(self, expr):
         """Check if an expression contains aggregate functions"""
         if isinstance(expr, Function): 
@@ -5,9 +5,13 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from errors import * 
 from sql_types.sql_types import *
+from sql_types.temporal import extract_part, date_diff
 from storage.database import Table
+from storage.index import fulltext_words, query_terms, relevance
 from src.constants import *
+import math
 import re
+from collections import Counter
 def get_execute_function():
     from exec.exec import execute
     return execute
@@ -17,6 +21,28 @@ def get_db_manager():
     return db_manager
 
 
+class Statement:
+    """
+    The top-level statement exec.execute() is running, numbered. Subqueries
+    are not correlated (they never see the outer row), so their result holds
+    for the whole statement and is computed once per statement; see
+    once_per_statement().
+    """
+    number = 0
+    running = False
+
+
+def once_per_statement(owner, compute):
+    """compute(), remembered on owner until the current statement ends"""
+    cached = getattr(owner, '_statement_cache', None)
+    if cached is not None and Statement.running and cached[0] == Statement.number:
+        return cached[1]
+    value = compute()
+    if Statement.running:
+        owner._statement_cache = (Statement.number, value)
+    return value
+
+
 class SelectStatement:    
     __slots__ = ['columns', 'function_columns', 'table', 'where', 'distinct', 
                  'order_by', 'group_by', 'having', 'offset', 'limit']
@@ -109,7 +135,7 @@ class CreateDatabseStatement:
         self.database_name = database_name
         
 class CreateTableStatement:
-    def __init__(self, table_name, schema, defaults = None, auto = None, constraints = None, restrictions = None, private_constraints = None, constraints_ptr = None):
+    def __init__(self, table_name, schema, defaults = None, auto = None, constraints = None, restrictions = None, private_constraints = None, constraints_ptr = None, generated = None, unique_keys = None, cluster_key = None, references = None, partitioning = None):
         self.table_name = table_name
         self.schema = schema
         self.defaults = defaults
@@ -118,6 +144,21 @@ class CreateTableStatement:
         self.restrictions = restrictions
         self.private_constraints = private_constraints
         self.constraints_ptr = constraints_ptr
+        self.generated = generated
+        self.unique_keys = unique_keys or []
+        self.cluster_key = cluster_key
+        self.references = references or {}    # dict[col_name] = (parent table, parent column or None, deferred)
+        self.partitioning = partitioning       # (kind, column, definitions) as Table.partition_by() takes them
+
+class CreateIndexStatement:
+    def __init__(self, index_name, table_name, columns, unique = False, method = "BTREE", predicate = None, expressions = None):
+        self.index_name = index_name
+        self.table_name = table_name
+        self.columns = columns
+        self.unique = unique
+        self.method = method
+        self.predicate = predicate
+        self.expressions = expressions
 
 class UseStatement:
     def __init__(self, database_name):
@@ -166,12 +207,28 @@ class LiteralExpression(Expression):
         self.value = value
         self.alias = alias
         self.name = name
+        # Folded once here so case-insensitive comparisons don't lower the literal per row
+        self.folded = value.lower() if isinstance(value, str) else None
+        self._coerced_type = None
+        self._coerced_value = None
+
+    def __setstate__(self, state):
+        """Called after deserialization to reset the coercion cache"""
+        self.folded = self.value.lower() if isinstance(self.value, str) else None
+        self._coerced_type = None
+        self._coerced_value = None
     
     def evaluate(self, row, schema, expected_type = None):
         
         if expected_type is not None and issubclass(expected_type, SQLType):
-            converted_value = expected_type(self.value).value            
-            return converted_value
+            # CURRENT_DATE & co. must be re-read on every evaluation
+            if isinstance(self.value, str) and self.value in DATE_OBJECTS:
+                return expected_type(self.value).value
+            # Coerce once per target type instead of re-parsing the literal for every row
+            if self._coerced_type is not expected_type:
+                self._coerced_value = expected_type(self.value).value
+                self._coerced_type = expected_type
+            return self._coerced_value
         return self.value
     
     def get_referenced_columns(self):
@@ -256,14 +313,14 @@ class Function(Expression):
         if self.name == "COUNT":
             return len(values)
         elif self.name == "SUM":
-            if not all(isinstance(v, (int, float)) for v in values):
+            if not all(isinstance(v, (int, float)) and not isinstance(v, TemporalValue) for v in values):
                 raise ValueError("SUM works only with numeric values")
-            return sum(values)
+            return _exact_sum(values)
         elif self.name == "AVG":
-            if not all(isinstance(v, (int, float)) for v in values):
+            if not all(isinstance(v, (int, float)) and not isinstance(v, TemporalValue) for v in values):
                 raise ValueError("AVG works only with numeric values")
             
-            return sum(values) / len(values)
+            return _exact_sum(values) / len(values)
         elif self.name == "MAX":
             return max(values)
         elif self.name == "MIN":
@@ -271,6 +328,13 @@ class Function(Expression):
         else:
             raise ValueError(f"Unknown function: {self.name}")
 
+def _exact_sum(values):
+    """sum() of numbers, floats summed exactly and rounded once (as a table's running totals give it)"""
+    if any(isinstance(value, float) for value in values):
+        return math.fsum(values)
+    return sum(values)
+
+
 class GroupBy(Expression):
     def __init__(self, expressions):
         self.expressions = expressions
@@ -311,10 +375,10 @@ class ConditionExpr(Expression):
             else:
                 return False
         
-        # Convert string comparisons to lowercase for case-insensitive comparison
+        # Case-insensitive string comparison on the folded values
         if isinstance(right, str) and isinstance(left, str):
-            left = left.lower()
-            right = right.lower()
+            left = self._folded(self.left, left, row_or_rows)
+            right = self._folded(self.right, right, row_or_rows)
         
         # Apply operator
         if self.operator == '=': 
@@ -338,6 +402,18 @@ class ConditionExpr(Expression):
         
         return result
     
+    @staticmethod
+    def _folded(expr, value, row):
+        """Lower-cased ``value``, taken from the literal or the cell's cached shadow when possible"""
+        if isinstance(expr, LiteralExpression):
+            if value is expr.value and expr.folded is not None:
+                return expr.folded
+        elif isinstance(expr, ColumnExpression) and isinstance(row, dict):
+            cell = row.get(expr.column_name)
+            if isinstance(cell, StringType) and cell.value is value:
+                return cell.folded
+        return value.lower()
+    
     def _evaluate_having_expr(self, expr, group_rows, schema):
         
         
@@ -375,23 +451,8 @@ class ConditionExpr(Expression):
             
             if inner_value is None:
                 return None
-                
-            from datetime import date, time
-            if not isinstance(inner_value, (date, time)):
-                raise ValueError("EXTRACT Function works Only with DATE & TIME columns")
             
-            if expr.part == 'YEAR':
-                return inner_value.year
-            elif expr.part == 'MONTH':
-                return inner_value.month
-            elif expr.part == 'DAY':
-                return inner_value.day
-            elif expr.part == 'HOUR':
-                return inner_value.hour
-            elif expr.part == 'MINUTE':
-                return inner_value.minute
-            elif expr.part == 'SECOND':
-                return inner_value.second
+            return extract_part(expr.part, inner_value)
                 
         elif isinstance(expr, ColumnExpression):
             # Regular columns: use value from first row (all rows in group have same GROUP BY values)
@@ -452,6 +513,64 @@ class ConditionExpr(Expression):
                 
         return expr.evaluate(row, schema)
 
+
+class RowValue(Expression):
+    """(a, b, ...): a row constructor, compared with another row value element by element"""
+    def __init__(self, items, alias = None, name = "ROW"):
+        self.items = items
+        self.alias = alias
+        self.name = name
+
+    def evaluate(self, row, schema):
+        return tuple(item.evaluate(row, schema) for item in self.items)
+
+    def get_referenced_columns(self):
+        columns = set()
+        for item in self.items:
+            columns |= item.get_referenced_columns()
+        return columns
+
+
+class RowComparison(ConditionExpr):
+    """
+    (a, b, ...) op (x, y, ...): the first pair of elements that differ
+    decides, so (a, b) > (x, y) means a > x OR (a = x AND b > y), which is
+    what keyset pagination filters on. A NULL met before that pair makes
+    the comparison NULL, i.e. False.
+    """
+    OPERATORS = ("=", "!=", ">", "<", ">=", "<=")
+
+    def __init__(self, left, operator, right, context=None):
+        if (not isinstance(left, RowValue) or not isinstance(right, RowValue)
+                or len(left.items) != len(right.items)):
+            raise ValueError("A row value can only be compared with a row value of the same length")
+        if operator not in self.OPERATORS:
+            raise ValueError(f"Operator '{operator}' cannot compare row values")
+        super().__init__(left, operator, right, context)
+
+    def evaluate(self, row, schema):
+        for left_item, right_item in zip(self.left.items, self.right.items):
+            left, right = self._pair(left_item, right_item, row, schema)
+            if left is None or right is None:
+                return False
+            if isinstance(right, str) and isinstance(left, str):
+                left = self._folded(left_item, left, row)
+                right = self._folded(right_item, right, row)
+            if left != right:
+                if self.operator in ("=", "!="):
+                    return self.operator == "!="
+                return left < right if self.operator in ("<", "<=") else left > right
+        return self.operator in ("=", "<=", ">=")
+
+    def _pair(self, left_item, right_item, row, schema):
+        """Values of two corresponding elements, coerced as a comparison of just those two would be"""
+        pair = ConditionExpr(left_item, "=", right_item, self.context)
+        if self.context == "HAVING":
+            return pair._evaluate_having_expr(left_item, row, schema), pair._evaluate_having_expr(right_item, row, schema)
+        if self.context == "WHERE":
+            return pair._evaluate_where_expr(left_item, row, schema), pair._evaluate_where_expr(right_item, row, schema)
+        return left_item.evaluate(row, schema), right_item.evaluate(row, schema)
+
 class Between(Expression):
     def __init__(self, expression, lower, upper, is_not = False):
         self.expression = expression
@@ -498,29 +617,40 @@ class Membership(Expression):
         self.argset = set(arg.evaluate({}, {}) for arg in args
                           if isinstance(arg, LiteralExpression)) 
         self.is_not = is_not
+        self._statement_cache = None
+
+    def __setstate__(self, state):
+        """Called after deserialization: a result materialized by an earlier statement is not reused"""
+        self._statement_cache = None
         
     def evaluate(self, row, schema):
         value = self.col.evaluate(row, schema)
-        out = []
         if self.argset:
             result = value in self.argset
+        elif all(isinstance(arg, (LiteralExpression, SelectStatement)) for arg in self.args):
+            # The same list for every row: run the subqueries once and probe a set
+            result = value in once_per_statement(self, lambda: set(self._values(row, schema)))
         else:
-            for arg in self.args:
-                if isinstance(arg, SelectStatement):
-                    
-                    exp = arg.evaluate(row, schema, runner_context="ANY")
-                    seen = set()
-                    for row in exp:
-                        for v in row.values():
-                            if v not in seen:
-                                seen.add(v)
-                                out.append(v)
-                else:
-                    out.append(arg.evaluate(row, schema))
-            result = value in out
+            result = value in self._values(row, schema)
             
         return not result if self.is_not else result
 
+    def _values(self, row, schema):
+        out = []
+        for arg in self.args:
+            if isinstance(arg, SelectStatement):
+                
+                exp = arg.evaluate(row, schema, runner_context="ANY")
+                seen = set()
+                for row in exp:
+                    for v in row.values():
+                        if v not in seen:
+                            seen.add(v)
+                            out.append(v)
+            else:
+                out.append(arg.evaluate(row, schema))
+        return out
+
 class NegationCondition(Expression):
     def __init__(self, expression):
         self.expression = expression
@@ -544,10 +674,11 @@ class IsNullCondition(Expression):
         
 
 class LikeCondition(Expression):
-    def __init__(self, expression, pattern_expression, is_not=False):
+    def __init__(self, expression, pattern_expression, is_not=False, case_insensitive=False):
         self.expression = expression
         self.pattern_expression = pattern_expression
         self.is_not = is_not
+        self.case_insensitive = case_insensitive  # ILIKE
         # Pre-compile the regex pattern for efficiency (if pattern is constant)
         self._compiled_regex = None
         self._cached_pattern = None
@@ -557,6 +688,8 @@ class LikeCondition(Expression):
         # Reset regex-related attributes after deserialization
         self._compiled_regex = None
         self._cached_pattern = None
+        if 'case_insensitive' not in state:
+            self.case_insensitive = False
 
     def _pattern_to_regex(self, pattern):
         if not isinstance(pattern, str):
@@ -595,20 +728,57 @@ class LikeCondition(Expression):
         if not isinstance(pattern_value, str):
             raise ValueError("LIKE pattern must be a string")
         
-        # Convert pattern to regex
-        regex_pattern = self._pattern_to_regex(pattern_value)
-        
-        # Cache compiled regex for efficiency, but handle deserialization issues
+        # Compile once per distinct pattern, but handle deserialization issues
         if (self._compiled_regex is None or 
-            self._cached_pattern != regex_pattern or 
+            self._cached_pattern != pattern_value or 
             not hasattr(self._compiled_regex, 'pattern')):
-            self._compiled_regex = re.compile(regex_pattern)
-            self._cached_pattern = regex_pattern
+            pattern = pattern_value.lower() if self.case_insensitive else pattern_value
+            self._compiled_regex = re.compile(self._pattern_to_regex(pattern))
+            self._cached_pattern = pattern_value
+        
+        if self.case_insensitive:
+            subject = self._folded_subject(row[0] if isinstance(row, list) else row, current_value)
+        else:
+            subject = str(current_value)
         
         # Perform the match and apply NOT if needed
-        match_result = self._compiled_regex.match(str(current_value)) is not None
+        match_result = self._compiled_regex.match(subject) is not None
         return not match_result if self.is_not else match_result
+
+    def _folded_subject(self, row, value):
+        """ILIKE subject: the cell's cached folded value when matching a string column"""
+        if isinstance(self.expression, ColumnExpression) and isinstance(row, dict):
+            cell = row.get(self.expression.column_name)
+            if isinstance(cell, StringType) and cell.value is value:
+                return cell.folded
+        return str(value).lower()
     
+class Match(Expression):
+    """
+    MATCH(col, 'terms'): relevance of the column's text to the words of terms
+    (see storage.index.relevance), 0.0 when none of them occurs, so that in
+    WHERE it keeps the rows holding any term and in ORDER BY it ranks them.
+    """
+    def __init__(self, expression, terms, name = "MATCH", alias = None):
+        self.name = name
+        self.expression = expression
+        self.terms = terms
+        self.alias = alias
+        if not isinstance(terms, LiteralExpression) or not isinstance(terms.value, str):
+            raise ValueError("MATCH terms must be a string literal")
+        self.words = query_terms(terms.value)
+
+    def evaluate(self, row, schema):
+        if isinstance(row, list):
+            if not row:
+                return 0.0
+            row = row[0]
+        value = self.expression.evaluate(row, schema)
+        if value is None:
+            return 0.0
+        words = fulltext_words(value)
+        return relevance(Counter(words), len(words), self.words)
+
 class OrderBy(Expression):
     def __init__(self, expression, direction = "ASC"):
         self.expression = expression
@@ -798,19 +968,11 @@ class Cast(Expression):
         elif self.target_type in ["DATE"]:
             if type(value) != str:
                 raise ValueError(f"Given Expression has datatype of {type(value).__name__} but {self.target_type} target type  were Given")
-            try:
-                from datetime import datetime
-                return datetime.strptime(value, "%Y-%m-%d").date()
-            except ValueError:
-                raise ValueError(f"Invalid DATE format: {value}. Expected YYYY-MM-DD.")
+            return DATE(value).value
         elif self.target_type in ["TIME"]:
             if type(value) != str:
                 raise ValueError(f"Given Expression has datatype of {type(value).__name__} but {self.target_type} target type  were Given")
-            try:
-                from datetime import datetime
-                return datetime.strptime(value, "%H:%M:%S").time()
-            except ValueError:
-                raise ValueError(f"Cannot convert '{value}' to TIME. Format must be HH:MM:SS")
+            return TIME(value).value
 
 
 class CoalesceFunction(Expression):
@@ -855,7 +1017,7 @@ class CurrentDate(Expression):
         self.alias = alias
         
     def evaluate(self, row = None, schema= None):
-        return date.today()
+        return encode_date(date.today())
 
     
 
@@ -906,25 +1068,39 @@ class Extract(Expression):
         
         if value is None:
             return None
-            
-        # Import here to avoid circular imports
-        from datetime import date, time
-        
-        if not isinstance(value, (date, time)):
-            raise ValueError("EXTRACT Function works Only with DATE & TIME columns")
-        
-        if self.part == 'YEAR':
-            return value.year
-        elif self.part == 'MONTH':
-            return value.month
-        elif self.part == 'DAY':
-            return value.day
-        elif self.part == 'HOUR':
-            return value.hour
-        elif self.part == 'MINUTE':
-            return value.minute
-        elif self.part == 'SECOND':
-            return value.second
+        
+        return extract_part(self.part, value)
+
+class JsonExtract(Expression):
+    """col->'key'->0 (JSON sub-document) and col->'key'->>'field' (scalar), read from the binary form"""
+    def __init__(self, expression, path, as_text = False, name = "JSON_EXTRACT", alias = None):
+        self.expression = expression
+        self.path = tuple(path)
+        self.as_text = as_text
+        self.name = name
+        self.alias = alias
+
+    def evaluate(self, row, schema):
+        if isinstance(row, list):
+            if not row:
+                return None
+            row = row[0]
+        document = self.expression.evaluate(row, schema)
+        if document is None:
+            return None
+        if isinstance(document, str):
+            # JSON kept in TEXT/VARCHAR columns has to be parsed first
+            document = JsonDocument.from_text(document)
+        elif not isinstance(document, JsonDocument):
+            raise ValueError("-> and ->> operators work only with JSON values")
+        node = document.path(self.path)
+        if node is None:
+            return None
+        return node.scalar() if self.as_text else node
+
+    def get_referenced_columns(self):
+        return self.expression.get_referenced_columns()
+
 class DateDIFF(Expression):
     def __init__(self, date1, date2, unit = 'days', name = "DATEDIFF", alias = None):
         self.date1 = date1
@@ -953,23 +1129,17 @@ class DateDIFF(Expression):
         else:
             unit_val = self.unit.evaluate(row, schema)
         
-        # Calculate difference
-        if hasattr(date1_val, 'year') and hasattr(date2_val, 'year'):
-            # Both are dates
-            years = date1_val.year - date2_val.year
-            months = date1_val.month - date2_val.month
-            days = (date1_val - date2_val).days
-            
-            if unit_val.lower() == 'years':
-                return years
-            elif unit_val.lower() == 'months':
-                return years * 12 + months  # Approximate
-            elif unit_val.lower() == 'days':
-                return days
-            else:
-                return days  # default to days
-        else:
-            raise ValueError("DATEDIFF requires date arguments")
+        if date1_val is None or date2_val is None:
+            return None
+        
+        # String literals are read as DATEs so both sides are day ordinals
+        if isinstance(date1_val, str):
+            date1_val = DATE(date1_val).value
+        if isinstance(date2_val, str):
+            date2_val = DATE(date2_val).value
+        
+        # Calculate difference on the integer encodings
+        return date_diff(unit_val, date1_val, date2_val)
 
         
         
@@ -1067,12 +1237,15 @@ class Exists(Expression):
         self.subquery = subquery
         self.name = name
         self.alias = alias
+        self._statement_cache = None
+
+    def __setstate__(self, state):
+        """Called after deserialization: a result computed by an earlier statement is not reused"""
+        self._statement_cache = None
         
     def evaluate(self, row, schema):
 
-        res = self.subquery.evaluate(row, schema)
-        if res: return True
-        return False
+        return once_per_statement(self, lambda: bool(self.subquery.evaluate(row, schema)))
         
 
 class ShowConstraints(Expression):
@@ -1128,6 +1301,56 @@ class ShowConstraints(Expression):
                         return
                     
             
+
+class ShowMemory(Expression):
+    """SHOW MEMORY [table]: estimated RAM per table, or per column of one table"""
+    def __init__(self, table_name = None, name = "REQUEST_MEMORY", alias = None):
+        self.table_name = table_name
+        self.name = name
+        self.alias = alias
+
+    def evaluate(self):
+        from storage.memory import table_memory
+        database = get_db_manager().active_db
+        if self.table_name is None:
+            result = []
+            for table in database.values():
+                report = table_memory(table)
+                result.append({
+                    "table": report["table"],
+                    "rows": report["rows"],
+                    "total_bytes": report["total"],
+                    "cell_bytes": sum(c["bytes"] for c in report["columns"].values()),
+                    "cache_bytes": report["cache"],
+                    "index_bytes": report["indexes"],
+                    "bytes_per_row": report["total"] // report["rows"] if report["rows"] else 0,
+                })
+            return result
+
+        if self.table_name not in database:
+            raise TableNotFoundError(self.table_name)
+        report = table_memory(database[self.table_name])
+        row_count = report["rows"]
+        result = []
+        for col, usage in report["columns"].items():
+            result.append({
+                "column": col,
+                "type": usage["type"],
+                "bytes": usage["bytes"],
+                "cache_bytes": usage["cache"],
+                "bytes_per_row": usage["bytes"] // row_count if row_count else 0,
+            })
+        for label, size in (("(row storage)", report["row_storage"]), ("(indexes)", report["indexes"]),
+                            ("(metadata)", report["metadata"])):
+            result.append({
+                "column": label,
+                "type": None,
+                "bytes": size,
+                "cache_bytes": 0,
+                "bytes_per_row": size // row_count if row_count else 0,
+            })
+        return result
+
 class UnionExpression(Expression):
     def __init__(self, left, right, context="UNION"):
             self.left = left
@@ -1361,6 +1584,10 @@ class DropTable:
     def __init__(self, table_name):
         self.table_name = table_name
         
+class DropIndex:
+    def __init__(self, index_name):
+        self.index_name = index_name
+
 class DropView:
     def __init__(self, view_name):
         self.view_name = view_name
@@ -1372,6 +1599,11 @@ class DropMTView:
 class TruncateTable:
     def __init__(self, table_name):
         self.table_name = table_name
+
+class ClusterTable:
+    def __init__(self, table_name, column):
+        self.table_name = table_name
+        self.column = column
         
 class WithCTE:
     def __init__(self, cte_expressions, cte_queries):
@@ -1410,7 +1642,9 @@ class WithCTE:
             sample_val = samples[0]
             
             # Important: Check bool BEFORE int because isinstance(True, int) returns True in Python!
-            if isinstance(sample_val, bool):
+            if isinstance(sample_val, TemporalValue):
+                schema[col] = temporal_types[type(sample_val)]
+            elif isinstance(sample_val, bool):
                 schema[col] = BOOLEAN
             elif isinstance(sample_val, int):
                 schema[col] = INT
@@ -1523,6 +1757,7 @@ class AddColumnFromAlterTable:
            
         for row in db_manager.active_db[table_name].rows:
             row[self.column_name] = None
+        db_manager.active_db[table_name].sync_constraint_indexes()
             
             
 
@@ -1601,6 +1836,7 @@ class AddConstraintFromAlterTable:
             # Update other mappings
             db_manager.active_db[table_name].constraints_ptr[self.constraint_name] = self.constraint_type
             db_manager.active_db[table_name].constraints[self.column_name] = self.constraint_type
+            db_manager.active_db[table_name].sync_constraint_indexes()
                                 
 
 class DropColumnFromAlterTable:
@@ -1611,6 +1847,10 @@ class DropColumnFromAlterTable:
         if self.column_name not in db_manager.active_db[table_name].schema:
             raise ColumnNotFoundError(column_name=self.column_name,table_name=table_name)
         rows = db_manager.active_db[table_name].rows
+        _reject_referenced(db_manager, table_name, self.column_name)
+        partitioning = db_manager.active_db[table_name].partitioning
+        if partitioning is not None and partitioning.column == self.column_name:
+            raise ValueError(f"Cannot drop column '{self.column_name}': table '{table_name}' is partitioned by it")
 
         if self.column_name in db_manager.active_db[table_name].private_constraints:
             for col, key_set in db_manager.active_db[table_name].private_constraints.items():
@@ -1622,15 +1862,61 @@ class DropColumnFromAlterTable:
         if self.column_name in db_manager.active_db[table_name].restrictions:
             del  db_manager.active_db[table_name].restrictions[self.column_name]
 
+        generated = getattr(db_manager.active_db[table_name], 'generated', {})
+        if generated:
+            from utilities import extract_identifiers
+            for col, expr in generated.items():
+                if col != self.column_name and self.column_name in extract_identifiers(expr):
+                    raise ValueError(f"cannot drop column '{self.column_name}' because generated column '{col}' depends on it")
+            generated.pop(self.column_name, None)
+
         if self.column_name in db_manager.active_db[table_name].constraints:
             del db_manager.active_db[table_name].constraints[self.column_name]
+        db_manager.active_db[table_name].references.pop(self.column_name, None)
         del db_manager.active_db[table_name].schema[self.column_name]
         for row in rows:
             try:
                 del row[self.column_name]
             except Exception as e:
                 raise ValueError(e)
-        
+        for index in db_manager.active_db[table_name].indexes_using(self.column_name):
+            del db_manager.active_db[table_name].indexes[index.name]
+        if db_manager.active_db[table_name].cluster_key == self.column_name:
+            db_manager.active_db[table_name].cluster_key = None
+        db_manager.active_db[table_name].sync_constraint_indexes()
+
+
+class AddPartitionFromAlterTable:
+    def __init__(self, partition_name, value):
+        self.partition_name = partition_name
+        self.value = value      # None for MAXVALUE
+
+    def execute(self, table_name, db_manager):
+        db_manager.active_db[table_name].add_partition(self.partition_name, self.value)
+        print(f"Partition '{self.partition_name}' added to table '{table_name}'")
+
+
+class DropPartitionFromAlterTable:
+    def __init__(self, partition_name):
+        self.partition_name = partition_name
+
+    def execute(self, table_name, db_manager):
+        from exec.foreign_keys import check_referenced
+        table = db_manager.active_db[table_name]
+        rows = table.partition_rows(self.partition_name)
+        check_referenced(db_manager.active_db, table, rows, leaving=rows)
+        dropped = table.drop_partition(self.partition_name)
+        print(f"Partition '{self.partition_name}' dropped with {len(dropped)} rows")
+
+
+def _reject_referenced(db_manager, table_name, column):
+    """Raise ValueError if a FOREIGN KEY of another table points at table_name.column"""
+    from exec.foreign_keys import referencing
+    for child, child_column, parent_column, _ in referencing(db_manager.active_db, table_name):
+        if parent_column == column and child.name != table_name:
+            raise ValueError(f"Column '{column}' of table '{table_name}' is referenced by '{child.name}.{child_column}'")
+
+
 class DropConstraintFromAlterTable:
     def __init__(self, const_name):
         self.const_name = const_name
@@ -1647,7 +1933,11 @@ class DropConstraintFromAlterTable:
                         value = db_manager.active_db[table_name].constraints_ptr[key]
                         if value == TokenTypes.CHECK:
                             del db_manager.active_db[table_name].restrictions[col]
+                        elif value == TokenTypes.FOREIGN_KEY:
+                            del db_manager.active_db[table_name].references[col]
                         else:
+                            if value in (TokenTypes.PRIMARY_KEY, TokenTypes.UNIQUE):
+                                _reject_referenced(db_manager, table_name, col)
                             del db_manager.active_db[table_name].constraints[col]
                         del db_manager.active_db[table_name].constraints_ptr[key]
         if column_pointer:                
@@ -1655,6 +1945,7 @@ class DropConstraintFromAlterTable:
                 db_manager.active_db[table_name].private_constraints[column_pointer].remove(self.const_name)
             else:
                 del db_manager.active_db[table_name].private_constraints[column_pointer]
+            db_manager.active_db[table_name].sync_constraint_indexes()
             print(f'column <{column_pointer}> has been affected')        
             
         if column_pointer is None:
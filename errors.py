@@ -81,4 +81,7 @@ class NotNullError(ConstraintError):
 class UniqueConstraintError(ConstraintError):
     def __init__(self, column_name, value):
         super().__init__(f"Duplicate value '{value}' for UNIQUE column '{column_name}'", "UNIQUE_VIOLATION")
-        
\ No newline at end of file
+
+class ForeignKeyError(ConstraintError):
+    def __init__(self, message):
+        super().__init__(message, "FOREIGN_KEY_VIOLATION")
@@ -0,0 +1,337 @@
+"""
+Index advisor: the indexes that would have served the statements run
+lately, and the existing ones nothing reads.
+
+exec.execute() captures every top-level SELECT, UPDATE and DELETE on a
+table into a bounded log (QUERY_LOG): its WHERE, ORDER BY and LIMIT, the
+rows the table held and the rows the statement returned. index_advice()
+turns the log into the rows of `\\advise` / SELECT * FROM pysql_index_advice:
+
+- CREATE INDEX suggestions. A WHERE asks for an ordered index on its
+  equality columns followed by one range column, so that the planner takes
+  the whole key range from it. A column matched IN (SELECT ...) counts as an
+  equality: that is how a join key reaches this engine, which has no JOIN.
+  An ORDER BY ... LIMIT the WHERE cannot narrow asks for an index led by
+  the ORDER BY columns, read in order by index_seek(). A suggestion is made
+  only when the planner would use the index, and carries the row visits it
+  would have saved over the logged statements (from the fraction of a
+  sample of the table the predicates keep) and the memory it would take
+  (from building it over that sample).
+- Existing indexes that no plan has read since the database was loaded
+  (see exec.planner._read()). UNIQUE and constraint indexes are left out,
+  since their constraint needs them whether or not a query reads them.
+"""
+import sys
+from collections import deque
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from engine.sql_ast import (SelectStatement, UpdateStatement, DeleteStatement, ConditionExpr, Between,
+                            Membership, ColumnExpression, LiteralExpression)
+from sql_types.sql_types import StringType
+from storage.index import OrderedIndex
+from storage.memory import deep_sizeof
+from exec.planner import SELECTIVITY
+
+ADVICE_TABLE = "pysql_index_advice"
+
+# Statements kept in the log, and rows sampled per table to estimate selectivity
+LOG_SIZE = 500
+SAMPLE_SIZE = 1000
+
+RANGE_OPERATORS = ("<", "<=", ">", ">=")
+
+
+class LoggedStatement:
+    """A captured statement: what it asked of a table, and how many rows it scanned and returned"""
+    __slots__ = ("kind", "table", "where", "order_by", "limit", "table_rows", "returned", "elapsed")
+
+    def __init__(self, kind, table, where, order_by, limit, table_rows):
+        self.kind = kind
+        self.table = table
+        self.where = where
+        self.order_by = order_by
+        self.limit = limit              # LIMIT plus OFFSET: the rows an ordered walk reads, or None
+        self.table_rows = table_rows    # rows the table held, which a full scan visits
+        self.returned = None
+        self.elapsed = None
+
+
+QUERY_LOG = deque(maxlen=LOG_SIZE)
+
+
+def capture(ast, database):
+    """
+    A LoggedStatement for a SELECT / UPDATE / DELETE on a table of database
+    (the DatabaseManager, or its active_db as INSERT / UPDATE / DELETE get
+    it), or None for any other statement
+    """
+    tables = getattr(database, "active_db", database)
+    order_by = []
+    limit = None
+    if isinstance(ast, SelectStatement):
+        if ast.table is None or not isinstance(ast.table.table_name, str):
+            return None
+        name = ast.table.table_name
+        if not ast.group_by and not ast.function_columns:
+            # Grouped or aggregated results are ordered after the rows are gone
+            order_by = ast.order_by or []
+        if ast.limit:
+            limit = int(ast.limit) + int(ast.offset or 0)
+    elif isinstance(ast, (UpdateStatement, DeleteStatement)):
+        name = ast.table
+    else:
+        return None
+    if not isinstance(tables, dict) or name not in tables:
+        return None
+    kind = type(ast).__name__.replace("Statement", "").upper()
+    return LoggedStatement(kind, name, ast.where, order_by, limit, len(tables[name].rows))
+
+
+def record(entry, result, elapsed):
+    """Add a captured statement that ran, with its result, to the log"""
+    entry.returned = len(result) if isinstance(result, list) else None
+    entry.elapsed = elapsed
+    QUERY_LOG.append(entry)
+
+
+def index_advice(db_manager):
+    """
+    Rows of pysql_index_advice for the active database, best suggestion
+    first, then the unused indexes:
+
+        {"action", "table_name", "columns", "statement", "queries",
+         "rows_scanned", "rows_returned", "est_rows_saved", "est_memory_bytes"}
+    """
+    tables = db_manager.active_db
+    memo = {}           # fractions of the sample already evaluated, see _fraction()
+    candidates = {}     # (table, columns) -> [(entry, conds the index serves)]
+    for entry in QUERY_LOG:
+        table_obj = tables.get(entry.table)
+        if table_obj is None:
+            continue
+        found = _candidate(table_obj, entry, memo)
+        if found is not None:
+            candidates.setdefault((entry.table, found[0]), []).append((entry, found[1]))
+    # An index also serves the statements asking for a leading prefix of its columns
+    for table_name, columns in sorted(candidates, key=lambda key: len(key[1])):
+        for other_table, other in candidates:
+            if other_table == table_name and len(other) > len(columns) and other[:len(columns)] == columns:
+                candidates[other_table, other] += candidates.pop((table_name, columns))
+                break
+
+    advice = []
+    names = {name for table_obj in tables.values() for name in table_obj.indexes}
+    for (table_name, columns), uses in candidates.items():
+        table_obj = tables[table_name]
+        if _covered(table_obj, columns, [conds for _, conds in uses]):
+            continue
+        saved = 0
+        for entry, conds in uses:
+            saved += _saved_rows(table_obj, entry, conds, memo)
+        if saved <= 0:
+            continue
+        name = _index_name(table_name, columns, names)
+        names.add(name)
+        advice.append({
+            "action": "CREATE",
+            "table_name": table_name,
+            "columns": ", ".join(columns),
+            "statement": f"CREATE INDEX {name} ON {table_name} ({', '.join(columns)});",
+            "queries": len(uses),
+            "rows_scanned": sum(entry.table_rows for entry, _ in uses),
+            "rows_returned": sum(entry.returned or 0 for entry, _ in uses),
+            "est_rows_saved": int(saved),
+            "est_memory_bytes": _index_memory(table_obj, columns),
+        })
+    advice.sort(key=lambda row: -row["est_rows_saved"])
+
+    for table_name, table_obj in tables.items():
+        for name, index in table_obj.indexes.items():
+            if index.constraint or index.unique or index.reads:
+                continue
+            advice.append({
+                "action": "UNUSED",
+                "table_name": table_name,
+                "columns": index.label,
+                "statement": f"DROP INDEX {name};",
+                "queries": 0,
+                "rows_scanned": 0,
+                "rows_returned": 0,
+                "est_rows_saved": 0,
+                "est_memory_bytes": deep_sizeof(index, _table_objects(table_obj.rows)),
+            })
+    return advice
+
+
+def _candidate(table_obj, entry, memo):
+    """
+    (index columns, the WHERE conjuncts the index would serve) that entry
+    asks for, the conjuncts being empty for an ORDER BY ... LIMIT read in
+    index order; None when no index on plain columns would help it
+    """
+    equal = {}      # column -> the conds on it
+    ranges = {}
+    for cond in _conjuncts(entry.where):
+        found = _served(table_obj, cond)
+        if found is not None:
+            column, is_range = found
+            (ranges if is_range else equal).setdefault(column, []).append(cond)
+    for column in equal:
+        ranges.pop(column, None)
+    if equal or ranges:
+        # The most selective range column ends the key; every equality one comes before it
+        columns = sorted(equal, key=lambda column: _fraction(table_obj, equal[column], memo))
+        conds = [cond for column in columns for cond in equal[column]]
+        if ranges:
+            column = min(ranges, key=lambda column: _fraction(table_obj, ranges[column], memo))
+            columns.append(column)
+            conds += ranges[column]
+        if _fraction(table_obj, conds, memo) <= SELECTIVITY:
+            return tuple(columns), conds
+
+    if entry.limit is None or not entry.order_by:
+        return None
+    columns = []
+    for clause in entry.order_by:
+        expression = clause.expression
+        if (not isinstance(expression, ColumnExpression) or expression.column_name not in table_obj.schema
+                or _is_text(table_obj, expression.column_name)):
+            # index_seek() does not read text in index order
+            return None
+        columns.append(expression.column_name)
+    if len({clause.direction for clause in entry.order_by}) != 1 or len(set(columns)) != len(columns):
+        return None
+    return tuple(columns), []
+
+
+def _served(table_obj, cond):
+    """(column, is_range) when cond compares a column of table_obj with literals the way an ordered index serves, else None"""
+    schema = table_obj.schema
+    if isinstance(cond, ConditionExpr) and (cond.operator == "=" or cond.operator in RANGE_OPERATORS):
+        for column, literal in ((cond.left, cond.right), (cond.right, cond.left)):
+            if (isinstance(column, ColumnExpression) and column.column_name in schema
+                    and isinstance(literal, LiteralExpression) and literal.value is not None):
+                return column.column_name, cond.operator != "="
+        return None
+    if isinstance(cond, Between):
+        column = cond.expression
+        if (isinstance(column, ColumnExpression) and column.column_name in schema and not cond.is_not
+                and isinstance(cond.lower, LiteralExpression) and isinstance(cond.upper, LiteralExpression)
+                and not _is_text(table_obj, column.column_name)):
+            return column.column_name, True
+        return None
+    if isinstance(cond, Membership):
+        column = cond.col
+        if (isinstance(column, ColumnExpression) and column.column_name in schema and not cond.is_not
+                and all(isinstance(arg, (LiteralExpression, SelectStatement)) for arg in cond.args)):
+            return column.column_name, False
+    return None
+
+
+def _covered(table_obj, columns, served):
+    """
+    Whether an existing index (or the clustering key) already gives what an
+    ordered index on columns would to statements whose WHERE conjuncts it
+    serves are `served`: the same leading columns, or for equality on a
+    single column a hash or bitmap index on it
+    """
+    if columns == (table_obj.cluster_key,):
+        return True
+    equality = all(conds and all(not _served(table_obj, cond)[1] for cond in conds) for conds in served)
+    for index in table_obj.indexes.values():
+        if index.predicate is not None or getattr(index, "computed", False):
+            continue
+        if index.kind == "BTREE" and index.columns[:len(columns)] == columns:
+            return True
+        if (equality and len(columns) == 1 and index.kind in ("HASH", "BITMAP")
+                and index.column == columns[0] and (index.kind == "BITMAP" or not _is_text(table_obj, columns[0]))):
+            # '=' on text folds case, which an exact-match index cannot answer
+            return True
+    return False
+
+
+def _saved_rows(table_obj, entry, conds, memo):
+    """
+    Row visits an index serving conds would have saved entry: a full scan of
+    the rows the table held, against the rows in the index's key range, or
+    for an ORDER BY ... LIMIT against the rows walked in index order until
+    LIMIT of them satisfy WHERE
+    """
+    scanned = entry.table_rows
+    if conds:
+        visited = _fraction(table_obj, conds, memo) * scanned
+    else:
+        kept = _fraction(table_obj, _conjuncts(entry.where), memo)
+        visited = min(scanned, entry.limit / kept) if kept else scanned
+    return max(0, scanned - visited)
+
+
+def _fraction(table_obj, conds, memo):
+    """
+    Fraction of the rows of a sample of the table satisfying all of conds
+    (1.0 when it cannot be told), remembered in memo for the same conds
+    """
+    key = (table_obj.name, tuple(map(id, conds)))
+    if key not in memo:
+        memo[key] = _sample_fraction(table_obj, conds)
+    return memo[key]
+
+
+def _sample_fraction(table_obj, conds):
+    sample = _sample(table_obj)
+    if not sample or not conds:
+        return 1.0
+    schema = table_obj.schema
+    try:
+        kept = sum(1 for row in sample if all(cond.evaluate(row, schema) for cond in conds))
+    except (TypeError, ValueError, KeyError):
+        return 1.0
+    return kept / len(sample)
+
+
+def _sample(table_obj):
+    rows = table_obj.rows
+    return rows[::max(1, len(rows) // SAMPLE_SIZE)]
+
+
+def _index_memory(table_obj, columns):
+    """Estimated bytes of an ordered index on columns: one built over the sample, scaled to the table"""
+    sample = _sample(table_obj)
+    if not sample:
+        return 0
+    index = OrderedIndex("advice", columns, schema=table_obj.schema)
+    index.build(sample)
+    return int(deep_sizeof(index, _table_objects(sample)) * len(table_obj.rows) / len(sample))
+
+
+def _table_objects(rows):
+    """ids of rows, their cells and the cells' values: the table's, not an index's, so not in its size"""
+    seen = set()
+    for row in rows:
+        seen.add(id(row))
+        for cell in row.values():
+            seen.add(id(cell))
+            seen.add(id(getattr(cell, "value", None)))
+    return seen
+
+
+def _index_name(table_name, columns, taken):
+    name = f"{table_name}_{'_'.join(columns)}_idx"
+    number = 1
+    while name in taken:
+        number += 1
+        name = f"{table_name}_{'_'.join(columns)}_idx{number}"
+    return name
+
+
+def _conjuncts(expr):
+    if expr is None:
+        return []
+    if isinstance(expr, ConditionExpr) and expr.operator == "AND":
+        return _conjuncts(expr.left) + _conjuncts(expr.right)
+    return [expr]
+
+
+def _is_text(table_obj, column):
+    column_type = table_obj.schema[column]
+    return isinstance(column_type, type) and issubclass(column_type, StringType)
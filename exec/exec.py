@@ -14,14 +14,35 @@ from src.delete import *
 from src.drop import *
 from src.create import *
 from src.truncate import *
+from src.cluster import *
 from src.CTE import *
 from src.CTA import *
 from src.use import *
 from src.call_view import *
 from src.materialized_view import *
+from exec.advisor import capture, record
+import time
 
 
 def execute(ast, database):
+    """Run a statement; the subqueries it runs belong to it (see Statement)"""
+    if Statement.running:
+        return _execute(ast, database)
+    Statement.number += 1
+    Statement.running = True
+    # Captured for the index advisor (see exec.advisor)
+    entry = capture(ast, database)
+    started = time.perf_counter()
+    try:
+        result = _execute(ast, database)
+    finally:
+        Statement.running = False
+    if entry is not None:
+        record(entry, result, time.perf_counter() - started)
+    return result
+
+
+def _execute(ast, database):
     if isinstance(ast, SelectStatement):
         return execute_select_query(ast, database)
     
@@ -40,6 +61,12 @@ def execute(ast, database):
     elif isinstance(ast, CreateTableStatement):
         return execute_create_table_statement(ast, database)
         
+    elif isinstance(ast, CreateIndexStatement):
+        return execute_create_index_statement(ast, database)
+    
+    elif isinstance(ast, DropIndex):
+        return drop_index(ast, database)
+        
     elif isinstance(ast, UseStatement):
         return execute_use_statement(ast, database)
     
@@ -72,3 +99,6 @@ def execute(ast, database):
     
     elif isinstance(ast, TruncateTable):
         return truncate_table(ast, database)
+    
+    elif isinstance(ast, ClusterTable):
+        return cluster_table(ast, database)
@@ -0,0 +1,95 @@
+"""
+FOREIGN KEY enforcement for INSERT, UPDATE, DELETE and TRUNCATE.
+
+A table's `references` maps each REFERENCES column to (parent table, parent
+column, deferred). The parent column is a PRIMARY KEY or UNIQUE column, so
+checking a value is one probe of the hash index backing that constraint.
+The referencing column has a hash index of its own (Table.reference_index),
+so the rows pointing at a parent key are found just as directly when that
+key is deleted or changed. References declared DEFERRABLE are checked at the
+end of the statement, once per distinct key, instead of row by row.
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from storage.index import index_key
+from errors import ForeignKeyError
+
+
+def referencing(database, table_name):
+    """(child table, column, parent column, deferred) of every REFERENCES to table_name"""
+    return [(child, column, parent_column, deferred)
+            for child in database.values()
+            for column, (parent, parent_column, deferred) in child.references.items()
+            if parent == table_name]
+
+
+def check_references(database, table_obj, rows, deferred=False):
+    """
+    Raise ForeignKeyError unless every non-NULL value rows hold in a
+    REFERENCES column of table_obj is a key of the parent. `deferred`
+    limits the check to the references declared deferred or not; None checks all.
+    """
+    for column, (parent, parent_column, is_deferred) in table_obj.references.items():
+        if deferred is not None and is_deferred != deferred:
+            continue
+        parent_table = database.get(parent)
+        index = parent_table.unique_index(parent_column) if parent_table is not None else None
+        if index is None:
+            raise ForeignKeyError(f"Column '{parent_column}' of table '{parent}' referenced by "
+                                  f"'{table_obj.name}.{column}' is no longer a PRIMARY KEY or UNIQUE column")
+        for key in dict.fromkeys(index_key(row.get(column)) for row in rows):
+            if key is not None and index.holder(key) is None:
+                raise ForeignKeyError(f"insert or update on table '{table_obj.name}' violates foreign key constraint "
+                                      f"'{table_obj.name}_{column}_fkey': key ({column})=({key}) "
+                                      f"is not present in table '{parent}'")
+
+
+def check_referenced(database, table_obj, rows, deferred=None, leaving=()):
+    """
+    Raise ForeignKeyError if a key rows hold in a referenced column of
+    table_obj is gone from the table, or held only by rows in `leaving` (about
+    to be deleted), while a row outside `leaving` still references it.
+    `deferred` is as for check_references().
+    """
+    leaving = {id(row) for row in leaving}
+    for child, column, parent_column, is_deferred in referencing(database, table_obj.name):
+        if deferred is not None and is_deferred != deferred:
+            continue
+        index = table_obj.unique_index(parent_column)
+        children = child.reference_index(column)
+        for key in dict.fromkeys(index_key(row.get(parent_column)) for row in rows):
+            if key is None:
+                continue
+            holder = index.holder(key) if index is not None else None
+            if holder is not None and id(holder) not in leaving:
+                continue
+            if any(id(row) not in leaving for row in children.lookup(key)):
+                raise ForeignKeyError(f"update or delete on table '{table_obj.name}' violates foreign key constraint "
+                                      f"'{child.name}_{column}_fkey': key ({parent_column})=({key}) "
+                                      f"is still referenced from table '{child.name}'")
+
+
+def checked_update(database, table_obj, row, new_values, deferred=False):
+    """
+    table_obj.update_row() followed by the reference checks the change calls
+    for (`deferred` as for check_references()); on a violation the row gets
+    its old values back. Returns those old values.
+    """
+    previous = dict(row)
+    table_obj.update_row(row, new_values)
+    try:
+        check_references(database, table_obj, [row], deferred)
+        check_referenced(database, table_obj, [previous], deferred)
+    except ForeignKeyError:
+        table_obj.update_row(row, previous)
+        raise
+    return previous
+
+
+def check_truncate(database, table_obj):
+    """Raise ForeignKeyError if rows of another table reference table_obj"""
+    for child, column, _, _ in referencing(database, table_obj.name):
+        if child is not table_obj and child.reference_index(column).entries:
+            raise ForeignKeyError(f"cannot truncate table '{table_obj.name}': "
+                                  f"rows of table '{child.name}' reference it through '{column}'")
@@ -0,0 +1,1239 @@
+"""
+Access-path selection: use an index to narrow a WHERE clause down to a
+few candidate rows instead of scanning the whole table.
+
+candidate_rows() returns a superset of the matching rows (or None for
+"scan everything") and the caller still evaluates the full WHERE on each
+candidate, so NULL handling, literal coercion and case-insensitive string
+comparison behave exactly as in a scan.
+
+exact_scans() only succeeds when the WHERE clause is exactly one key range
+of an index, or resolves exactly over bitmap indexes. Those rows need no
+re-check, and aggregates such as COUNT, MIN and MAX can then be read off
+the index without visiting the rows.
+
+A partial index (one with a WHERE predicate) is considered only when the
+query's WHERE implies that predicate, so that it holds every matching row.
+
+An expression index (LOWER(email), EXTRACT(YEAR FROM d), ...) serves a
+WHERE term whose expression is equivalent to the indexed one, and can hand
+over rows already grouped or ordered for GROUP BY and ORDER BY on it.
+
+A trigram index narrows LIKE / ILIKE to the rows that hold every trigram of
+the pattern's literal runs. A full-text index answers MATCH from the
+postings of its terms, and index_top() ranks by relevance without scoring
+rows that hold none of them. A Bloom index settles '=' and IN on a value no
+row holds without touching the rows; otherwise it leaves the plan alone.
+
+A clustered table (CLUSTER ... BY / CLUSTERED BY) keeps its rows sorted by
+its key, so a range of the key is a slice of the rows found by binary
+search.
+
+index_seek() reads ORDER BY ... LIMIT off an ordered index or a clustered
+table, starting at WHERE's key: keyset pagination with a row-value
+comparison, (k1, k2) > (v1, v2), costs the same on page 1 and page 500.
+
+Every index a plan actually reads from has its `reads` counted (_read()),
+so that the index advisor can tell which indexes nothing uses.
+
+In adaptive indexing mode (AdaptiveIndexing, off by default) a read whose
+WHERE bounds a column no index serves cracks a copy of that column around
+the bounds (storage.index.CrackerColumn) instead of scanning the table:
+the first such query on a column costs about a scan, and each later one
+finds the copy more finely partitioned.
+
+A partitioned table (PARTITION BY RANGE / HASH) is read only in the
+partitions WHERE can select rows from: ranges and '=' / IN on the
+partition column, combined through AND and OR, prune the others.
+
+ordered_scan() and index_groups() hand over rows already sorted on a GROUP
+BY key, so that the executor aggregates each group as its run ends instead
+of hashing every row, and can skip an ORDER BY on that key.
+"""
+import re
+import sys
+from itertools import chain, groupby, islice
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from engine.sql_ast import (ConditionExpr, Between, Membership, ColumnExpression, LiteralExpression,
+                            NegationCondition, IsNullCondition, LikeCondition, BinaryOperation, Match, RowComparison)
+from sql_types.sql_types import StringType, BOOLEAN
+from storage.index import ordered_key, NULL_KEY, TOP, trigram_text, trigrams
+from src.constants import TokenTypes
+from exec.sql_helpers import expressions_are_equivalent
+
+# Above this fraction of the table an index lookup is no cheaper than a scan
+SELECTIVITY = 0.25
+
+FLIPPED = {"=": "=", "<": ">", "<=": ">=", ">": "<", ">=": "<="}
+
+# Bound of a predicate that can never hold (comparison with NULL)
+EMPTY = object()
+
+
+class AdaptiveIndexing:
+    """Whether reads crack the columns their range filters bound (\\set adaptive_indexing true in the shell)"""
+    enabled = False
+
+
+def candidate_rows(table_obj, where, adaptive=False):
+    """
+    Rows that may satisfy where, fetched through an index; None when a full
+    scan is the better plan. adaptive says the caller only reads the rows,
+    so that in adaptive indexing mode an unindexed range may be cracked.
+    """
+    adaptive = adaptive and AdaptiveIndexing.enabled
+    if where is None or not (table_obj.ready_indexes() or table_obj.cluster_key or table_obj.partitioning or adaptive):
+        return None
+    try:
+        plan = _plan(table_obj, _usable_indexes(table_obj, where), where)
+        bitmap = _bitmap_plan(table_obj, where)
+        if bitmap is not None and (plan is None or bitmap[0] < plan[0]):
+            plan = bitmap
+        pruned = _partition_plan(table_obj, where)
+        if pruned is not None and (plan is None or pruned[0] <= plan[0] or plan[0] > len(table_obj.rows) * SELECTIVITY):
+            # The partitions left are read like a scan, only less of it, however many rows they hold
+            return pruned[1]()
+        if plan is None or plan[0] > len(table_obj.rows) * SELECTIVITY:
+            # Cracking reads no more rows than the scan, however many the range holds
+            return _cracked_rows(table_obj, where) if adaptive else None
+        return plan[1]()
+    except (TypeError, ValueError):
+        # Incomparable literal (e.g. text against a DATE column): let the scan report it
+        return None
+
+
+def _partition_plan(table_obj, where):
+    """
+    (row count, fetch()) of the partitions of a partitioned table that where
+    can select rows from, or None when it rules out none of them
+    """
+    partitioning = table_obj.partitioning
+    if partitioning is None:
+        return None
+    try:
+        numbers = _partitions(table_obj, where)
+    except TypeError:
+        # A literal the partition keys cannot be compared with: leave it to the scan
+        return None
+    if numbers is None or len(numbers) == len(partitioning.partitions):
+        return None
+    spans = [partitioning.span(number) for number in sorted(numbers)]
+    rows = table_obj.rows
+    return sum(stop - start for start, stop in spans), lambda: list(chain.from_iterable(rows[start:stop]
+                                                                                        for start, stop in spans))
+
+
+def _partitions(table_obj, expr):
+    """Numbers of the partitions holding every row expr can select, or None for all of them"""
+    partitioning = table_obj.partitioning
+    if isinstance(expr, ConditionExpr) and expr.operator in ("AND", "OR"):
+        left = _partitions(table_obj, expr.left)
+        right = _partitions(table_obj, expr.right)
+        if expr.operator == "OR":
+            return None if left is None or right is None else left | right
+        return right if left is None else left if right is None else left & right
+    if isinstance(expr, Membership):
+        if (expr.is_not or _indexed_column(table_obj, expr.col) != partitioning.column
+                or not all(isinstance(arg, LiteralExpression) for arg in expr.args)):
+            return None
+        keys = {ordered_key(value) for value in expr.argset if value is not None}
+        numbers = {number for key in keys for number in partitioning.covering(key, key)}
+        if None in expr.argset:
+            # A scan matches NULL cells against a NULL in the list, and those sit in partition 0
+            numbers.add(0)
+        return numbers
+    if isinstance(expr, IsNullCondition):
+        if expr.is_null and _indexed_column(table_obj, expr.expression) == partitioning.column:
+            return {0}
+        return None
+    found = _bound(table_obj, expr)
+    if found is EMPTY:
+        return set()
+    if found is None or found[0] != partitioning.column:
+        return None
+    return set(partitioning.covering(*found[2]))
+
+
+def _cracked_rows(table_obj, where):
+    """
+    Candidates of where from the cracker column of one column it bounds that
+    no ordered index or clustering serves, preferring a column cracked
+    before; None when there is none
+    """
+    bounds = {}
+    for cond in _conjuncts(where):
+        found = _bound(table_obj, cond)
+        if found is EMPTY:
+            return []
+        if found is None or getattr(table_obj.schema[found[0]], '__name__', None) == 'JSON':
+            continue
+        column, _, bound = found
+        bounds[column] = _intersect(bounds[column], bound) if column in bounds else bound
+    ordered = {index.column for index in table_obj.ready_indexes().values() if index.kind == "BTREE"}
+    columns = [column for column in bounds if column not in ordered and column != table_obj.cluster_key]
+    if not columns:
+        return None
+    column = next((column for column in columns if column in table_obj.crackers), columns[0])
+    return table_obj.cracker(column).range(*bounds[column])
+
+
+class IndexScan:
+    """
+    The rows satisfying a WHERE clause exactly, read straight from one index:
+    a hash lookup of key, or the key range bounds of an ordered index whose
+    first `fixed` columns are pinned by equality. `columns` are the columns
+    the predicate constrains (and therefore proves non-NULL).
+    """
+
+    def __init__(self, index, bounds=None, key=None, fixed=0, columns=()):
+        self.index = index
+        self.bounds = bounds
+        self.key = key
+        self.fixed = fixed
+        self.columns = columns
+
+    def count(self):
+        if self.bounds is None:
+            return len(self.index.lookup(self.key))
+        return self.index.count_range(*self.bounds)
+
+    def rows(self):
+        if self.bounds is None:
+            return _read(self.index, self.index.lookup(self.key))
+        return _read(self.index, self.index.range(*self.bounds))
+
+
+class BitmapScan(IndexScan):
+    """The rows of a bitset over the table's RowSlots"""
+
+    def __init__(self, slots, bits):
+        super().__init__(None)
+        self.slots = slots
+        self.bits = bits
+
+    def count(self):
+        return self.bits.bit_count()
+
+    def rows(self):
+        return self.slots.rows_of(self.bits)
+
+
+class FullTextScan(IndexScan):
+    """The rows of a full-text index holding any of the terms of a MATCH"""
+
+    def __init__(self, index, terms):
+        super().__init__(index, columns=(index.column,))
+        self.terms = terms
+
+    def count(self):
+        return self.index.count(self.terms)
+
+    def rows(self):
+        return _read(self.index, self.index.search(self.terms))
+
+
+class ClusterScan(IndexScan):
+    """The slice rows[start:stop] of a table clustered by the constrained column"""
+
+    def __init__(self, table_obj, start, stop):
+        super().__init__(None, columns=(table_obj.cluster_key,))
+        self.table_obj = table_obj
+        self.start = start
+        self.stop = stop
+
+    def count(self):
+        return self.stop - self.start
+
+    def rows(self):
+        return self.table_obj.rows[self.start:self.stop]
+
+
+def exact_scans(table_obj, where):
+    """
+    Every IndexScan that yields exactly the rows satisfying where: a bitmap
+    resolution of the whole clause, or, for a conjunction of column-versus-
+    literal comparisons and BETWEENs, one index (or the clustering key) that
+    accounts for all of them.
+    """
+    if where is None or not (table_obj.ready_indexes() or table_obj.cluster_key):
+        return []
+    scans = []
+    bitmap = _bitmap_bits(table_obj, where)
+    if bitmap is not None and bitmap[1]:
+        scans.append(BitmapScan(table_obj.row_slots, bitmap[0]))
+    indexes = _usable_indexes(table_obj, where)
+    fulltext = _fulltext_index(table_obj, indexes, where)
+    if fulltext is not None:
+        # The index splits text into words exactly as MATCH does
+        scans.append(FullTextScan(fulltext, where.words))
+    conds = _conjuncts(where)
+    bounds = _exact_bounds(table_obj, conds, indexes)
+
+    if bounds is not None and len(bounds) == 1:
+        column, bound = next(iter(bounds.items()))
+        index = _exact_index(indexes, column)
+        if index is not None and _is_point(bound) and not _is_text(table_obj, column):
+            scans.append(IndexScan(index, key=bound[0], columns=(column,)))
+        if column == table_obj.cluster_key:
+            scans.append(ClusterScan(table_obj, *table_obj.cluster_slice(*bound)))
+    for index in indexes.values():
+        if index.kind != "BTREE":
+            continue
+        index_bounds = bounds
+        if index.predicate is not None:
+            # Conjuncts the predicate already guarantees hold for every row of the index
+            required = _conjuncts(index.predicate)
+            rest = [cond for cond in conds
+                    if not any(expressions_are_equivalent(cond, other) for other in required)]
+            index_bounds = _exact_bounds(table_obj, rest, indexes)
+        if index_bounds is None:
+            continue
+        if not index_bounds:
+            # The whole partial index, which leaves out rows with a NULL leading
+            # column: exact only when the predicate rules those out
+            if _proves_not_null(table_obj, required, index.column, indexes):
+                scans.append(IndexScan(index, (None, None, True, True), columns=(index.column,)))
+        elif index.column in index_bounds:
+            key_range, columns, fixed = _prefix_range(index, index_bounds)
+            if set(columns) == set(index_bounds):
+                scans.append(IndexScan(index, key_range, fixed=fixed, columns=columns))
+    return scans
+
+
+def _proves_not_null(table_obj, conds, column, indexes):
+    """Whether one of conds (IS NOT NULL, or a comparison with a literal) only holds when column is not NULL"""
+    for cond in conds:
+        if isinstance(cond, IsNullCondition):
+            if not cond.is_null and _indexed_column(table_obj, cond.expression, indexes) == column:
+                return True
+            continue
+        try:
+            found = _bound(table_obj, cond, indexes)
+        except (TypeError, ValueError):
+            continue
+        if found is not None and found is not EMPTY and found[0] == column:
+            return True
+    return False
+
+
+def _exact_bounds(table_obj, conds, indexes):
+    """Bounds per column when every one of conds is a column-versus-literal comparison or BETWEEN, else None"""
+    bounds = {}
+    try:
+        for cond in conds:
+            found = _bound(table_obj, cond, indexes)
+            if found is None or found is EMPTY:
+                return None
+            column, _, bound = found
+            bounds[column] = _intersect(bounds[column], bound) if column in bounds else bound
+    except (TypeError, ValueError):
+        return None
+    return bounds
+
+
+def index_aggregates(table_obj, functions, where):
+    """
+    Values of an aggregate-only select list (no GROUP BY) read from indexes
+    alone: COUNT over an exact index range, MIN / MAX from the ends of an
+    ordered index. None when any of the functions needs the rows.
+    """
+    if not table_obj.ready_indexes():
+        return None
+    counted = None
+    if where is None:
+        total = len(table_obj.rows)
+        scans = [IndexScan(index, (None, None, True, True))
+                 for index in table_obj.ready_indexes().values()
+                 if index.kind == "BTREE" and index.predicate is None]
+    else:
+        scans = exact_scans(table_obj, where)
+        if not scans:
+            return None
+        counted = min(scans, key=lambda scan: scan.count())
+        total = counted.count()
+
+    values = []
+    for func in functions:
+        if not isinstance(func.expression, ColumnExpression) or func.distinct:
+            return None
+        if not total:
+            # Same as Function.evaluate() over no rows
+            values.append(None)
+            continue
+        answer = _index_aggregate(table_obj, func, scans, total, where is None)
+        if answer is None:
+            return None
+        values.append(answer[0])
+    if counted is not None and counted.index is not None:
+        _read(counted.index, total)
+    return values
+
+
+def table_aggregates(table_obj, functions):
+    """
+    Values of an aggregate-only select list over the whole table (no WHERE,
+    no GROUP BY) from the table's running totals: COUNT(*) is the row count,
+    and COUNT / SUM / AVG / MIN / MAX of a column come from its ColumnTotals.
+    None when any of the functions needs the rows.
+    """
+    if not table_obj.rows:
+        # Same as Function.evaluate() over no rows
+        return [None] * len(functions)
+    values = []
+    for func in functions:
+        if not isinstance(func.expression, ColumnExpression) or func.distinct:
+            return None
+        column = func.expression.column_name
+        if column == "*":
+            if func.name != "COUNT":
+                return None
+            values.append(len(table_obj.rows))
+            continue
+        if column not in table_obj.schema or getattr(table_obj.schema[column], '__name__', None) == 'JSON':
+            return None
+        answer = table_obj.column_totals(column).value(func.name)
+        if answer is None:
+            return None
+        values.append(answer[0])
+    return values
+
+
+def index_groups(table_obj, expressions):
+    """
+    GROUP BY buckets as (key values, rows) over the whole table, yielded one
+    run of equal keys at a time in key order, read off an ordered index
+    keyed by the single grouping expression so that nothing is evaluated per
+    row; None when no index fits. See _sorting_index().
+    """
+    if len(expressions) != 1:
+        return None
+    index = _sorting_index(table_obj, expressions[0])
+    if index is None:
+        return None
+    schema = table_obj.schema
+    return (((expressions[0].evaluate(rows[0], schema),), rows) for rows in _read(index, index.groups()))
+
+
+def scan_order(table_obj):
+    """
+    The column a scan of the table's rows comes out in ascending order of, as
+    ORDER BY and GROUP BY compare it (NULLs first, ties in table order): the
+    clustering key unless it is text, stored case-folded. None otherwise.
+    """
+    column = table_obj.cluster_key
+    if column is None or _is_text(table_obj, column):
+        return None
+    return column
+
+
+def ordered_scan(table_obj, expression):
+    """
+    Every row of the table in ascending order of expression, equal values
+    next to each other, without sorting: the rows themselves when the table
+    is clustered by that column (NULLs first, ties in table order), else a
+    walk of an ordered index keyed by it. None when neither fits; text keys
+    never do, being stored case-folded. See _sorting_index().
+    """
+    column = scan_order(table_obj)
+    if column is not None and isinstance(expression, ColumnExpression) and expression.column_name == column:
+        return table_obj.rows
+    index = _sorting_index(table_obj, expression)
+    if index is None:
+        return None
+    return _read(index, index.scan())
+
+
+def index_order(table_obj, expression, descending=False):
+    """The whole table ordered by expression, walked from an ordered index keyed by it; None when no index fits"""
+    index = _sorting_index(table_obj, expression)
+    if index is None:
+        return None
+    return list(_read(index, index.scan(reverse=descending)))
+
+
+def index_top(table_obj, order, where, k):
+    """
+    The k rows ranked first by ORDER BY MATCH(...) DESC, read from a full-text
+    index: only rows holding a term are scored. Applies when WHERE is absent
+    or is that same MATCH, which keeps exactly the rows with a score; rows
+    scoring 0.0 would otherwise rank last, so WHERE-less queries that need
+    more rows than match fall back to sorting. None when no index fits.
+    """
+    match = order.expression
+    if order.direction != "DESC" or not isinstance(match, Match):
+        return None
+    if where is not None and not expressions_are_equivalent(where, match):
+        return None
+    index = _fulltext_index(table_obj, table_obj.ready_indexes(), match)
+    if index is None:
+        return None
+    if where is None and index.count(match.words) < min(k, len(table_obj.rows)):
+        return None
+    return _read(index, index.top(match.words, k))
+
+
+class SeekScan:
+    """
+    Rows in ORDER BY order, walked from an ordered index or a clustered
+    table from where WHERE's range on the key begins. exact means they are
+    exactly the rows satisfying WHERE: none needs re-checking, and OFFSET
+    rows can be skipped without being visited.
+    """
+
+    def __init__(self, walk, exact):
+        self.walk = walk
+        self.exact = exact
+
+    def rows(self, skip=0):
+        """The rows after the first skip"""
+        return self.walk(skip)
+
+
+def index_seek(table_obj, order_by, where, limit=None):
+    """
+    ORDER BY read in storage order instead of sorted: from an ordered index
+    whose leading columns are the ORDER BY columns, or from a table
+    clustered by the single ORDER BY column, starting where WHERE's range on
+    them begins. Keyset pagination (WHERE (k1, k2) > (v1, v2) ORDER BY k1, k2
+    LIMIT n) thus visits about n rows however deep the page is.
+
+    Applies to non-text columns sorted all ASC or all DESC, since text is
+    stored case-folded whereas ORDER BY compares it exactly. NULLs come
+    first either way, as the sort puts them. When WHERE has terms the walk
+    must re-check, it is only worth it for a LIMIT (of `limit` rows, OFFSET
+    included), and not when another index narrows those terms by itself.
+    Returns a SeekScan, or None.
+    """
+    columns = []
+    for clause in order_by:
+        expression = clause.expression
+        if (not isinstance(expression, ColumnExpression) or expression.column_name not in table_obj.schema
+                or _is_text(table_obj, expression.column_name)):
+            return None
+        columns.append(expression.column_name)
+    if len({clause.direction for clause in order_by}) != 1:
+        return None
+    descending = order_by[0].direction == "DESC"
+    conds = _conjuncts(where) if where is not None else []
+    try:
+        if columns == [table_obj.cluster_key]:
+            found = _cluster_seek(table_obj, conds, descending)
+        else:
+            found = _index_seek(table_obj, columns, conds, descending)
+        if found is None:
+            return None
+        scan, rest = found
+        if rest:
+            if limit is None:
+                return None
+            indexes = _usable_indexes(table_obj, where)
+            for cond in rest:
+                for plan in (_plan(table_obj, indexes, cond), _bitmap_plan(table_obj, cond)):
+                    if plan is not None and plan[0] <= len(table_obj.rows) * SELECTIVITY:
+                        # That index narrows WHERE by itself; sorting its few rows beats walking the order
+                        return None
+    except (TypeError, ValueError):
+        # Incomparable literal: let the scan report it
+        return None
+    return scan
+
+
+def _cluster_seek(table_obj, conds, descending):
+    """(SeekScan over a clustered table, conds its key range leaves to check), equal keys kept in table order"""
+    column = table_obj.cluster_key
+    bound = None
+    rest = []
+    for cond in conds:
+        found = _bound(table_obj, cond)
+        if found is EMPTY:
+            return SeekScan(lambda skip: iter(()), True), []
+        if found is not None and found[0] == column:
+            bound = _intersect(bound, found[2]) if bound is not None else found[2]
+        else:
+            if isinstance(cond, RowComparison) and _leads_with(table_obj, cond, column):
+                leading = _leading_bound(table_obj, cond)
+                bound = _intersect(bound, leading) if bound is not None else leading
+            rest.append(cond)
+    rows = table_obj.rows
+    start, stop = table_obj.cluster_slice(*bound) if bound is not None else table_obj.cluster_slice()
+    # Without a range the NULLs in front belong to the result too
+    first = start if bound is not None else 0
+
+    def walk(skip):
+        if not descending:
+            return islice(rows, first + skip, stop)
+        # Runs of equal keys from the top down, each in table order, as the sort leaves them
+        runs = groupby((rows[position] for position in range(stop - 1, start - 1, -1)), table_obj.cluster_key_of)
+        ordered = chain(islice(rows, first, start), (row for _, run in runs for row in reversed(list(run))))
+        return islice(ordered, skip, None)
+
+    return SeekScan(walk, not rest), rest
+
+
+def _index_seek(table_obj, columns, conds, descending):
+    """(SeekScan over an ordered index led by columns, conds its key range leaves to check), or None"""
+    for index in table_obj.ready_indexes().values():
+        if (index.kind != "BTREE" or index.predicate is not None or index.computed
+                or index.columns[:len(columns)] != tuple(columns)):
+            continue
+        if descending and not all(_never_null(table_obj, column) for column in columns[1:]):
+            # Backwards, NULLs stored further right would come after the values instead of before
+            continue
+        found = _seek_range(table_obj, index, conds)
+        if found is EMPTY:
+            return SeekScan(lambda skip: iter(()), True), []
+        key_range, rest = found
+        if key_range is None and len(index) != len(table_obj.rows):
+            # Rows with a NULL leading key are not in the index, and nothing in WHERE rules them out
+            continue
+
+        def walk(skip, index=index, key_range=key_range):
+            return _read(index, index.scan(*(key_range or ()), reverse=descending, skip=skip))
+
+        return SeekScan(walk, not rest), rest
+    return None
+
+
+def _seek_range(table_obj, index, conds):
+    """
+    (key range of index satisfying the conds it can serve or None for the
+    whole index, the conds left to check on its rows), or EMPTY. Row-value
+    comparisons on leading columns and column-versus-literal bounds both
+    narrow the range.
+    """
+    key_range = None
+    bounds = {}
+    bounded = []
+    rest = []
+    for cond in conds:
+        if isinstance(cond, RowComparison):
+            found = _row_range(table_obj, cond, index.columns)
+            if found is None:
+                rest.append(cond)
+                continue
+            key_range = _intersect(key_range, found[0]) if key_range is not None else found[0]
+            if not found[1]:
+                rest.append(cond)
+            continue
+        found = _bound(table_obj, cond)
+        if found is EMPTY:
+            return EMPTY
+        if found is None or found[0] not in index.columns:
+            rest.append(cond)
+            continue
+        bounds[found[0]] = _intersect(bounds[found[0]], found[2]) if found[0] in bounds else found[2]
+        bounded.append((found[0], cond))
+    if index.column in bounds:
+        prefix_range, covered, _ = _prefix_range(index, bounds)
+        key_range = _intersect(key_range, prefix_range) if key_range is not None else prefix_range
+        rest.extend(cond for column, cond in bounded if column not in covered)
+    else:
+        rest.extend(cond for _, cond in bounded)
+    return key_range, rest
+
+
+def _row_key(table_obj, cond):
+    """
+    (columns, ordered keys of the literals, operator) of a row-value
+    comparison of columns with literals, written either way round, or None
+    """
+    operator = cond.operator
+    if operator not in FLIPPED:
+        return None
+    items, literals = cond.left.items, cond.right.items
+    if not all(isinstance(item, ColumnExpression) for item in items):
+        items, literals = literals, items
+        operator = FLIPPED[operator]
+    if (not all(isinstance(item, ColumnExpression) and item.column_name in table_obj.schema
+                                    for item in items)
+            or not all(isinstance(literal, LiteralExpression) for literal in literals)):
+        return None
+    columns = tuple(item.column_name for item in items)
+    keys = []
+    for column, literal in zip(columns, literals):
+        if cond.context == TokenTypes.WHERE:
+            value = literal.evaluate({}, table_obj.schema, table_obj.schema[column])
+        else:
+            value = literal.evaluate({}, table_obj.schema)
+        if value is None or _is_text(table_obj, column) != isinstance(value, str):
+            return None
+        keys.append(ordered_key(value))
+    return columns, tuple(keys), operator
+
+
+def _row_range(table_obj, cond, index_columns):
+    """
+    (key range, exact) of an ordered index on index_columns for a row-value
+    comparison of its leading columns with literals, or None. A NULL after
+    the first column is stored as NULL_KEY, below every value, so below an
+    upper bound it is let in although the comparison is NULL there; such a
+    range is exact only when those columns cannot hold NULL.
+    """
+    found = _row_key(table_obj, cond)
+    if found is None:
+        return None
+    columns, prefix, operator = found
+    if index_columns[:len(columns)] != columns:
+        return None
+    if len(index_columns) == 1:
+        key = prefix[0]
+        ranges = {"=": (key, key, True, True), ">": (key, None, False, True), ">=": (key, None, True, True),
+                  "<": (None, key, True, False), "<=": (None, key, True, True)}
+    else:
+        ranges = {"=": (prefix, prefix + (TOP,), True, True), ">": (prefix + (TOP,), None, True, True),
+                  ">=": (prefix, None, True, True), "<": (None, prefix, True, False),
+                  "<=": (None, prefix + (TOP,), True, True)}
+    exact = operator in ("=", ">", ">=") or all(_never_null(table_obj, column) for column in columns[1:])
+    return ranges[operator], exact
+
+
+def _leads_with(table_obj, cond, column):
+    """Whether cond is a row-value comparison with literals whose first column is column"""
+    found = _row_key(table_obj, cond)
+    return found is not None and found[0][0] == column
+
+
+def _leading_bound(table_obj, cond):
+    """The range of the first column implied by a row-value comparison (see _row_key()), the rest being open"""
+    _, keys, operator = _row_key(table_obj, cond)
+    if operator == "=":
+        return keys[0], keys[0], True, True
+    if operator in (">", ">="):
+        return keys[0], None, True, True
+    return None, keys[0], True, True
+
+
+def _never_null(table_obj, column):
+    """Whether a PRIMARY KEY or NOT NULL constraint keeps NULL out of column"""
+    kinds = [table_obj.constraints.get(column)]
+    kinds += [table_obj.constraints_ptr.get(key) for key in table_obj.private_constraints.get(column, ())]
+    return any(getattr(kind, 'value', kind) in (TokenTypes.PRIMARY_KEY, TokenTypes.NOT_NULL) for kind in kinds)
+
+
+def _fulltext_index(table_obj, indexes, match):
+    """A full-text index among indexes on the column match searches, or None"""
+    if not isinstance(match, Match):
+        return None
+    column = _indexed_column(table_obj, match.expression)
+    if column is None:
+        return None
+    for index in _indexes_on(indexes, column):
+        if index.kind == "FULLTEXT":
+            return index
+    return None
+
+
+def _sorting_index(table_obj, expression):
+    """
+    A ready ordered index keyed by expression alone (a column or an equivalent
+    indexed expression) that holds every row of the table. Its order is
+    usable only for non-text keys: text is ordered case-folded, whereas
+    GROUP BY and ORDER BY compare it exactly.
+    """
+    for index in table_obj.ready_indexes().values():
+        if index.kind != "BTREE" or index.predicate is not None or len(index.columns) != 1:
+            continue
+        indexed = index.expressions[0]
+        if indexed is None:
+            matches = isinstance(expression, ColumnExpression) and expression.column_name == index.column
+        else:
+            matches = expressions_are_equivalent(expression, indexed)
+        if matches and len(index) == len(table_obj.rows) and index.first_key() is not None \
+                and not isinstance(index.first_key(), str):
+            return index
+    return None
+
+
+def _index_aggregate(table_obj, func, scans, total, whole_table):
+    """(value,) of one aggregate from the index scans, or None"""
+    column = func.expression.column_name
+    if func.name == "COUNT":
+        if column == "*":
+            return (total,)
+        if whole_table:
+            # Hash and ordered indexes leave NULLs out, so a leading-column one counts the non-NULL cells
+            for index in _indexes_on(_usable_indexes(table_obj, None), column):
+                if index.kind in ("HASH", "BTREE"):
+                    return (_read(index, len(index)),)
+            return None
+        if any(column in scan.columns for scan in scans):
+            return (total,)
+        return None
+
+    if func.name not in ("MIN", "MAX") or column not in table_obj.schema or _is_text(table_obj, column):
+        # MIN / MAX compare text case-sensitively, unlike the folded key order
+        return None
+    for scan in scans:
+        if scan.bounds is None or column not in scan.index.columns:
+            continue
+        # Within the range the index is ordered by column once the columns before it are pinned
+        if scan.index.columns.index(column) > scan.fixed:
+            continue
+        for row in _read(scan.index, scan.index.scan(*scan.bounds, reverse=(func.name == "MAX"))):
+            value = func.expression.evaluate(row, table_obj.schema)
+            if value is not None:
+                return (value,)
+        return (None,)
+    return None
+
+
+def _read(index, result):
+    """result, read off index: counted in index.reads"""
+    index.reads += 1
+    return result
+
+
+def _conjuncts(expr):
+    if isinstance(expr, ConditionExpr) and expr.operator == "AND":
+        return _conjuncts(expr.left) + _conjuncts(expr.right)
+    return [expr]
+
+
+def _plan(table_obj, indexes, expr):
+    """
+    (estimated row count, fetch()) for the cheapest index access serving
+    expr, or None. The bounds of all column-versus-literal conjuncts are
+    collected per column first, so that every ordered index can take the
+    longest leading prefix of its columns they cover.
+    """
+    if isinstance(expr, ConditionExpr) and expr.operator == "OR":
+        left = _plan(table_obj, indexes, expr.left)
+        right = _plan(table_obj, indexes, expr.right) if left else None
+        if right is None:
+            return None
+        return left[0] + right[0], lambda: _union_all([left[1](), right[1]()])
+
+    plans = []
+    bounds = {}     # column -> (low, high, low_inclusive, high_inclusive) in ordered_key space
+    for cond in _conjuncts(expr):
+        if isinstance(cond, ConditionExpr) and cond.operator == "OR":
+            plan = _plan(table_obj, indexes, cond)
+        elif isinstance(cond, Membership):
+            plan = _plan_membership(table_obj, indexes, cond)
+        elif isinstance(cond, LikeCondition):
+            plan = _plan_like(table_obj, indexes, cond)
+        elif isinstance(cond, Match):
+            plan = _plan_match(table_obj, indexes, cond)
+        elif isinstance(cond, RowComparison):
+            plan = _plan_row(table_obj, indexes, cond)
+        else:
+            found = _bound(table_obj, cond, indexes)
+            if found is EMPTY:
+                return 0, list
+            if found is None:
+                continue
+            column, value, bound = found
+            if isinstance(cond, ConditionExpr) and cond.operator == "=" and _absent(indexes, column, [value]):
+                return 0, list
+            bounds[column] = _intersect(bounds[column], bound) if column in bounds else bound
+            plan = _plan_exact(indexes, cond, column, value)
+        if plan:
+            plans.append(plan)
+
+    for index in indexes.values():
+        if index.kind == "BTREE" and index.column in bounds:
+            plans.append(_prefix_plan(index, bounds))
+    if table_obj.cluster_key in bounds:
+        scan = ClusterScan(table_obj, *table_obj.cluster_slice(*bounds[table_obj.cluster_key]))
+        plans.append((scan.count(), scan.rows))
+    return min(plans, key=lambda plan: plan[0], default=None)
+
+
+def _usable_indexes(table_obj, where):
+    """
+    The indexes that hold every row satisfying where: all full indexes, and
+    the partial ones whose predicate where implies. Only indexes that are
+    ready count, as a read never waits for a background rebuild.
+    """
+    usable = {}
+    for name, index in table_obj.ready_indexes().items():
+        if index.predicate is None or (where is not None and _implies(table_obj, where, index.predicate)):
+            usable[name] = index
+    return usable
+
+
+def _implies(table_obj, where, predicate):
+    """
+    Whether every row satisfying where satisfies predicate: each conjunct of
+    predicate is either one of where's conjuncts, or a column-versus-literal
+    range that where's bounds on that column lie within.
+    """
+    conds = _conjuncts(where)
+    bounds = None
+    try:
+        for required in _conjuncts(predicate):
+            if any(expressions_are_equivalent(cond, required) for cond in conds):
+                continue
+            found = _bound(table_obj, required)
+            if found is None or found is EMPTY:
+                return False
+            column, _, needed = found
+            if bounds is None:
+                bounds = {}
+                for cond in conds:
+                    found = _bound(table_obj, cond)
+                    if found is not None and found is not EMPTY:
+                        bounds[found[0]] = _intersect(bounds[found[0]], found[2]) if found[0] in bounds else found[2]
+            if column not in bounds or not _within(bounds[column], needed):
+                return False
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _within(inner, outer):
+    """Whether the range inner lies entirely inside the range outer"""
+    low, high, low_inclusive, high_inclusive = inner
+    outer_low, outer_high, outer_low_inclusive, outer_high_inclusive = outer
+    if outer_low is not None:
+        if low is None or low < outer_low or (low == outer_low and low_inclusive and not outer_low_inclusive):
+            return False
+    if outer_high is not None:
+        if high is None or high > outer_high or (high == outer_high and high_inclusive and not outer_high_inclusive):
+            return False
+    return True
+
+
+def _indexes_on(indexes, column):
+    return [index for index in indexes.values() if index.column == column]
+
+
+def _indexed_column(table_obj, expr, indexes=None):
+    """The column expr reads, or the label of an index expression equivalent to it, else None"""
+    if isinstance(expr, ColumnExpression):
+        return expr.column_name if expr.column_name in table_obj.schema else None
+    if indexes and not isinstance(expr, LiteralExpression):
+        for index in indexes.values():
+            for label, expression in zip(index.columns, index.expressions):
+                if expression is not None and expressions_are_equivalent(expr, expression):
+                    return label
+    return None
+
+
+def _is_text(table_obj, column):
+    column_type = table_obj.schema[column]
+    return isinstance(column_type, type) and issubclass(column_type, StringType)
+
+
+def _bound(table_obj, cond, indexes=None):
+    """
+    (column, literal value, (low, high, low_inclusive, high_inclusive)) for a
+    comparison or BETWEEN of a column (or indexed expression, identified by
+    its label) against literals, EMPTY when it can never hold, None when no
+    ordered index can serve it. Literals are coerced to the column type only
+    when compared with a plain column, as WHERE itself does.
+    """
+    if isinstance(cond, Between):
+        column = _indexed_column(table_obj, cond.expression, indexes)
+        if (column is None or cond.is_not
+                or not isinstance(cond.lower, LiteralExpression)
+                or not isinstance(cond.upper, LiteralExpression)):
+            return None
+        expected_type = table_obj.schema.get(column)
+        if expected_type is not None and _is_text(table_obj, column):
+            # BETWEEN compares text case-sensitively, which the folded key order cannot bound
+            return None
+        low = cond.lower.evaluate({}, table_obj.schema, expected_type)
+        high = cond.upper.evaluate({}, table_obj.schema, expected_type)
+        if low is None or high is None:
+            return EMPTY
+        if isinstance(low, str) or isinstance(high, str):
+            return None
+        return column, None, (low, high, True, True)
+
+    if not isinstance(cond, ConditionExpr) or cond.operator not in FLIPPED:
+        return None
+    operator = cond.operator
+    column = _indexed_column(table_obj, cond.left, indexes)
+    literal = cond.right
+    if column is None:
+        column = _indexed_column(table_obj, cond.right, indexes)
+        literal = cond.left
+        operator = FLIPPED[operator]
+    if column is None or not isinstance(literal, LiteralExpression):
+        return None
+
+    plain = column in table_obj.schema
+    if cond.context == TokenTypes.WHERE and plain:
+        value = literal.evaluate({}, table_obj.schema, table_obj.schema[column])
+    else:
+        value = literal.evaluate({}, table_obj.schema)
+    if value is None:
+        return EMPTY
+    if plain and _is_text(table_obj, column) != isinstance(value, str):
+        return None
+
+    key = ordered_key(value)
+    if operator == "=":
+        return column, value, (key, key, True, True)
+    if operator in ("<", "<="):
+        return column, value, (None, key, True, operator == "<=")
+    return column, value, (key, None, operator == ">=", True)
+
+
+def _intersect(left, right):
+    """Tightest (low, high, low_inclusive, high_inclusive) satisfying both ranges"""
+    low, high, low_inclusive, high_inclusive = left
+    other_low, other_high, other_low_inclusive, other_high_inclusive = right
+    if other_low is not None and (low is None or other_low > low):
+        low, low_inclusive = other_low, other_low_inclusive
+    elif other_low is not None and other_low == low:
+        low_inclusive = low_inclusive and other_low_inclusive
+    if other_high is not None and (high is None or other_high < high):
+        high, high_inclusive = other_high, other_high_inclusive
+    elif other_high is not None and other_high == high:
+        high_inclusive = high_inclusive and other_high_inclusive
+    return low, high, low_inclusive, high_inclusive
+
+
+def _is_point(bound):
+    low, high, low_inclusive, high_inclusive = bound
+    return low is not None and low == high and low_inclusive and high_inclusive
+
+
+def _prefix_plan(index, bounds):
+    key_range, _, _ = _prefix_range(index, bounds)
+    return _range_plan(index, *key_range)
+
+
+def _prefix_range(index, bounds):
+    """
+    Leftmost-prefix match: equality on the leading columns of the index and
+    at most one range on the column after them, as one range of index keys.
+    Returns (key bounds, columns the range accounts for, number of leading
+    columns pinned by equality).
+    """
+    if len(index.columns) == 1:
+        bound = bounds[index.column]
+        return bound, index.columns, 1 if _is_point(bound) else 0
+
+    prefix = ()
+    for column in index.columns:
+        bound = bounds.get(column)
+        if bound is None:
+            break
+        if not _is_point(bound):
+            return _key_range(prefix, bound), index.columns[:len(prefix) + 1], len(prefix)
+        prefix += (bound[0],)
+    # Every key that starts with prefix
+    return (prefix, prefix + (TOP,), True, True), index.columns[:len(prefix)], len(prefix)
+
+
+def _key_range(prefix, bound):
+    """Key bounds of a range on the column that follows prefix in a composite index"""
+    low, high, low_inclusive, high_inclusive = bound
+    if low is None:
+        # Starts above the NULLs stored under prefix
+        low_key = prefix + (NULL_KEY, TOP)
+    elif low_inclusive:
+        low_key = prefix + (low,)
+    else:
+        low_key = prefix + (low, TOP)
+    if high is None:
+        return low_key, prefix + (TOP,), True, True
+    if high_inclusive:
+        return low_key, prefix + (high, TOP), True, True
+    return low_key, prefix + (high,), True, False
+
+
+def _range_plan(index, low, high, low_inclusive=True, high_inclusive=True):
+    bounds = (low, high, low_inclusive, high_inclusive)
+    return index.count_range(*bounds), lambda: _read(index, index.range(*bounds))
+
+
+def _exact_index(indexes, column):
+    """Hash index that can answer exact-match lookups on column"""
+    for index in _indexes_on(indexes, column):
+        if index.kind == "HASH":
+            return index
+    return None
+
+
+def _absent(indexes, column, values):
+    """True when a Bloom index on column proves that no row holds any of values"""
+    for index in _indexes_on(indexes, column):
+        if index.kind == "BLOOM":
+            return _read(index, not any(index.might_contain(value) for value in values))
+    return False
+
+
+def _plan_exact(indexes, cond, column, value):
+    # '=' on text folds case, which an exact-match hash index cannot answer
+    if isinstance(cond, Between) or cond.operator != "=" or isinstance(value, str):
+        return None
+    index = _exact_index(indexes, column)
+    if index is None:
+        return None
+    rows = index.lookup(value)
+    return len(rows), lambda: _read(index, rows)
+
+
+def _plan_membership(table_obj, indexes, membership):
+    column = _indexed_column(table_obj, membership.col, indexes)
+    if (column is None or membership.is_not
+            or not all(isinstance(arg, LiteralExpression) for arg in membership.args)):
+        return None
+    if None in membership.argset:
+        # A scan matches NULL cells against a NULL in the list, and indexes leave those out
+        return None
+    # IN matches exact values, so both a hash index and the folded order can serve it
+    values = list(membership.argset)
+    if _absent(indexes, column, values):
+        return 0, list
+    index = _exact_index(indexes, column)
+    if index is not None:
+        lookups = [index.lookup(value) for value in values]
+        return sum(len(rows) for rows in lookups), lambda: _read(index, _union_all(lookups))
+    for index in _indexes_on(indexes, column):
+        if index.kind == "BTREE":
+            keys = sorted({ordered_key(value) for value in values})
+            plans = [_prefix_plan(index, {column: (key, key, True, True)}) for key in keys]
+            return sum(plan[0] for plan in plans), lambda: _union_all([plan[1]() for plan in plans])
+    return None
+
+
+def _plan_row(table_obj, indexes, comparison):
+    """
+    Candidates of a row-value comparison with literals: a range of an ordered
+    index led by its columns, or of the first column alone in a single-column
+    index or a clustered table
+    """
+    found = _row_key(table_obj, comparison)
+    if found is None:
+        return None
+    first = found[0][0]
+    plans = []
+    for index in indexes.values():
+        if index.kind != "BTREE" or index.computed:
+            continue
+        key_range = _row_range(table_obj, comparison, index.columns)
+        if key_range is not None:
+            plans.append(_range_plan(index, *key_range[0]))
+        elif index.columns == (first,):
+            plans.append(_range_plan(index, *_leading_bound(table_obj, comparison)))
+    if first == table_obj.cluster_key:
+        scan = ClusterScan(table_obj, *table_obj.cluster_slice(*_leading_bound(table_obj, comparison)))
+        plans.append((scan.count(), scan.rows))
+    return min(plans, key=lambda plan: plan[0], default=None)
+
+
+def _plan_like(table_obj, indexes, like):
+    """Candidates of a LIKE / ILIKE from a trigram index: the rows holding every trigram of the pattern's literal runs"""
+    column = _indexed_column(table_obj, like.expression)
+    if column is None or like.is_not or not isinstance(like.pattern_expression, LiteralExpression):
+        return None
+    pattern = like.pattern_expression.value
+    if not isinstance(pattern, str):
+        return None
+    required = set()
+    for run in re.split("[%_]", pattern):
+        required |= trigrams(trigram_text(run))
+    if not required:
+        # No literal run of three characters: the trigrams cannot narrow anything
+        return None
+    for index in _indexes_on(indexes, column):
+        if index.kind == "TRIGRAM":
+            rows = index.search(required)
+            return len(rows), lambda: _read(index, rows)
+    return None
+
+
+def _plan_match(table_obj, indexes, match):
+    """Rows of a MATCH from a full-text index: those holding any of its terms"""
+    index = _fulltext_index(table_obj, indexes, match)
+    if index is None:
+        return None
+    rows = index.search(match.words)
+    return len(rows), lambda: _read(index, rows)
+
+
+def _bitmap_plan(table_obj, where):
+    bitmap = _bitmap_bits(table_obj, where)
+    if bitmap is None:
+        return None
+    bits = bitmap[0]
+    return bits.bit_count(), lambda: table_obj.row_slots.rows_of(bits)
+
+
+def _bitmap_bits(table_obj, expr):
+    """
+    (bitset, exact) resolving expr with bitwise AND / OR / NOT over the
+    table's bitmap indexes, or None when they cannot help. exact means the
+    bitset holds precisely the rows satisfying expr, otherwise a superset.
+    Predicate results are combined by truthiness, which is how WHERE treats
+    them (a comparison with NULL is False, and NOT of it is True).
+    """
+    if table_obj.row_slots is None:
+        return None
+    if isinstance(expr, ConditionExpr) and expr.operator in ("AND", "OR"):
+        left = _bitmap_bits(table_obj, expr.left)
+        right = _bitmap_bits(table_obj, expr.right)
+        if left is not None and right is not None:
+            if expr.operator == "AND":
+                return left[0] & right[0], left[1] and right[1]
+            return left[0] | right[0], left[1] and right[1]
+        if expr.operator == "AND" and (left or right):
+            # The other side still has to be checked row by row
+            return (left or right)[0], False
+        return None
+    if isinstance(expr, NegationCondition):
+        inner = _bitmap_bits(table_obj, expr.expression)
+        if inner is None or not inner[1]:
+            return None
+        return table_obj.row_slots.live & ~inner[0], True
+
+    column = _single_column(table_obj, expr)
+    if column is None:
+        return None
+    if isinstance(expr, ColumnExpression) and table_obj.schema[column] is not BOOLEAN:
+        return None
+    for index in _indexes_on(table_obj.ready_indexes(), column):
+        if index.kind == "BITMAP":
+            schema = table_obj.schema
+            try:
+                # Exactly what a scan would compute, once per distinct value
+                return _read(index, index.matching(lambda cell: expr.evaluate({column: cell}, schema))), True
+            except (TypeError, ValueError, KeyError):
+                return None
+    return None
+
+
+def _single_column(table_obj, expr):
+    """The one column a predicate depends on when it is built from that column and literals alone, else None"""
+    columns = set()
+
+    def walk(node):
+        if isinstance(node, ColumnExpression):
+            if node.column_name not in table_obj.schema:
+                return False
+            columns.add(node.column_name)
+            return True
+        if isinstance(node, LiteralExpression):
+            return True
+        if isinstance(node, (ConditionExpr, BinaryOperation)):
+            return walk(node.left) and walk(node.right)
+        if isinstance(node, Between):
+            return walk(node.expression) and walk(node.lower) and walk(node.upper)
+        if isinstance(node, Membership):
+            return walk(node.col) and all(isinstance(arg, LiteralExpression) for arg in node.args)
+        if isinstance(node, IsNullCondition):
+            return walk(node.expression)
+        if isinstance(node, LikeCondition):
+            return walk(node.expression) and walk(node.pattern_expression)
+        return False
+
+    if walk(expr) and len(columns) == 1:
+        return columns.pop()
+    return None
+
+
+def _union_all(row_lists):
+    seen = set()
+    result = []
+    for rows in row_lists:
+        for row in rows:
+            if id(row) not in seen:
+                seen.add(id(row))
+                result.append(row)
+    return result
@@ -7,6 +7,7 @@ from errors import *
 from sql_types.sql_types import *
 from storage.database import Table
 from src.constants import *
+from exec.foreign_keys import checked_update
 
 
 def serialize_row(row):
@@ -23,6 +24,11 @@ def extract_identifiers(expr):
         return extract_identifiers(expr.left) + extract_identifiers(expr.right)
     elif isinstance(expr, ConditionExpr):
         return extract_identifiers(expr.left) + extract_identifiers(expr.right)
+    elif isinstance(expr, RowValue):
+        ids = []
+        for item in expr.items:
+            ids.extend(extract_identifiers(item))
+        return ids
     elif isinstance(expr, Function):
         ids = []
         ids.extend(extract_identifiers(expr.expression))
@@ -164,28 +170,6 @@ def get_expr_name(expr):
     else:
         raise ValueError(f"Unknown expression type: {expr}")
     
-def are_same_column(expr1, expr2):
-    """Check if two expressions refer to the same column or are equivalent"""
-    if isinstance(expr1, ColumnExpression) and isinstance(expr2, ColumnExpression):
-        return expr1.column_name == expr2.column_name
-    
-    # Check if they're the same expression type with same parameters
-    if type(expr1) == type(expr2):
-        if isinstance(expr1, Extract):
-            return (expr1.part == expr2.part and 
-                    are_same_column(expr1.expression, expr2.expression))
-        elif isinstance(expr1, CaseWhen):
-            # For CASE expressions, check if they have the same structure
-            if len(expr1.expressions) != len(expr2.expressions):
-                return False
-            for i in range(len(expr1.expressions)):
-                if not are_same_column(expr1.expressions[i], expr2.expressions[i]):
-                    return False
-                if not are_same_column(expr1.actions[i], expr2.actions[i]):
-                    return False
-            return True
-    
-    return False
 
 def execute_order_by(result, order_by_clauses, schema):
     """
@@ -243,6 +227,11 @@ def expressions_are_equivalent(expr1, expr2):
         return (expr1.part == expr2.part and
                 expressions_are_equivalent(expr1.expression, expr2.expression))
     
+    elif isinstance(expr1, JsonExtract):
+        return (expr1.path == expr2.path and
+                expr1.as_text == expr2.as_text and
+                expressions_are_equivalent(expr1.expression, expr2.expression))
+    
     elif isinstance(expr1, Cast):
         return (expr1.target_type == expr2.target_type and
                 expressions_are_equivalent(expr1.expression, expr2.expression))
@@ -257,22 +246,105 @@ def expressions_are_equivalent(expr1, expr2):
                 expressions_are_equivalent(expr1.left, expr2.left) and
                 expressions_are_equivalent(expr1.right, expr2.right))
     
-    elif isinstance(expr1, Concat):
+    elif isinstance(expr1, (Concat, CoalesceFunction)):
         if len(expr1.expressions) != len(expr2.expressions):
             return False
-        return all(expressions_are_equivalent(e1, e2) 
+        return all(expressions_are_equivalent(e1, e2)
                   for e1, e2 in zip(expr1.expressions, expr2.expressions))
-    
+
+    elif isinstance(expr1, StringFunction):
+        return (expr1.name == expr2.name and
+                expr1.start == expr2.start and
+                expr1.length == expr2.length and
+                expressions_are_equivalent(expr1.expression, expr2.expression))
+
+    elif isinstance(expr1, Replace):
+        return (expressions_are_equivalent(expr1.expression, expr2.expression) and
+                expressions_are_equivalent(expr1.old, expr2.old) and
+                expressions_are_equivalent(expr1.new, expr2.new))
+
+    elif isinstance(expr1, NullIF):
+        return (expressions_are_equivalent(expr1.expression, expr2.expression) and
+                expressions_are_equivalent(expr1.number, expr2.number))
+
+    elif isinstance(expr1, DateDIFF):
+        same_unit = (expressions_are_equivalent(expr1.unit, expr2.unit)
+                     if isinstance(expr1.unit, Expression) else expr1.unit == expr2.unit)
+        return (same_unit and
+                expressions_are_equivalent(expr1.date1, expr2.date1) and
+                expressions_are_equivalent(expr1.date2, expr2.date2))
+
+    elif isinstance(expr1, ConditionExpr):
+        return (expr1.operator == expr2.operator and
+                expr1.context == expr2.context and
+                expressions_are_equivalent(expr1.left, expr2.left) and
+                expressions_are_equivalent(expr1.right, expr2.right))
+
+    elif isinstance(expr1, NegationCondition):
+        return expressions_are_equivalent(expr1.expression, expr2.expression)
+
+    elif isinstance(expr1, IsNullCondition):
+        return (expr1.is_null == expr2.is_null and
+                expressions_are_equivalent(expr1.expression, expr2.expression))
+
+    elif isinstance(expr1, Between):
+        return (expr1.is_not == expr2.is_not and
+                expressions_are_equivalent(expr1.expression, expr2.expression) and
+                expressions_are_equivalent(expr1.lower, expr2.lower) and
+                expressions_are_equivalent(expr1.upper, expr2.upper))
+
+    elif isinstance(expr1, Membership):
+        if expr1.is_not != expr2.is_not or len(expr1.args) != len(expr2.args):
+            return False
+        return (expressions_are_equivalent(expr1.col, expr2.col) and
+                all(expressions_are_equivalent(a1, a2) for a1, a2 in zip(expr1.args, expr2.args)))
+
+    elif isinstance(expr1, LikeCondition):
+        return (expr1.is_not == expr2.is_not and
+                expr1.case_insensitive == expr2.case_insensitive and
+                expressions_are_equivalent(expr1.expression, expr2.expression) and
+                expressions_are_equivalent(expr1.pattern_expression, expr2.pattern_expression))
+
+    elif isinstance(expr1, Match):
+        return (expr1.words == expr2.words and
+                expressions_are_equivalent(expr1.expression, expr2.expression))
+
+    elif isinstance(expr1, RowValue):
+        return (len(expr1.items) == len(expr2.items) and
+                all(expressions_are_equivalent(i1, i2) for i1, i2 in zip(expr1.items, expr2.items)))
+
     # Add more cases as needed for other expression types
     else:
         # Fallback: compare string representations
         return str(expr1) == str(expr2)
 
 
-def handle_conflict_resolution(ast, violation, table_obj, new_row):
+def reject_generated_columns(table_obj, columns):
+    """Generated columns are computed by the table and can never be written directly"""
+    generated = getattr(table_obj, 'generated', {})
+    for col in columns:
+        if col in generated:
+            raise ValueError(f"cannot write a value into generated column '{col}'; it is computed from other columns")
+
+
+def compute_generated_columns(table_obj, row):
+    """Evaluate GENERATED ALWAYS AS (...) STORED columns of a row and store the typed results"""
+    generated = getattr(table_obj, 'generated', {})
+    table_schema = table_obj.schema
+    for col, expr in generated.items():
+        value = expr.evaluate(row, table_schema)
+        row[col] = None if value is None else table_schema[col](value)
+        restriction = table_obj.restrictions.get(col)
+        if restriction is not None and not restriction.evaluate(row, table_schema):
+            raise ValueError(f"new row for relation '{table_obj.name}' violates check constraint of column <{col}>")
+    return row
+
+
+def handle_conflict_resolution(ast, violation, table_obj, new_row, database=None):
     """
     Handle ON CONFLICT logic
     Returns True if row should be inserted, False if it should be skipped
+    (with `database`, DO UPDATE checks every FOREIGN KEY the change touches right away)
     """
     if not violation:
         return True  # No conflict, proceed with insert
@@ -303,25 +375,29 @@ def handle_conflict_resolution(ast, violation, table_obj, new_row):
             raise ValueError("ON CONFLICT DO UPDATE requires SET clause")
             
         # Update the conflicting row instead of inserting new one
-        table_rows = table_obj.rows
         table_schema = table_obj.schema
         
-        # Find the existing row that conflicts
-        for existing_row in table_rows:
-            existing_value = existing_row.get(conflict_col)
-            if hasattr(existing_value, 'value'):
-                existing_value = existing_value.value
-                
-            if existing_value == duplicate_value:
-                # Update this row
-                for col, value in ast.update_cols.items():
-                    if col not in table_schema:
-                        raise ValueError(f"Unknown column '{col}' in ON CONFLICT DO UPDATE SET")
-                    existing_row[col] = table_schema[col](value)
-                
-                print(f"Row updated due to ON CONFLICT DO UPDATE: "
-                      f"Updated existing row with {constraint_type} '{conflict_col}' = '{duplicate_value}'")
-                return False  # Don't insert new row, we updated existing
+        reject_generated_columns(table_obj, ast.update_cols)
+        
+        # Find the existing row that conflicts through the constraint's hash index
+        for existing_row in table_obj.conflicting_rows(conflict_col, new_row):
+            # Update this row
+            updated_row = dict(existing_row)
+            for col, value in ast.update_cols.items():
+                if col not in table_schema:
+                    raise ValueError(f"Unknown column '{col}' in ON CONFLICT DO UPDATE SET")
+                if hasattr(value, 'evaluate'):
+                    value = value.evaluate(existing_row, table_schema)
+                updated_row[col] = table_schema[col](value)
+            compute_generated_columns(table_obj, updated_row)
+            if database is not None:
+                checked_update(database, table_obj, existing_row, updated_row, deferred=None)
+            else:
+                table_obj.update_row(existing_row, updated_row)
+            
+            print(f"Row updated due to ON CONFLICT DO UPDATE: "
+                  f"Updated existing row with {constraint_type} '{conflict_col}' = '{duplicate_value}'")
+            return False  # Don't insert new row, we updated existing
         
         # This shouldn't happen if our constraint detection is correct
         raise ValueError("Internal error: Could not find conflicting row for update")
@@ -334,7 +410,6 @@ def find_constraint_violation(table_obj, new_row):
     Returns (column_name, constraint_type, duplicate_value) if violation found, None otherwise
     """
     table_constraints = getattr(table_obj, 'constraints', {})
-    table_rows = table_obj.rows
     
     for col_name, constraint in table_constraints.items():
         # Get constraint value (handle both string and object constraints)
@@ -352,15 +427,15 @@ def find_constraint_violation(table_obj, new_row):
         if new_value is None:
             continue
             
-        # Check against existing rows
-        for existing_row in table_rows:
-            existing_value = existing_row.get(col_name)
-            if hasattr(existing_value, 'value'):
-                existing_value = existing_value.value
-                
-            if existing_value == new_value:
-                constraint_type = "primary key" if constraint_value == "PRIMARY KEY" else "unique"
-                return col_name, constraint_type, new_value
+        # Probe the hash index backing the constraint instead of scanning the rows
+        if new_value in table_obj.unique_index(col_name):
+            constraint_type = "primary key" if constraint_value == "PRIMARY KEY" else "unique"
+            return col_name, constraint_type, new_value
+    
+    # Multi-column UNIQUE constraints and unique indexes
+    for index in table_obj.indexes.values():
+        if index.unique and not index.constraint and index.holder_for(new_row) is not None:
+            return index.label, "unique", index.exact_value(new_row)
     
     return None
 
@@ -376,6 +451,11 @@ def extract_identifiers(expr):
         return extract_identifiers(expr.left) + extract_identifiers(expr.right)
     elif isinstance(expr, ConditionExpr):
         return extract_identifiers(expr.left) + extract_identifiers(expr.right)
+    elif isinstance(expr, RowValue):
+        ids = []
+        for item in expr.items:
+            ids.extend(extract_identifiers(item))
+        return ids
     elif isinstance(expr, Function):
         ids = []
         ids.extend(extract_identifiers(expr.expression))
@@ -390,6 +470,9 @@ def extract_identifiers(expr):
     
     elif isinstance(expr, StringFunction):
         return extract_identifiers(expr.expression)
+    
+    elif isinstance(expr, JsonExtract):
+        return extract_identifiers(expr.expression)
 
     return []  # literals, constants, etc.
 
@@ -468,6 +551,10 @@ def get_expr_name(expr):
     elif isinstance(expr, Extract):
         inner = get_expr_name(expr.expression)
         return f"{expr.name}.id({call_id})"
+    elif isinstance(expr, JsonExtract):
+        return f"{expr.name}.id({call_id})"
+    elif isinstance(expr, Match):
+        return f"{expr.name}.id({call_id})"
     
     
 
@@ -481,6 +568,9 @@ def are_same_column(expr1, expr2):
         if isinstance(expr1, Extract):
             return (expr1.part == expr2.part and 
                     are_same_column(expr1.expression, expr2.expression))
+        elif isinstance(expr1, JsonExtract):
+            return (expr1.path == expr2.path and expr1.as_text == expr2.as_text and
+                    are_same_column(expr1.expression, expr2.expression))
         elif isinstance(expr1, CaseWhen):
             # For CASE expressions, check if they have the same structure
             if len(expr1.expressions) != len(expr2.expressions):
@@ -555,7 +645,9 @@ def generate_schema(rows):
         sample_val = samples[0]
         
         # Important: Check bool BEFORE int because isinstance(True, int) returns True in Python!
-        if isinstance(sample_val, bool):
+        if isinstance(sample_val, TemporalValue):
+            schema[col] = temporal_types[type(sample_val)]
+        elif isinstance(sample_val, bool):
             schema[col] = BOOLEAN
         elif isinstance(sample_val, int):
             schema[col] = INT
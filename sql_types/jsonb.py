@@ -0,0 +1,265 @@
+"""
+Binary representation for JSON cells.
+
+A document is parsed once on write and kept as a compact, offset-addressed
+byte string, so path lookups (``->`` / ``->>``) jump straight to the value
+they need instead of running json.loads per row.
+
+Layout (little-endian):
+
+    null / false / true   tag
+    int                   tag, int64
+    big int               tag, u32 length, decimal digits
+    float                 tag, float64
+    string                tag, u32 length, utf-8 bytes
+    array                 tag, u32 total size, u32 count, count * u32 offset, elements
+    object                tag, u32 total size, u32 count, count * (u32 key offset, u32 value offset),
+                          keys and values
+
+Container offsets are relative to the start of the container, so nested
+values can be encoded independently and addressed without copying. Object
+entries are sorted by key bytes and looked up with a binary search; sorting
+also makes the encoding canonical, so equal documents have equal bytes.
+"""
+
+import json
+import struct
+
+TAG_NULL = 0
+TAG_FALSE = 1
+TAG_TRUE = 2
+TAG_INT = 3
+TAG_BIGINT = 4
+TAG_FLOAT = 5
+TAG_STRING = 6
+TAG_ARRAY = 7
+TAG_OBJECT = 8
+
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+_CONTAINER_HEADER = struct.Struct("<BII")   # tag, total size, count
+_ENTRY = struct.Struct("<II")               # key offset, value offset
+
+_INT64_MIN = -(1 << 63)
+_INT64_MAX = (1 << 63) - 1
+
+
+# ---------------- Encoding ----------------
+
+def _encode_string(text):
+    data = text.encode("utf-8")
+    return _U32.pack(len(data)) + data
+
+
+def encode(obj):
+    """Encode a Python value (as produced by json.loads) into the binary form"""
+    if obj is None:
+        return bytes((TAG_NULL,))
+    if obj is True:
+        return bytes((TAG_TRUE,))
+    if obj is False:
+        return bytes((TAG_FALSE,))
+    if isinstance(obj, int):
+        if _INT64_MIN <= obj <= _INT64_MAX:
+            return bytes((TAG_INT,)) + _I64.pack(obj)
+        return bytes((TAG_BIGINT,)) + _encode_string(str(obj))
+    if isinstance(obj, float):
+        return bytes((TAG_FLOAT,)) + _F64.pack(obj)
+    if isinstance(obj, str):
+        return bytes((TAG_STRING,)) + _encode_string(obj)
+    if isinstance(obj, (list, tuple)):
+        elements = [encode(item) for item in obj]
+        offset = _CONTAINER_HEADER.size + _U32.size * len(elements)
+        offsets = []
+        for element in elements:
+            offsets.append(_U32.pack(offset))
+            offset += len(element)
+        return _CONTAINER_HEADER.pack(TAG_ARRAY, offset, len(elements)) + b"".join(offsets) + b"".join(elements)
+    if isinstance(obj, dict):
+        items = sorted((str(key).encode("utf-8"), value) for key, value in obj.items())
+        offset = _CONTAINER_HEADER.size + _ENTRY.size * len(items)
+        entries = []
+        payload = []
+        for key, value in items:
+            key_offset = offset
+            key_data = _U32.pack(len(key)) + key
+            value_data = encode(value)
+            offset += len(key_data)
+            entries.append(_ENTRY.pack(key_offset, offset))
+            offset += len(value_data)
+            payload.append(key_data)
+            payload.append(value_data)
+        return _CONTAINER_HEADER.pack(TAG_OBJECT, offset, len(items)) + b"".join(entries) + b"".join(payload)
+    raise ValueError(f"Cannot store {obj!r} ({type(obj).__name__}) as JSON")
+
+
+# ---------------- Navigation ----------------
+
+def value_size(buf, pos):
+    """Number of bytes taken by the value starting at pos"""
+    tag = buf[pos]
+    if tag in (TAG_NULL, TAG_FALSE, TAG_TRUE):
+        return 1
+    if tag == TAG_INT or tag == TAG_FLOAT:
+        return 9
+    if tag == TAG_STRING or tag == TAG_BIGINT:
+        return 5 + _U32.unpack_from(buf, pos + 1)[0]
+    return _U32.unpack_from(buf, pos + 1)[0]
+
+
+def _read_string(buf, pos):
+    length = _U32.unpack_from(buf, pos)[0]
+    return buf[pos + 4:pos + 4 + length]
+
+
+def object_lookup(buf, pos, key):
+    """Position of the value stored under key in the object at pos, or -1"""
+    key = key.encode("utf-8")
+    count = _U32.unpack_from(buf, pos + 5)[0]
+    entries = pos + _CONTAINER_HEADER.size
+    low, high = 0, count - 1
+    while low <= high:
+        mid = (low + high) // 2
+        key_offset, value_offset = _ENTRY.unpack_from(buf, entries + mid * _ENTRY.size)
+        candidate = _read_string(buf, pos + key_offset)
+        if candidate == key:
+            return pos + value_offset
+        if candidate < key:
+            low = mid + 1
+        else:
+            high = mid - 1
+    return -1
+
+
+def array_lookup(buf, pos, index):
+    """Position of element `index` (negative counts from the end) in the array at pos, or -1"""
+    count = _U32.unpack_from(buf, pos + 5)[0]
+    if index < 0:
+        index += count
+    if not 0 <= index < count:
+        return -1
+    return pos + _U32.unpack_from(buf, pos + _CONTAINER_HEADER.size + index * _U32.size)[0]
+
+
+def decode(buf, pos=0):
+    """Rebuild the Python value stored at pos"""
+    tag = buf[pos]
+    if tag == TAG_NULL:
+        return None
+    if tag == TAG_TRUE:
+        return True
+    if tag == TAG_FALSE:
+        return False
+    if tag == TAG_INT:
+        return _I64.unpack_from(buf, pos + 1)[0]
+    if tag == TAG_FLOAT:
+        return _F64.unpack_from(buf, pos + 1)[0]
+    if tag == TAG_STRING:
+        return bytes(_read_string(buf, pos + 1)).decode("utf-8")
+    if tag == TAG_BIGINT:
+        return int(_read_string(buf, pos + 1))
+    count = _U32.unpack_from(buf, pos + 5)[0]
+    base = pos + _CONTAINER_HEADER.size
+    if tag == TAG_ARRAY:
+        return [decode(buf, pos + _U32.unpack_from(buf, base + i * _U32.size)[0]) for i in range(count)]
+    result = {}
+    for i in range(count):
+        key_offset, value_offset = _ENTRY.unpack_from(buf, base + i * _ENTRY.size)
+        key = bytes(_read_string(buf, pos + key_offset)).decode("utf-8")
+        result[key] = decode(buf, pos + value_offset)
+    return result
+
+
+class JsonDocument:
+    """A JSON value inside an encoded buffer; sub-documents share the parent's buffer"""
+    __slots__ = ("buf", "pos")
+
+    def __init__(self, buf, pos=0):
+        self.buf = buf
+        self.pos = pos
+
+    @classmethod
+    def from_python(cls, obj):
+        return cls(encode(obj))
+
+    @classmethod
+    def from_text(cls, text):
+        try:
+            return cls(encode(json.loads(text)))
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON value: {text!r} ({e})")
+
+    @property
+    def tag(self):
+        return self.buf[self.pos]
+
+    def raw(self):
+        """Encoded bytes of this value alone"""
+        if self.pos == 0:
+            return self.buf
+        return self.buf[self.pos:self.pos + value_size(self.buf, self.pos)]
+
+    def get(self, key):
+        """`->` step: object member (str key) or array element (int key); None when missing"""
+        tag = self.buf[self.pos]
+        if tag == TAG_OBJECT and isinstance(key, str):
+            found = object_lookup(self.buf, self.pos, key)
+        elif tag == TAG_ARRAY and isinstance(key, int) and not isinstance(key, bool):
+            found = array_lookup(self.buf, self.pos, key)
+        else:
+            return None
+        return None if found < 0 else JsonDocument(self.buf, found)
+
+    def path(self, keys):
+        node = self
+        for key in keys:
+            node = node.get(key)
+            if node is None:
+                return None
+        return node
+
+    def scalar(self):
+        """`->>` result: strings, numbers and booleans as Python values, containers as JSON text"""
+        tag = self.buf[self.pos]
+        if tag == TAG_ARRAY or tag == TAG_OBJECT:
+            return str(self)
+        return decode(self.buf, self.pos)
+
+    def to_python(self):
+        return decode(self.buf, self.pos)
+
+    def __str__(self):
+        return json.dumps(self.to_python(), ensure_ascii=False)
+
+    def __repr__(self):
+        return f"JsonDocument({self})"
+
+    def __eq__(self, other):
+        if isinstance(other, JsonDocument):
+            return self.raw() == other.raw()
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.raw())
+
+    # Documents sort by their canonical text (object keys in order), as a TEXT column would
+    def __lt__(self, other):
+        if isinstance(other, JsonDocument):
+            return str(self) < str(other)
+        return NotImplemented
+
+    def __le__(self, other):
+        if isinstance(other, JsonDocument):
+            return str(self) <= str(other)
+        return NotImplemented
+
+    def __gt__(self, other):
+        if isinstance(other, JsonDocument):
+            return str(self) > str(other)
+        return NotImplemented
+
+    def __ge__(self, other):
+        if isinstance(other, JsonDocument):
+            return str(self) >= str(other)
+        return NotImplemented
@@ -1,6 +1,9 @@
 from abc import ABC, abstractmethod
 from typing import Dict, List, Any, Optional, Union
 from datetime import datetime, date, time
+from sql_types.temporal import (TemporalValue, DateOrdinal, TimestampMicros, TimeSeconds,
+                                encode_date, encode_timestamp, encode_time, decode_temporal)
+from sql_types.jsonb import JsonDocument
 
 class SQLType(ABC):
     def __init__(self, value=None):
@@ -55,6 +58,15 @@ class SQLType(ABC):
     def __truediv__(self, other):
         return self.__class__(self.value / (other.value if isinstance(other, SQLType) else other))
 
+    def to_storage(self):
+        """Primitive value written to the database file"""
+        return self.value
+
+    @classmethod
+    def from_storage(cls, raw):
+        """Rebuild a cell from the primitive returned by to_storage()"""
+        return cls(raw)
+
         
 class INT(SQLType):
     """Integer SQL type"""
@@ -144,7 +156,24 @@ class BOOLEAN(SQLType):
     def sql_type_name(self):
         return "class '<bool>'"
         
-class CHAR(SQLType):
+class StringType(SQLType):
+    """Base for CHAR/VARCHAR/TEXT: keeps a lazily built case-folded shadow of the value"""
+    _folded = None
+    _folded_for = None
+
+    @property
+    def folded(self):
+        """Lower-cased value used by case-insensitive comparisons; rebuilt when value changes"""
+        if self._folded_for is not self.value:
+            value = self.value
+            folded = value.lower() if value is not None else None
+            # Share the original string when it is already lower-case
+            self._folded = value if folded == value else folded
+            self._folded_for = value
+        return self._folded
+
+
+class CHAR(StringType):
     def parse(self, value):
         # Convert everything to string first
         if not isinstance(value, str):
@@ -156,7 +185,7 @@ class CHAR(SQLType):
     def sql_type_name(self):
         return "<class 'char'>"
 
-class VARCHAR(SQLType):
+class VARCHAR(StringType):
     def parse(self, value):
         if not isinstance(value, str):
             value = str(value)
@@ -167,7 +196,7 @@ class VARCHAR(SQLType):
     def sql_type_name(self):
         return type(self.value)
         
-class TEXT(SQLType):
+class TEXT(StringType):
     def parse(self, value):
         # Convert anything to string
         if not isinstance(value, str):
@@ -189,7 +218,7 @@ class CurrentDate():
         self.alias = alias
         
     def evaluate(self, row = None, schema= None):
-        return date.today()
+        return encode_date(date.today())
 
 
 class NowFunction():
@@ -209,41 +238,76 @@ class CurrentTime():
         return datetime.now().time().strftime("%H:%M:%S")
 
 
-class DATE(SQLType):
+class TemporalType(SQLType):
+    """Base for DATE/TIMESTAMP/TIME: ``value`` holds the integer encoding from sql_types.temporal"""
+    encoding = TemporalValue
+
+    def validate(self, value):
+        if not isinstance(value, self.encoding):
+            raise ValueError(f"{self.__class__.__name__} expects an encoded {self.encoding.__name__}, got {value} ({type(value)})")
+
+    def to_storage(self):
+        return None if self.value is None else int(self.value)
+
+    @classmethod
+    def from_storage(cls, raw):
+        if raw is None or not isinstance(raw, int):
+            return cls(raw)
+        cell = cls.__new__(cls)
+        cell.value = cls.encoding(raw)
+        cell.sqltype = cell.sql_type_name()
+        return cell
+
+    def __setstate__(self, state):
+        """Re-encode values restored from older files (ISO datetime objects) or as plain ints"""
+        value = self.value
+        if value is None or isinstance(value, self.encoding):
+            return
+        if isinstance(value, int):
+            value = self.encoding(value)
+        self.value = self.parse(value)
+
+
+class DATE(TemporalType):
+    encoding = DateOrdinal
+
     def parse(self, value):
-        # If the value is already a date, just return it
         if value == "CURRENT_DATE":
-            return date.today()
-            
-        if isinstance(value, date):
+            return encode_date(date.today())
+        if isinstance(value, DateOrdinal):
             return value
+        if isinstance(value, TemporalValue):
+            value = value.to_python()
+        if isinstance(value, date):
+            return encode_date(value)
         # If it’s a string, try to parse
         if isinstance(value, str):
             try:
-                return datetime.strptime(value, "%Y-%m-%d").date()
+                return encode_date(datetime.strptime(value, "%Y-%m-%d"))
             except ValueError:
                 raise ValueError(f"Invalid DATE format: {value}. Expected YYYY-MM-DD.")
         # Any other type is invalid
         raise ValueError(f"Cannot convert {value} ({type(value)}) to DATE.")
 
-    def validate(self, value):
-        # Validation just calls parse (raises error if invalid)
-        self.parse(value)
-        
     def evaluate(self):
-        return date.today()
+        return encode_date(date.today())
     def sql_type_name(self):
         return "<class 'date'>"
     
             
-class TIMESTAMP(SQLType):
+class TIMESTAMP(TemporalType):
+    encoding = TimestampMicros
+
     def parse(self, value):
         if value == "NOW":
-            return datetime.now() 
-    
-        
-        if isinstance(value, datetime):
+            return encode_timestamp(datetime.now())
+
+        if isinstance(value, TimestampMicros):
             return value
+        if isinstance(value, TemporalValue):
+            value = value.to_python()
+        if isinstance(value, date):
+            return encode_timestamp(value)
 
         # Already a TIMESTAMP instance
         if isinstance(value, TIMESTAMP):
@@ -256,7 +320,7 @@ class TIMESTAMP(SQLType):
                         "%Y-%m-%dT%H:%M:%S.%f",  # ISO 8601 with microseconds
                         "%Y-%m-%dT%H:%M:%S"):
                 try:
-                    return datetime.strptime(value, fmt)
+                    return encode_timestamp(datetime.strptime(value, fmt))
                 except ValueError:
                     continue
             raise ValueError(
@@ -266,39 +330,35 @@ class TIMESTAMP(SQLType):
 
         raise ValueError(f"Cannot convert {value} ({type(value)}) to TIMESTAMP.")
 
-    def validate(self, value):
-        self.parse(value)
-        
     def evaluate(self):
-        return datetime.now()
+        return encode_timestamp(datetime.now())
     def sql_type_name(self):
             return "<class 'timestamp'>" 
     
             
 
 
-class TIME(SQLType):
+class TIME(TemporalType):
+    encoding = TimeSeconds
+
     def parse(self, value):
-        # If already a time object → keep it
         if value == "CURRENT_TIME":
             value = datetime.now().time().strftime("%H:%M:%S") 
 
-        if isinstance(value, time):
+        if isinstance(value, TimeSeconds):
             return value
+        if isinstance(value, time):
+            return encode_time(value)
         
         # If string → try parsing
         if isinstance(value, str):
             try:
-                return datetime.strptime(value, "%H:%M:%S").time()
+                return encode_time(datetime.strptime(value, "%H:%M:%S"))
             except ValueError:
                 raise ValueError(f"Cannot convert '{value}' to TIME. Format must be HH:MM:SS")
         
         # Anything else → reject
         raise ValueError(f"Cannot convert {value} of type {type(value)} to TIME")
-    
-    def validate(self, value):
-        if not isinstance(value, time):
-            raise ValueError(f"TIME expects a datetime.time object, got {value} ({type(value)})")
         
     def evaluate(self):
         return datetime.now().time().strftime("%H:%M:%S")
@@ -337,6 +397,37 @@ class SERIAL(SQLType):
     def sql_type_name(self):
         return "<class 'auto_increment'>"
         
+class JSON(SQLType):
+    """JSON document, parsed once on write into the binary form from sql_types.jsonb"""
+    def parse(self, value):
+        if isinstance(value, JsonDocument):
+            # Sub-documents (results of ->) get their own buffer
+            return value if value.pos == 0 else JsonDocument(value.raw())
+        if isinstance(value, str):
+            return JsonDocument.from_text(value)
+        if isinstance(value, (dict, list, bool, int, float)):
+            return JsonDocument.from_python(value)
+        raise ValueError(f"Cannot convert {value} of type {type(value)} to JSON")
+
+    def validate(self, value):
+        if not isinstance(value, JsonDocument):
+            raise ValueError(f"JSON expects an encoded document, got {value} ({type(value)})")
+
+    def sql_type_name(self):
+        return "<class 'json'>"
+
+    def to_storage(self):
+        return None if self.value is None else bytes(self.value.raw())
+
+    @classmethod
+    def from_storage(cls, raw):
+        if not isinstance(raw, (bytes, bytearray)):
+            return cls(raw)
+        cell = cls.__new__(cls)
+        cell.value = JsonDocument(bytes(raw))
+        cell.sqltype = cell.sql_type_name()
+        return cell
+
 class NULLVALUE(SQLType):
     def __init__(self, value=None):
         super().__init__(value)
@@ -367,5 +458,13 @@ datatypes = {
     "DATE": DATE,
     "TIME": TIME,
     "NONE": NULLVALUE,
-    "TIMESTAMP": TIMESTAMP
-}
\ No newline at end of file
+    "TIMESTAMP": TIMESTAMP,
+    "JSON": JSON
+}
+
+# Encoded temporal value -> column type, used when inferring schemas from result rows
+temporal_types = {
+    DateOrdinal: DATE,
+    TimestampMicros: TIMESTAMP,
+    TimeSeconds: TIME,
+}
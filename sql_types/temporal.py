@@ -0,0 +1,168 @@
+"""
+Integer encodings for DATE, TIMESTAMP and TIME cells.
+
+Temporal values are stored as plain integers so comparisons, BETWEEN,
+hashing (GROUP BY / DISTINCT) and sorting run as integer operations:
+
+    DATE       -> day ordinal (date.toordinal(), 0001-01-01 == 1)
+    TIMESTAMP  -> microseconds since 1970-01-01 00:00:00 (naive)
+    TIME       -> seconds since midnight
+
+Each encoding is an ``int`` subclass so the kind survives evaluation and
+EXTRACT / DATEDIFF can pick the right kernel without looking at the schema.
+The kernels below work on those integers directly; the ``*_many`` variants
+apply the same kernel to a whole column of values at once (GROUP BY on an
+EXTRACT or DATEDIFF key computes its keys that way).
+"""
+
+from datetime import datetime, date, time, timedelta
+
+SECONDS_PER_DAY = 86400
+US_PER_SECOND = 1_000_000
+US_PER_DAY = SECONDS_PER_DAY * US_PER_SECOND
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+_from_ordinal = date.fromordinal
+
+
+class TemporalValue(int):
+    """Base class for integer-encoded temporal values"""
+    __slots__ = ()
+
+    def to_python(self):
+        raise NotImplementedError
+
+    def __str__(self):
+        return str(self.to_python())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({int(self)})"
+
+    def __format__(self, spec):
+        return format(str(self), spec)
+
+
+class DateOrdinal(TemporalValue):
+    """DATE encoded as a proleptic Gregorian day ordinal"""
+    __slots__ = ()
+
+    def to_python(self):
+        return _from_ordinal(self)
+
+
+class TimestampMicros(TemporalValue):
+    """TIMESTAMP encoded as microseconds since the Unix epoch"""
+    __slots__ = ()
+
+    def to_python(self):
+        return EPOCH + timedelta(microseconds=int(self))
+
+
+class TimeSeconds(TemporalValue):
+    """TIME encoded as seconds since midnight"""
+    __slots__ = ()
+
+    def to_python(self):
+        seconds = int(self)
+        return time(seconds // 3600, (seconds // 60) % 60, seconds % 60)
+
+
+# ---------------- Encoders ----------------
+
+def encode_date(value):
+    if isinstance(value, datetime):
+        value = value.date()
+    return DateOrdinal(value.toordinal())
+
+
+def encode_timestamp(value):
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    delta = value - EPOCH
+    return TimestampMicros((delta.days * SECONDS_PER_DAY + delta.seconds) * US_PER_SECOND + delta.microseconds)
+
+
+def encode_time(value):
+    return TimeSeconds(value.hour * 3600 + value.minute * 60 + value.second)
+
+
+def decode_temporal(value):
+    """Return the datetime/date/time object for an encoded value, anything else unchanged"""
+    if isinstance(value, TemporalValue):
+        return value.to_python()
+    return value
+
+
+# ---------------- Kernels ----------------
+
+def day_number(value):
+    """Day ordinal of a DATE or TIMESTAMP value"""
+    if type(value) is DateOrdinal:
+        return int(value)
+    if type(value) is TimestampMicros:
+        return value // US_PER_DAY + EPOCH_ORDINAL
+    if isinstance(value, (date, datetime)):
+        return value.toordinal()
+    raise ValueError("DATEDIFF requires date arguments")
+
+
+def _seconds_of_day(value):
+    if type(value) is TimeSeconds:
+        return int(value)
+    if type(value) is TimestampMicros:
+        return (value // US_PER_SECOND) % SECONDS_PER_DAY
+    return 0
+
+
+def extract_part(part, value):
+    """EXTRACT(<part> FROM value) on an encoded temporal value"""
+    kind = type(value)
+    if kind is DateOrdinal or kind is TimestampMicros:
+        if part == 'YEAR':
+            return _from_ordinal(day_number(value)).year
+        elif part == 'MONTH':
+            return _from_ordinal(day_number(value)).month
+        elif part == 'DAY':
+            return _from_ordinal(day_number(value)).day
+        seconds = _seconds_of_day(value)
+    elif kind is TimeSeconds:
+        if part in ('YEAR', 'MONTH', 'DAY'):
+            raise ValueError(f"EXTRACT({part}) is not defined for TIME values")
+        seconds = int(value)
+    elif isinstance(value, (date, time)):
+        # Values that did not come from a table cell (e.g. computed on the fly)
+        return getattr(value, part.lower(), 0)
+    else:
+        raise ValueError("EXTRACT Function works Only with DATE & TIME columns")
+
+    if part == 'HOUR':
+        return seconds // 3600
+    elif part == 'MINUTE':
+        return (seconds // 60) % 60
+    elif part == 'SECOND':
+        return seconds % 60
+
+
+def extract_part_many(part, values):
+    """Column-at-a-time EXTRACT; NULLs stay NULL"""
+    return [None if v is None else extract_part(part, v) for v in values]
+
+
+def date_diff(unit, left, right):
+    """DATEDIFF(left, right, unit) on encoded DATE/TIMESTAMP values"""
+    left_day = day_number(left)
+    right_day = day_number(right)
+    unit = unit.lower()
+    if unit in ('years', 'months'):
+        left_date = _from_ordinal(left_day)
+        right_date = _from_ordinal(right_day)
+        years = left_date.year - right_date.year
+        if unit == 'years':
+            return years
+        return years * 12 + (left_date.month - right_date.month)  # Approximate
+    return left_day - right_day
+
+
+def date_diff_many(unit, lefts, rights):
+    return [None if a is None or b is None else date_diff(unit, a, b) for a, b in zip(lefts, rights)]
@@ -32,7 +32,9 @@ def execute_CTA(ast, database):
         sample_val = samples[0]
         
         # Important: Check bool BEFORE int because isinstance(True, int) returns True in Python!
-        if isinstance(sample_val, bool):
+        if isinstance(sample_val, TemporalValue):
+            schema[col] = temporal_types[type(sample_val)]
+        elif isinstance(sample_val, bool):
             schema[col] = BOOLEAN
         elif isinstance(sample_val, int):
             schema[col] = INT
@@ -0,0 +1,14 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from exec.sql_helpers import *
+
+def cluster_table(ast, db_manager):
+    table_name = ast.table_name
+
+    if table_name in db_manager.views:
+        raise ValueError('CLUSTER is not allowed on views, only on tables')
+    elif table_name not in db_manager.active_db:
+        raise TableNotFoundError(table_name)
+    else:
+        db_manager.active_db[table_name].cluster_by(ast.column)
@@ -16,7 +16,9 @@ SQL_KEYWORDS = (
     "ALL", "INTERSECT", "EXCEPT", "RETURNING", "VIEW", "AS", "CALL",
     "DATA", "WITH", "NO", "VIEWS", "MATERIALIZED", "REFRESH", "DROP",
     "TRUNCATE", "WITH", "ALTER", "COLUMN", "RENAME", "TO", "ADD",
-    "CONSTRAINT", "ON", "NAMES"
+    "CONSTRAINT", "ON", "NAMES", "GENERATED", "ALWAYS", "STORED", "INDEX",
+    "CLUSTER", "CLUSTERED", "FOREIGN", "REFERENCES", "DEFERRABLE", "INITIALLY", "DEFERRED",
+    "PARTITION", "PARTITIONS"
     )
 
 # Data type mapping - moved from engine.py  
@@ -33,6 +35,7 @@ DATATYPE_MAPPING = {
     "DATE": DATE,
     "TIME": TIME,
     "TIMESTAMP": TIMESTAMP,
+    "JSON": JSON,
 }
 
 # Token type strings - no need to change these, just centralize them
@@ -44,6 +47,7 @@ class TokenTypes:
     CREATE = "CREATE"
     ALTER = "ALTER"
     TRUNCATE = "TRUNCATE"
+    CLUSTER = "CLUSTER"
     WITH = "WITH"
     DROP = "DROP"
     USE = "USE"
@@ -77,6 +81,13 @@ class TokenTypes:
     ON = "ON"
     LIMIT = "LIMIT"
     BY = "BY"
+    CLUSTERED = "CLUSTERED"
+    PARTITION = "PARTITION"
+    PARTITIONS = "PARTITIONS"
+    REFERENCES = "REFERENCES"
+    DEFERRABLE = "DEFERRABLE"
+    INITIALLY = "INITIALLY"
+    DEFERRED = "DEFERRED"
     ADD = "ADD"
     DATATYPE = "DATATYPE"
     MATH_FUNC = "MATH_FUNC"
@@ -105,6 +116,12 @@ class TokenTypes:
     SHOW = "SHOW"
     RESTRICTION = "RESTS"
     CONSTRAINTS = "CONSTRAINTS"
+    MEMORY = "MEMORY"
+    GENERATED = "GENERATED"
+    ALWAYS = "ALWAYS"
+    STORED = "STORED"
+    INDEX = "INDEX"
+    USING = "USING"
     DATE_AND_TIME = "DATE_AND_TIME"
     CURRENT_DATE = "CURRENT_DATE"
     CURRENT_TIME = "CURRENT_TIME"
@@ -113,6 +130,7 @@ class TokenTypes:
     COALESCE = "COALESCE"
     REFRESH = "REFRESH"
     PRIMARY_KEY = "PRIMARY KEY"
+    FOREIGN_KEY = "FOREIGN KEY"
     NOW = "NOW"
     UNIQUE = "UNIQUE"
     NOT_NULL = "NOT NULL"
@@ -123,6 +141,8 @@ class TokenTypes:
     VIEWS = "VIEW"
     SERIAL = "SERIAL"
     LIKE = "LIKE"
+    ILIKE = "ILIKE"
+    MATCH = "MATCH"
     NOT = "NOT"
     NULLCHECK = "NULLCHECK"
     CALL = "CALL"
@@ -141,6 +161,7 @@ class TokenTypes:
     
     NULL = "NULL"
     MATH_OPERATOR = "MATH_OPERATOR"
+    JSON_PATH = "JSON_PATH"
     CLOSE_PAREN = "CLOSE_PAREN"
 
 # Constraint types
@@ -214,7 +235,9 @@ NULLIF = {"NULLIF"}
 
 REPLACE = {"REPLACE"}
 
-LIKE = {"LIKE"}
+LIKE = {"LIKE", "ILIKE"}
+
+MATCH = {"MATCH"}
 
 ORDER_BY_KEYS ={"ORDER"}
 
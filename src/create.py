@@ -15,10 +15,78 @@ def create_new_view(ast, db_manager):
         
 def execute_create_table_statement(ast, database):
 
-        table = Table(ast.table_name, ast.schema, ast.defaults, ast.auto, ast.constraints, ast.restrictions, ast.private_constraints, ast.constraints_ptr)
+        table = Table(ast.table_name, ast.schema, ast.defaults, ast.auto, ast.constraints, ast.restrictions, ast.private_constraints, ast.constraints_ptr, getattr(ast, 'generated', None))
         if ast.table_name in database.active_db:
             raise ValueError('Table Already Exists')
+        # Multi-column UNIQUE (a, b) is enforced by a unique composite index
+        for columns in getattr(ast, 'unique_keys', []):
+            table.create_index(f"{ast.table_name}_{'_'.join(columns)}_key", columns, unique=True)
+        if getattr(ast, 'partitioning', None):
+            table.partition_by(*ast.partitioning)
+        if getattr(ast, 'cluster_key', None):
+            table.cluster_by(ast.cluster_key)
+        if getattr(ast, 'references', None):
+            table.references = resolve_references(ast, table, database.active_db)
+            table.sync_constraint_indexes()
         database.active_db[ast.table_name] = table
+
+
+def resolve_references(ast, table, database):
+    """
+    The FOREIGN KEYs of a new table as (parent, parent column, deferred),
+    a missing parent column standing for the parent's primary key. Only a
+    PRIMARY KEY or UNIQUE column can be referenced, since each check is a
+    probe of its index.
+    """
+    references = {}
+    for column, (parent, parent_column, deferred) in ast.references.items():
+        # A table may reference itself (a tree of rows)
+        parent_table = table if parent == ast.table_name else database.get(parent)
+        if parent_table is None:
+            raise TableNotFoundError(parent)
+        if parent_column is None:
+            keys = [col for col, constraint in parent_table.constraints.items()
+                    if getattr(constraint, 'value', constraint) == TokenTypes.PRIMARY_KEY]
+            if not keys:
+                raise ValueError(f"Table '{parent}' has no PRIMARY KEY for '{ast.table_name}.{column}' to reference")
+            parent_column = keys[0]
+        if parent_column not in parent_table.schema:
+            raise ColumnNotFoundError(parent_column, parent)
+        if parent_column not in parent_table.unique_columns():
+            raise ValueError(f"Column '{parent_column}' of table '{parent}' is not a PRIMARY KEY or UNIQUE column, "
+                             f"so '{ast.table_name}.{column}' cannot reference it")
+        if getattr(table.schema[column], '__name__', None) == 'JSON':
+            raise ValueError(f"Column '{column}' of type JSON cannot be a FOREIGN KEY")
+        references[column] = (parent, parent_column, deferred)
+    return references
+        
+
+# Index keys are computed once per row and kept, so they may only depend on that row
+INDEXABLE_EXPRESSIONS = (ColumnExpression, LiteralExpression, BinaryOperation, StringFunction, Replace, Concat,
+                         Cast, MathFunction, Extract, CoalesceFunction, NullIF, DateDIFF, JsonExtract)
+
+
+def check_index_expression(expr, label):
+    if not isinstance(expr, INDEXABLE_EXPRESSIONS):
+        raise ValueError(f"Cannot index {label}: only deterministic expressions over the row's own columns can be indexed")
+    for value in vars(expr).values():
+        for child in (value if isinstance(value, (list, tuple)) else [value]):
+            if hasattr(child, 'evaluate'):
+                check_index_expression(child, label)
+
+
+def execute_create_index_statement(ast, database):
+        if ast.table_name not in database.active_db:
+            raise TableNotFoundError(ast.table_name)
+        for table in database.active_db.values():
+            if ast.index_name in table.indexes:
+                raise ValueError(f"Index '{ast.index_name}' already exists")
+        expressions = getattr(ast, 'expressions', None)
+        for label, expression in zip(ast.columns, expressions or []):
+            if expression is not None:
+                check_index_expression(expression, label)
+        database.active_db[ast.table_name].create_index(ast.index_name, ast.columns, ast.unique, getattr(ast, 'method', "BTREE"),
+                                                               getattr(ast, 'predicate', None), expressions)
         
 
 def execute_create_database_statement(ast, database):
@@ -2,6 +2,8 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from exec.sql_helpers import *
+from exec.planner import candidate_rows
+from exec.foreign_keys import check_referenced
 
 def execute_delete_query(ast, database):
     if ast.table not in database:
@@ -9,16 +11,14 @@ def execute_delete_query(ast, database):
     if ast.where == None:
         raise ValueError('Deleting all rows using DELETE statement is NOT allowed, use TRUNCATE TABLE <table_name> instead')
     table_obg = database[ast.table]
-    table_rows = table_obg.rows
     table_schema = table_obg.schema
-    n = 0
-    deleted_rows = []
-    for i in range(len(table_rows) - 1, -1, -1):  # start from last data row
-        row = table_rows[i]
-        if ast.where.evaluate(row, table_schema):
-            deleted_rows.append(table_rows[i])
-            del table_rows[i]
-            n += 1
-    print(f"{n} rows were deleted")
+    candidates = candidate_rows(table_obg, ast.where)
+    if candidates is None:
+        candidates = table_obg.rows
+    deleted_rows = [row for row in candidates if ast.where.evaluate(row, table_schema)]
+    # Rows of the same table that reference a deleted row go with it
+    check_referenced(database, table_obg, deleted_rows, leaving=deleted_rows)
+    table_obg.delete_rows(deleted_rows)
+    print(f"{len(deleted_rows)} rows were deleted")
     return deleted_rows
     
\ No newline at end of file
@@ -2,6 +2,7 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from exec.sql_helpers import *
+from exec.foreign_keys import referencing
 
 def drop_database(ast, db_manager):
     import os
@@ -28,12 +29,23 @@ def get_databse_path(db_name ,database):
     return None
         
         
+def drop_index(ast, database):
+    for table in database.active_db.values():
+        if ast.index_name in table.indexes:
+            table.drop_index(ast.index_name)
+            return
+    raise ValueError(f"Index '{ast.index_name}' does not exist")
+
+
 def drop_table(ast, database):
     
     if ast.table_name not in database.active_db:
         raise TableNotFoundError(ast.table_name)
     elif str(ast.table_name)+'._mt_view' in database.views:
         raise ValueError('You are trying to Drop a MATERIALIZED VIEW, use DROP MATERIALIZED VIEW <view_name> instead')
+    for child, column, _, _ in referencing(database.active_db, ast.table_name):
+        if child.name != ast.table_name:
+            raise ValueError(f"Cannot drop table '{ast.table_name}' because column '{column}' of table '{child.name}' references it")
     del database.active_db[ast.table_name]
     
     
@@ -2,6 +2,7 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from exec.sql_helpers import *
+from exec.foreign_keys import check_references
 
 def execute_insert_query(ast, database):
     table_name = ast.table
@@ -10,7 +11,6 @@ def execute_insert_query(ast, database):
         raise ValueError(f"Table '{table_name}' does not exist")
     
     table_obj = database[table_name]
-    table_rows = table_obj.rows
     table_schema = table_obj.schema
     table_default = table_obj.defaults
     table_auto = table_obj.auto
@@ -24,7 +24,9 @@ def execute_insert_query(ast, database):
         values = object.values
         
         if not columns:
-            columns = [col for col in table_schema.keys()]
+            columns = [col for col in table_schema.keys() if col not in table_obj.generated]
+        
+        reject_generated_columns(table_obj, columns)
         
         if len(values) != len(columns):
             raise ValueError(
@@ -36,6 +38,8 @@ def execute_insert_query(ast, database):
         new_row = {}
         temp_auto_values = {}
         for col_object, col_val in table_schema.items():
+            if col_object in table_obj.generated:
+                continue  # computed once the rest of the row is known
             if col_object in columns:
                 idx = columns.index(col_object)
                 val = values[idx]
@@ -61,15 +65,25 @@ def execute_insert_query(ast, database):
                 if not table_restrictions[col_object].evaluate(new_row, table_schema):
                     raise ValueError(f"new row for relation '{table_name}' violates check constraint of column <{col_object}>")
         
+        compute_generated_columns(table_obj, new_row)
+        
         violation = find_constraint_violation(table_obj, new_row)
-        should_insert = handle_conflict_resolution(ast, violation, table_obj, new_row)
+        should_insert = handle_conflict_resolution(ast, violation, table_obj, new_row, database)
         
         for col, val in temp_auto_values.items():
             table_auto[col].current += 1
             
         if should_insert:
-            table_rows.append(new_row)
+            check_references(database, table_obj, [new_row])
+            table_obj.insert_row(new_row)
             inserted_rows.append(new_row)  # Add to our tracking list
             print(f"Row successfully inserted into table '{table_name}'")
     
+    if any(deferred for _, _, deferred in table_obj.references.values()):
+        # DEFERRABLE references: checked once per distinct key, so rows may also point at rows inserted after them
+        try:
+            check_references(database, table_obj, inserted_rows, deferred=True)
+        except ForeignKeyError:
+            table_obj.delete_rows(inserted_rows)
+            raise
     return inserted_rows  # Return all inserted rows
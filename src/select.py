@@ -2,10 +2,17 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from exec.sql_helpers import *
+import heapq
+from itertools import groupby
+from sql_types.temporal import extract_part_many, date_diff_many
+from exec.planner import (candidate_rows, exact_scans, index_aggregates, table_aggregates, index_groups, index_order,
+                          index_top, index_seek, ordered_scan, scan_order, ClusterScan)
+from exec.advisor import ADVICE_TABLE, index_advice
 
 
 def execute_select_query(ast, db_manager):
 
+    table_obj = None
     
     # Hamdle Non From Queries
     if not ast.table:
@@ -29,14 +36,19 @@ def execute_select_query(ast, db_manager):
         table_name = ast.table.table_name
         database = db_manager.active_db
         
-        if table_name not in database and table_name not in db_manager.views:
+        if table_name not in database and table_name not in db_manager.views and table_name != ADVICE_TABLE:
             raise ValueError(f"Table '{table_name}' does not exist")
         elif table_name in database:
-            table = database[table_name].rows
-            table_schema = database[table_name].schema
+            table_obj = database[table_name]
+            table = table_obj.rows
+            table_schema = table_obj.schema
         elif table_name in db_manager.views:
             table = db_manager.views[table_name].evaluate()
             table_schema = generate_schema(table)
+        else:
+            # Index advisor suggestions drawn from the recent statements
+            table = index_advice(db_manager)
+            table_schema = generate_schema(table)
     else:
         
         table_name = str(ast.table.table_name)
@@ -45,8 +57,9 @@ def execute_select_query(ast, db_manager):
         if table_name not in database and table_name not in db_manager.views:
             raise ValueError(f"Table '{table_name}' does not exist")
         elif table_name in database:
-            table = database[table_name].rows
-            table_schema = database[table_name].schema
+            table_obj = database[table_name]
+            table = table_obj.rows
+            table_schema = table_obj.schema
         elif table_name in db_manager.views:
             table = db_manager.views[table_name].evaluate()
             table_schema = generate_schema(table)
@@ -129,17 +142,7 @@ def execute_select_query(ast, db_manager):
                     if is_regular_column:
                         raise ValueError(f"Column '{col}' must appear in the GROUP BY clause or be used in an aggregate function")
     
-    # Filter rows based on WHERE clause
-
-    filtered_rows = []
-    for row in table:
-        if ast.where is None or ast.where.evaluate(row, table_schema):
-            filtered_rows.append(row)
-            
-
-    result = []
-    
-    # Handle GROUP BY queries
+    resolved_group_by = []
     if ast.group_by and ast.function_columns:
         # Build alias-to-expression mapping
         alias_to_expr = {}
@@ -149,7 +152,6 @@ def execute_select_query(ast, db_manager):
                 alias_to_expr[expr.alias] = expr
         
         # Resolve GROUP BY expressions that might be aliases
-        resolved_group_by = []
         for group_expr in ast.group_by:
             if (isinstance(group_expr, ColumnExpression) and 
                 group_expr.column_name in alias_to_expr):
@@ -157,27 +159,131 @@ def execute_select_query(ast, db_manager):
                 resolved_group_by.append(alias_to_expr[group_expr.column_name])
             else:
                 resolved_group_by.append(group_expr)
-        groups = {}
-        for row in filtered_rows:
-            bucket_key = tuple(expr.evaluate(row, table_schema) for expr in resolved_group_by)
-            if bucket_key not in groups:
-                groups[bucket_key] = []
-            groups[bucket_key].append(row)
+    group_key = resolved_group_by[0] if len(resolved_group_by) == 1 else None
 
-        # Apply HAVING with proper context
-        if ast.having:
-            results = {}
-            for bucket_key, group_rows in groups.items():
+    # Filter rows based on WHERE clause
+
+    filtered_rows = None
+    index_values = None
+    presorted = None        # ast.order_by once the rows are already in that order
+    skipped = 0             # OFFSET rows already left out by an index scan
+    ordered_on = None       # expression the rows arrive in ascending order of, equal values together
+    if (table_obj is not None and ast.limit and ast.order_by and len(ast.order_by) == 1
+            and not ast.function_columns and not ast.group_by and not ast.distinct):
+        # ORDER BY MATCH(...) DESC LIMIT k: the best k rows straight from a full-text index
+        filtered_rows = index_top(table_obj, ast.order_by[0], ast.where, int(ast.limit) + int(ast.offset or 0))
+        if filtered_rows is not None:
+            presorted = ast.order_by
+    if (table_obj is not None and filtered_rows is None and ast.order_by
+            and not ast.function_columns and not ast.group_by and not ast.distinct
+            and not any(_renames(ast.columns, getattr(clause.expression, 'column_name', None)) for clause in ast.order_by)):
+        # ORDER BY an indexed or clustering key: walk the rows in that order from WHERE's key,
+        # so the first k passing WHERE are the answer (keyset pagination)
+        k = int(ast.limit) + int(ast.offset or 0) if ast.limit else None
+        seek = index_seek(table_obj, ast.order_by, ast.where, k)
+        if seek is not None:
+            if seek.exact:
+                # The OFFSET rows are passed over inside the scan
+                skipped = int(ast.offset or 0)
+            filtered_rows = []
+            for row in seek.rows(skipped):
+                if seek.exact or ast.where.evaluate(row, table_schema):
+                    filtered_rows.append(row)
+                    if k is not None and len(filtered_rows) >= k - skipped:
+                        break
+            presorted = ast.order_by
+    if table_obj is not None and filtered_rows is None:
+        if ast.function_columns and not ast.columns and not ast.group_by:
+            if ast.where is None:
+                # Totals over the whole table are kept up to date by every write
+                index_values = table_aggregates(table_obj, ast.function_columns)
+            if index_values is None:
+                # COUNT / MIN / MAX read off an index without visiting the rows
+                index_values = index_aggregates(table_obj, ast.function_columns, ast.where)
+        scans = exact_scans(table_obj, ast.where) if index_values is None else []
+        if scans:
+            # WHERE is exactly an index range: rows outside it are never visited or re-checked
+            scan = min(scans, key=lambda scan: scan.count())
+            filtered_rows = scan.rows()
+            if isinstance(scan, ClusterScan) and scan_order(table_obj) is not None:
+                ordered_on = ColumnExpression(table_obj.cluster_key)
+        elif index_values is None:
+            # An index can narrow the scan to candidate rows; WHERE is still checked on each of them
+            candidates = candidate_rows(table_obj, ast.where, adaptive=True)
+            ordered = ordered_scan(table_obj, group_key) if candidates is None and group_key is not None else None
+            if candidates is not None:
+                table = candidates
+            elif ordered is not None:
+                # Scan in GROUP BY key order, which an index or the clustering gives for free
+                table = ordered
+                ordered_on = group_key
+            elif scan_order(table_obj) is not None:
+                ordered_on = ColumnExpression(table_obj.cluster_key)
+    if filtered_rows is None and index_values is None and resolved_group_by:
+        # Grouping takes the rows one at a time, and may stop early or not need them at all
+        filtered_rows = (row for row in table if ast.where is None or ast.where.evaluate(row, table_schema))
+    elif filtered_rows is None and index_values is None:
+        filtered_rows = []
+        for row in table:
+            if ast.where is None or ast.where.evaluate(row, table_schema):
+                filtered_rows.append(row)
+            
+
+    result = []
+    
+    # Handle GROUP BY queries
+    if ast.group_by and ast.function_columns:
+        groups = None
+        in_key_order = False    # groups come out in ascending order of the single grouping key
+        if table_obj is not None and ast.where is None:
+            # Buckets straight from an index on the grouping expression
+            groups = index_groups(table_obj, resolved_group_by)
+        if groups is None and ordered_on is not None and expressions_are_equivalent(ordered_on, group_key):
+            # The rows arrive sorted on the key: each group is one run, aggregated as soon as the key changes
+            runs = groupby(filtered_rows, lambda row: (group_key.evaluate(row, table_schema),))
+            groups = ((bucket_key, list(run)) for bucket_key, run in runs)
+        if groups is None:
+            buckets = {}
+            keys = None
+            if group_key is not None and isinstance(group_key, (Extract, DateDIFF)):
+                filtered_rows = list(filtered_rows)
+                keys = _temporal_keys(filtered_rows, group_key, table_schema)
+            if keys is None:
+                keyed = ((tuple(expr.evaluate(row, table_schema) for expr in resolved_group_by), row)
+                         for row in filtered_rows)
+            else:
+                keyed = (((key,), row) for key, row in zip(keys, filtered_rows))
+            for bucket_key, row in keyed:
+                if bucket_key not in buckets:
+                    buckets[bucket_key] = []
+                buckets[bucket_key].append(row)
+            groups = buckets.items()
+        else:
+            in_key_order = True
+
+        descending = False
+        if in_key_order and ast.order_by and len(ast.order_by) == 1 and _orders_group_key(ast, group_key):
+            # ORDER BY the grouping key: the groups are already in that order (or its reverse)
+            presorted = ast.order_by
+            descending = ast.order_by[0].direction == "DESC"
+        stop = None
+        if in_key_order and ast.limit and not ast.distinct and (not ast.order_by or (presorted and not descending)):
+            # The first LIMIT groups are the answer: the rest of the rows are never read
+            stop = int(ast.limit) + int(ast.offset or 0)
+        null_groups = 0         # the NULL key's group, which leads in key order
+
+        # Build result rows
+        for bucket_key, group_rows in groups:
+            # Apply HAVING with proper context
+            if ast.having:
                 try:
-                    if ast.having.evaluate(group_rows, table_schema):
-                        results[bucket_key] = group_rows
+                    if not ast.having.evaluate(group_rows, table_schema):
+                        continue
                 except Exception as e:
                     print(f"Warning: Error evaluating HAVING clause for group {bucket_key}: {e}") 
                     continue
-            groups = results
-        
-        # Build result rows
-        for bucket_key, group_rows in groups.items():
+            if in_key_order and bucket_key[0] is None:
+                null_groups = 1
             result_row = {}
             
             # Add regular SELECT columns (non-aggregates)
@@ -217,6 +323,11 @@ def execute_select_query(ast, db_manager):
                 result_row[output_name] = func.evaluate(group_rows, table_schema)
             
             result.append(serialize_row(result_row))
+            if stop is not None and len(result) >= stop:
+                break
+        if descending:
+            # NULLs still come first, as the sort puts them
+            result = result[:null_groups] + result[:null_groups - 1 if null_groups else None:-1]
     
             
             # Add regular SELECT columns (must be in GROUP BY)
@@ -226,7 +337,10 @@ def execute_select_query(ast, db_manager):
     
     elif ast.function_columns and not ast.columns:
         result_row = {}
-        for func in ast.function_columns:
+        for i, func in enumerate(ast.function_columns):
+            if index_values is not None:
+                result_row[func.alias or get_expr_name(func)] = index_values[i]
+                continue
             # Aggregate functions need the full list of filtered rows
             result_row[func.alias or get_expr_name(func)] = func.evaluate(filtered_rows, table_schema)
         result.append(serialize_row(result_row))
@@ -238,6 +352,31 @@ def execute_select_query(ast, db_manager):
     # Handle regular SELECT queries (no aggregates, no GROUP BY)  
       
     else:
+        if (presorted is None and ordered_on is not None and ast.order_by and len(ast.order_by) == 1
+                and ast.order_by[0].direction == "ASC" and expressions_are_equivalent(ast.order_by[0].expression, ordered_on)
+                and not _renames(ast.columns, ordered_on.column_name)):
+            # The rows came from a table clustered by the ORDER BY column, already in order
+            presorted = ast.order_by
+        if (presorted is None and table_obj is not None and ast.where is None and ast.order_by and len(ast.order_by) == 1
+                and not isinstance(ast.order_by[0].expression, ColumnExpression)):
+            # ORDER BY an indexed expression: walk the index instead of sorting
+            ordered = index_order(table_obj, ast.order_by[0].expression, ast.order_by[0].direction == "DESC")
+            if ordered is not None:
+                filtered_rows = ordered
+                presorted = ast.order_by
+        if (presorted is None and ast.order_by and len(ast.order_by) == 1
+                and isinstance(ast.order_by[0].expression, Match) and not ast.distinct):
+            # Rank by relevance on the rows themselves, since the text column need not be selected;
+            # with a LIMIT a heap keeps only the best k instead of sorting every row
+            clause = ast.order_by[0]
+            score = lambda row: clause.expression.evaluate(row, table_schema)
+            if ast.limit:
+                k = int(ast.limit) + int(ast.offset or 0)
+                pick = heapq.nlargest if clause.direction == "DESC" else heapq.nsmallest
+                filtered_rows = pick(k, filtered_rows, key=score)
+            else:
+                filtered_rows = sorted(filtered_rows, key=score, reverse=(clause.direction == "DESC"))
+            presorted = ast.order_by
         for row in filtered_rows:
             selected_row = {}
             for col in ast.columns:
@@ -270,7 +409,7 @@ def execute_select_query(ast, db_manager):
         result = unique_rows
     
     # Apply ORDER BY if specified
-    if ast.order_by:
+    if ast.order_by and presorted is None:
         # Build set of available columns in result
         available_columns = set()
         if result:
@@ -289,8 +428,8 @@ def execute_select_query(ast, db_manager):
             if hasattr(expr, 'alias') and expr.alias:
                 alias_to_expr[expr.alias] = expr
         
-        # Process each ORDER BY clause
-        for order_by_clause in ast.order_by:
+        # Process each ORDER BY clause, last first: each stable sort keeps the order of the ones after it among ties
+        for order_by_clause in reversed(ast.order_by):
             expression = order_by_clause.expression
             direction = order_by_clause.direction
             
@@ -379,9 +518,65 @@ def execute_select_query(ast, db_manager):
     if ast.limit:
         
         if ast.offset:
-            result = result[int(ast.offset):]
+            result = result[int(ast.offset) - skipped:]
         result = result[:int(ast.limit)]
     
-    return result 
+    return result
+
+
+def _renames(columns, column):
+    """Whether a select-list item other than column itself is output under column's name"""
+    return any(getattr(col, 'alias', None) == column
+               and not (isinstance(col, ColumnExpression) and col.column_name == column)
+               for col in columns)
+
+
+def _orders_group_key(ast, group_key):
+    """Whether the single ORDER BY clause sorts a GROUP BY result by the grouping key group_key"""
+    key_name = getattr(group_key, 'alias', None) or get_expr_name(group_key)
+    for col in ast.columns:
+        if not isinstance(col, Function) and are_same_column(col, group_key):
+            key_name = col.alias or get_expr_name(col)
+            break
+    expression = ast.order_by[0].expression
+    if isinstance(expression, ColumnExpression):
+        # Looked up by name in the result row, where the key is output under key_name
+        return expression.column_name == key_name and not any(
+            (func.alias or get_expr_name(func)) == key_name for func in ast.function_columns)
+    for select_expr in (ast.columns or []) + (ast.function_columns or []):
+        if expressions_are_equivalent(expression, select_expr):
+            return (select_expr.alias or get_expr_name(select_expr)) == key_name
+    return False
+
+
+def _temporal_keys(rows, expr, table_schema):
+    """
+    Values of an EXTRACT or DATEDIFF grouping key over plain columns and
+    literals for all of rows, computed a column at a time by the temporal
+    kernels; None for any other form of the expression
+    """
+    if not rows:
+        return None
 
+    def column(operand):
+        if isinstance(operand, ColumnExpression) and operand.column_name in table_schema:
+            cells = [row.get(operand.column_name) for row in rows]
+            return [cell.value if isinstance(cell, SQLType) else cell for cell in cells]
+        if isinstance(operand, LiteralExpression):
+            value = operand.evaluate({}, table_schema)
+            return [DATE(value).value if isinstance(value, str) else value] * len(rows)
+        return None
 
+    if isinstance(expr, Extract):
+        values = column(expr.expression) if isinstance(expr.expression, ColumnExpression) else None
+        return None if values is None else extract_part_many(expr.part, values)
+    unit = expr.unit.evaluate({}, table_schema) if isinstance(expr.unit, LiteralExpression) else expr.unit
+    lefts, rights = column(expr.date1), column(expr.date2)
+    if not isinstance(unit, str) or lefts is None or rights is None:
+        return None
+    # String values are read as DATEs, as DATEDIFF does row by row
+    if any(isinstance(value, str) for value in lefts):
+        lefts = [DATE(value).value if isinstance(value, str) else value for value in lefts]
+    if any(isinstance(value, str) for value in rights):
+        rights = [DATE(value).value if isinstance(value, str) else value for value in rights]
+    return date_diff_many(unit, lefts, rights)
@@ -2,6 +2,7 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from exec.sql_helpers import *
+from exec.foreign_keys import check_truncate
 
 def truncate_table(ast, db_manager):
     table_name = ast.table_name
@@ -12,4 +13,5 @@ def truncate_table(ast, db_manager):
     elif table_name not in db_manager.active_db:
         raise TableNotFoundError(table_name)
     else:
-        db_manager.active_db[table_name].rows = []
\ No newline at end of file
+        check_truncate(db_manager.active_db, db_manager.active_db[table_name])
+        db_manager.active_db[table_name].truncate()
\ No newline at end of file
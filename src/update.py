@@ -2,26 +2,50 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from exec.sql_helpers import *
+from exec.planner import candidate_rows
+from exec.foreign_keys import referencing, check_references, check_referenced, checked_update
 
 def execute_update_query(ast, database):
     table_name = ast.table
     if table_name not in database:
         raise ValueError(f"Table '{table_name}' does not exist")
     table_obj = database[table_name]
-    table_rows = table_obj.rows
     table_schema = table_obj.schema
     cnt = 0
     for column in ast.columns.keys():
         if column not in table_schema:
             raise ValueError(f"Column '{column}' does not exist")
+    reject_generated_columns(table_obj, ast.columns)
 
     inserted_rows = []
-    for row in table_rows:
-        if ast.where is None or ast.where.evaluate(row, table_schema):
-            for col, expression in ast.columns.items():
-                row[col] = expression.evaluate(row ,table_schema)
-                inserted_rows.append(row)
-                cnt += 1
+    # Locate target rows through an index when one narrows the WHERE; the WHERE is still checked per row
+    candidates = candidate_rows(table_obj, ast.where)
+    if candidates is None:
+        candidates = table_obj.rows
+    targets = [row for row in candidates if ast.where is None or ast.where.evaluate(row, table_schema)]
+    # FOREIGN KEYs from or to this table: the immediate ones are checked row by row, the deferred ones at the end
+    checked = bool(table_obj.references or referencing(database, table_name))
+    previous = []
+    for row in targets:
+        updated_row = dict(row)
+        for col, expression in ast.columns.items():
+            # Store typed cells, like INSERT does, so DATE/TIME values keep their encoding
+            updated_row[col] = table_schema[col](expression.evaluate(row ,table_schema))
+        compute_generated_columns(table_obj, updated_row)
+        if checked:
+            previous.append((row, checked_update(database, table_obj, row, updated_row)))
+        else:
+            table_obj.update_row(row, updated_row)
+        inserted_rows.append(row)
+        cnt += 1
+    if checked:
+        try:
+            check_references(database, table_obj, targets, deferred=True)
+            check_referenced(database, table_obj, [old for _, old in previous], deferred=True)
+        except ForeignKeyError:
+            for row, old in reversed(previous):
+                table_obj.update_row(row, old)
+            raise
             
     print(f"{cnt} row(s) updated in '{table_name}'")
     return inserted_rows
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+Running aggregates a table keeps per column, so that COUNT / SUM / AVG /
+MIN / MAX over the whole table (no WHERE, no GROUP BY) are answered
+without visiting the rows.
+
+A column's ColumnTotals is started by the first query asking for it and
+from then on kept in step by every INSERT, UPDATE and DELETE (see
+Table._tally()), so columns nobody aggregates cost writes nothing. The row
+count itself needs no totals: it is len(table.rows).
+"""
+
+import math
+
+# Column types whose values SUM and AVG accept
+NUMERIC_TYPES = ("INT", "FLOAT", "SERIAL")
+
+# Sums are kept as integer multiples of 2 ** -SCALE, the smallest float step, which every float is
+SCALE = 1074
+
+
+class ColumnTotals:
+    """
+    COUNT, SUM, MIN and MAX of the non-NULL values of one column.
+
+    The sum is exact (an integer count of 2 ** -SCALE), so removing a value
+    takes back exactly what adding it put in, and a float sum comes out
+    correctly rounded, as math.fsum() over the values would give it. An
+    insert can only widen MIN / MAX; removing the value holding either one
+    leaves them unknown until refresh() reads the column again.
+    """
+
+    def __init__(self, column, numeric, version):
+        self.column = column
+        self.numeric = numeric
+        self.version = version      # table version the totals are in step with
+        self.count = 0
+        self.total = 0
+        self.floats = 0             # float values in the sum; with none it is an int
+        self.summable = numeric     # False once a value the exact sum cannot hold (inf, nan) went in
+        self.low = None
+        self.high = None
+        self.stale = False          # MIN / MAX lost to a removed value
+
+    def add(self, value):
+        if value is None:
+            return
+        self.count += 1
+        if self.summable:
+            self._sum(value, 1)
+        if not self.stale:
+            if self.low is None or value < self.low:
+                self.low = value
+            if self.high is None or value > self.high:
+                self.high = value
+
+    def discard(self, value):
+        if value is None:
+            return
+        self.count -= 1
+        if not self.count:
+            self.total, self.floats, self.summable = 0, 0, self.numeric
+            self.low = self.high = None
+            self.stale = False
+            return
+        if self.summable:
+            self._sum(value, -1)
+        if not self.stale and (value <= self.low or value >= self.high):
+            self.stale = True
+
+    def _sum(self, value, sign):
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                self.summable = False
+                return
+            self.floats += sign
+            numerator, denominator = value.as_integer_ratio()
+            # denominator is a power of two, 2 ** (bit_length - 1)
+            units = numerator << (SCALE + 1 - denominator.bit_length())
+        else:
+            units = value << SCALE
+        self.total += units if sign > 0 else -units
+
+    def refresh(self, values):
+        """Recompute MIN / MAX from the column's values (NULLs included)"""
+        present = [value for value in values if value is not None]
+        self.low = min(present, default=None)
+        self.high = max(present, default=None)
+        self.stale = False
+
+    def value(self, name):
+        """(value,) of aggregate name over the column, or None when the totals cannot give it"""
+        if name == "COUNT":
+            return (self.count,)
+        if name in ("MIN", "MAX"):
+            if self.stale:
+                return None
+            return (self.low if name == "MIN" else self.high,)
+        if name not in ("SUM", "AVG") or not self.summable:
+            return None
+        if not self.count:
+            return (None,)
+        if not self.floats:
+            total = self.total >> SCALE
+        else:
+            try:
+                # int / int is correctly rounded
+                total = self.total / (1 << SCALE)
+            except OverflowError:
+                return None
+        return (total if name == "SUM" else total / self.count,)
@@ -5,11 +5,48 @@ import os
 import platform
 import msgpack
 # from .datatypes import datatypes, SERIAL # assuming Lexer.datatypes contains your SQLType classes
-from sql_types.sql_types import datatypes, SERIAL
+from sql_types.sql_types import datatypes, SERIAL, SQLType
 import random
 from storage.table import *
 from storage.serialize import *
 from storage.deserialize import *
+
+
+def encode_rows(rows):
+    """Rows in file form: cells as primitives (temporal values as their integer encoding)"""
+    return [{col: row[col].to_storage() if isinstance(row[col], SQLType) else deep_serialize(row[col]) for col in row}
+            for row in rows]
+
+
+def decode_rows(schema, rows):
+    """Rows from their file form back to SQLType cells"""
+    decoded = []
+    for row_dict in rows:
+        row = {}
+        for col in row_dict:
+            raw_value = row_dict[col]
+            if raw_value is None or isinstance(raw_value, (str, int, float, bool, bytes)):
+                row[col] = schema[col].from_storage(raw_value)
+                continue
+            # Files written before cells were stored as primitives
+            deserialized_value = deep_deserialize(raw_value)
+            if not hasattr(deserialized_value, '__dict__') or isinstance(deserialized_value, (str, int, float, bool)):
+                row[col] = schema[col](deserialized_value)
+            else:
+                row[col] = deserialized_value
+        decoded.append(row)
+    return decoded
+
+
+def dump_partitions(table):
+    """A partitioned table's partition definitions, each with its own rows"""
+    definition = table.partitioning.dump()
+    for number, entry in enumerate(definition["partitions"]):
+        start, stop = table.partitioning.span(number)
+        entry["rows"] = encode_rows(table.rows[start:stop])
+    return definition
+
+
 class DatabaseManager:
     def __init__(self):
         home = os.path.expanduser("~")
@@ -97,11 +134,17 @@ class DatabaseManager:
                     "restrictions": {col: deep_serialize(table.restrictions[col]) for col in table.restrictions},
                     "private_constraints": {col: deep_serialize(table.private_constraints[col]) for col in table.private_constraints},
                     "constraints_ptr": {col: deep_serialize(table.constraints_ptr[col]) for col in table.constraints_ptr},
-                    "rows": [
-                        {col: deep_serialize(row[col]) for col in row}
-                        for row in table.rows
-                    ]
+                    "generated": {col: deep_serialize(table.generated[col]) for col in table.generated},
+                    "references": {col: list(table.references[col]) for col in table.references},
+                    # Index contents are kept as row positions, checked against this version on load
+                    "version": table.version,
+                    "indexes": table.dump_indexes(),
+                    # Rows are written in key order, so a clustered table only needs its key back
+                    "cluster_key": table.cluster_key,
+                    "rows": [] if table.partitioning is not None else encode_rows(table.rows)
                 }
+                if table.partitioning is not None:
+                    db_data[tbl_name]["partitioning"] = dump_partitions(table)
             
             # Serialize views
             if self.views:
@@ -196,20 +239,27 @@ class DatabaseManager:
                     deserialized_value = deep_deserialize(raw_value)
                     constraints_ptr[col] = deserialized_value
 
-                rows = []
-                for row_dict in tbl_data.get("rows", []):
-                    row = {}
-                    for col in row_dict:
-                        raw_value = row_dict[col]
-                        deserialized_value = deep_deserialize(raw_value)
-                        if not hasattr(deserialized_value, '__dict__') or isinstance(deserialized_value, (str, int, float, bool)):
-                            row[col] = schema[col](deserialized_value)
-                        else:
-                            row[col] = deserialized_value
-                    rows.append(row)
-
-                table = Table(tbl_name, schema, defaults, auto, constraints, restrictions, private_constraints, constraints_ptr)
+                partitioning = tbl_data.get("partitioning")
+                if partitioning is None:
+                    rows = decode_rows(schema, tbl_data.get("rows", []))
+                else:
+                    # Partitions follow one another in the rows, so saved index positions still hold
+                    partition_rows = [decode_rows(schema, entry["rows"]) for entry in partitioning["partitions"]]
+                    rows = [row for part in partition_rows for row in part]
+
+                generated = {}
+                for col in tbl_data.get("generated", {}):
+                    generated[col] = deep_deserialize(tbl_data["generated"][col])
+
+                references = {col: tuple(reference) for col, reference in tbl_data.get("references", {}).items()}
+
+                table = Table(tbl_name, schema, defaults, auto, constraints, restrictions, private_constraints, constraints_ptr, generated, references)
                 table.rows = rows
+                table.cluster_key = tbl_data.get("cluster_key")
+                table.version = tbl_data.get("version", 0)
+                if partitioning is not None:
+                    table.partitioning = Partitioning.load(partitioning, [len(part) for part in partition_rows])
+                table.restore_indexes(tbl_data.get("indexes", []))
 
                 # Fix SERIAL counters
                 for col, col_type in schema.items():
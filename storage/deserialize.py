@@ -65,6 +65,10 @@ def reconstruct_ast_object(obj):
                 for key, value in deserialized_data.items():
                     setattr(instance, key, value)
             
+            # Let classes fix up derived/cached state (e.g. re-encode temporal values)
+            if hasattr(instance, '__setstate__'):
+                instance.__setstate__(deserialized_data)
+            
             return instance
             
         except Exception as e:
@@ -0,0 +1,1112 @@
+"""
+Indexes kept next to a table's rows.
+
+An index maps cell values to the row dicts that hold them. Rows are never
+copied: an index entry is the very dict that lives in ``table.rows``, so a
+lookup hands back rows that can be evaluated or modified directly.
+
+Hash and ordered indexes leave NULL cells out (NULL never equals anything,
+and NULLs do not collide under UNIQUE); a bitmap index keeps a bitset for
+NULL as well. A trigram index serves LIKE / ILIKE with candidate rows only,
+and a full-text index serves MATCH with postings lists of words. A Bloom
+index only tells values the column certainly does not hold. A cracker
+column is not an index anyone creates: range filters build and refine it
+as they go (adaptive indexing).
+"""
+
+import heapq
+import math
+import re
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from hashlib import blake2b
+from errors import UniqueConstraintError
+
+
+def index_key(cell):
+    """Hashable key of a cell: the plain value behind an SQLType, None for NULL"""
+    if cell is None:
+        return None
+    return getattr(cell, 'value', cell)
+
+
+class _Extreme:
+    """Key component that sorts below (NULL) or above (TOP) every other value"""
+    __slots__ = ("sign",)
+
+    def __init__(self, sign):
+        self.sign = sign
+
+    def __lt__(self, other):
+        return self.sign < 0 and other is not self
+
+    def __gt__(self, other):
+        return self.sign > 0 and other is not self
+
+    def __le__(self, other):
+        return self.sign < 0 or other is self
+
+    def __ge__(self, other):
+        return self.sign > 0 or other is self
+
+    def __eq__(self, other):
+        return other is self
+
+    def __hash__(self):
+        return id(self)
+
+    def __repr__(self):
+        return "NULL_KEY" if self.sign < 0 else "TOP"
+
+
+# NULLs in the trailing columns of a composite key, and the upper end of a key prefix
+NULL_KEY = _Extreme(-1)
+TOP = _Extreme(1)
+
+
+def ordered_key(value):
+    """
+    Sort key for a plain value. WHERE compares strings case-insensitively,
+    so strings are ordered by their case-folded form.
+    """
+    if isinstance(value, str):
+        return value.lower()
+    return value
+
+
+def cell_ordered_key(cell):
+    """ordered_key() of a cell, reusing the cell's cached case-folded shadow"""
+    if cell is None:
+        return None
+    value = getattr(cell, 'value', cell)
+    if isinstance(value, str):
+        folded = getattr(cell, 'folded', None)
+        return folded if folded is not None else value.lower()
+    return value
+
+
+_UNSAVED = object()
+_PLAIN = (str, int, float, bool)
+
+
+def _saved_key(key):
+    """msgpack form of an ordered key (NULL_KEY as None), or _UNSAVED"""
+    if isinstance(key, tuple):
+        parts = [None if part is NULL_KEY else part for part in key]
+        if all(part is None or isinstance(part, _PLAIN) for part in parts):
+            return parts
+        return _UNSAVED
+    return key if isinstance(key, _PLAIN) else _UNSAVED
+
+
+def _restored_key(key):
+    if isinstance(key, list):
+        return tuple(NULL_KEY if part is None else part for part in key)
+    return key
+
+
+class HashIndex:
+    """
+    Equality index: key -> row (unique) or key -> [rows] (non-unique).
+
+    Constraint indexes are created and dropped by the table itself to back
+    PRIMARY KEY / UNIQUE columns.
+    """
+    kind = "HASH"
+    reads = 0           # times a query plan read rows or answers off it (see exec.planner)
+    predicate = None
+    expressions = ()
+
+    def __init__(self, name, column, unique=False, constraint=False):
+        self.name = name
+        self.column = column
+        self.columns = (column,)
+        self.label = column
+        self.unique = unique
+        self.constraint = constraint
+        self.entries = {}
+
+    def build(self, rows):
+        self.entries = {}
+        for row in rows:
+            self.add(row)
+
+    def clear(self):
+        self.entries = {}
+
+    def key_of(self, row):
+        return index_key(row.get(self.column))
+
+    exact_value = key_of
+
+    def holder_for(self, row, exclude=None):
+        """Row other than `exclude` already holding row's key in a unique index, or None"""
+        key = self.key_of(row)
+        if key is None:
+            return None
+        return self.holder(key, exclude)
+
+    def add(self, row):
+        key = self.key_of(row)
+        if key is None:
+            return
+        if self.unique:
+            holder = self.entries.get(key)
+            if holder is not None and holder is not row:
+                raise UniqueConstraintError(self.column, key)
+            self.entries[key] = row
+        else:
+            self.entries.setdefault(key, []).append(row)
+
+    def discard(self, row):
+        key = self.key_of(row)
+        if key is None:
+            return
+        if self.unique:
+            if self.entries.get(key) is row:
+                del self.entries[key]
+            return
+        bucket = self.entries.get(key)
+        if not bucket:
+            return
+        for i, candidate in enumerate(bucket):
+            if candidate is row:
+                del bucket[i]
+                break
+        if not bucket:
+            del self.entries[key]
+
+    def holder(self, key, exclude=None):
+        """Row other than `exclude` already holding key in a unique index, or None"""
+        found = self.entries.get(key)
+        if found is None or found is exclude:
+            return None
+        return found
+
+    def lookup(self, key):
+        """Rows whose indexed value equals key"""
+        if key is None:
+            return []
+        found = self.entries.get(key)
+        if found is None:
+            return []
+        return [found] if self.unique else list(found)
+
+    def dump(self, position):
+        """Positions in table.rows of the indexed rows, bucket by bucket, for saving with the table"""
+        if self.unique:
+            return [position[id(row)] for row in self.entries.values()]
+        return [position[id(row)] for bucket in self.entries.values() for row in bucket]
+
+    def load(self, rows, data):
+        """Restore from dump(): the rows are known to be non-NULL and free of collisions"""
+        self.entries = {}
+        for pos in data:
+            row = rows[pos]
+            if self.unique:
+                self.entries[self.key_of(row)] = row
+            else:
+                self.entries.setdefault(self.key_of(row), []).append(row)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        if self.unique:
+            return len(self.entries)
+        return sum(len(bucket) for bucket in self.entries.values())
+
+
+class OrderedIndex:
+    """
+    Sorted index over one or more columns, for equality and range lookups.
+
+    Entries live in a list of sorted blocks plus the maximum key of each
+    block (a two-level B-tree): finding a position is a bisect over the
+    block maxima and then one inside a block, and an insert or delete only
+    shifts entries within a single block.
+
+    A single-column index is keyed by the value itself. A composite index is
+    keyed by a tuple in column order, so any leading prefix of the columns
+    forms a contiguous key range. Rows whose leading column is NULL are not
+    indexed; NULLs further right are stored as NULL_KEY.
+
+    A unique index rejects two rows with the same exact values in all its
+    columns (keys are case-folded for ordering, so exact values are compared
+    before reporting a collision). Rows with a NULL in any column never
+    collide.
+
+    A partial index (CREATE INDEX ... WHERE predicate) holds only the rows
+    satisfying its predicate, and uniqueness is enforced among those alone.
+
+    A key column may be an expression over the row (LOWER(email),
+    EXTRACT(YEAR FROM d), ...) instead of a plain column; `columns` then
+    holds its source text as a label. Rows the expression fails on are
+    left out, like NULLs.
+    """
+    kind = "BTREE"
+    reads = 0
+    constraint = False
+    BLOCK_SIZE = 512
+
+    def __init__(self, name, columns, unique=False, predicate=None, schema=None, expressions=None):
+        if isinstance(columns, str):
+            columns = (columns,)
+        self.name = name
+        self.columns = tuple(columns)
+        self.column = self.columns[0]
+        self.label = ", ".join(self.columns)
+        self.unique = unique
+        self.predicate = predicate
+        self.schema = schema
+        self.expressions = tuple(expressions) if expressions else (None,) * len(self.columns)
+        self.computed = any(expression is not None for expression in self.expressions)
+        self.clear()
+
+    def covers(self, row):
+        """Whether row belongs in the index: a partial index holds only the rows satisfying its predicate"""
+        return self.predicate is None or bool(self.predicate.evaluate(row, self.schema))
+
+    def clear(self):
+        self._keys = []     # list of sorted key blocks
+        self._rows = []     # rows, parallel to _keys
+        self._maxes = []    # last key of each block
+        self._size = 0
+
+    def key_of(self, row):
+        if self.computed:
+            first, *rest = (cell_ordered_key(self._cell(row, position)) for position in range(len(self.columns)))
+        else:
+            first = cell_ordered_key(row.get(self.column))
+            if len(self.columns) == 1 or first is None:
+                return first
+            rest = (cell_ordered_key(row.get(col)) for col in self.columns[1:])
+        if not self.columns[1:] or first is None:
+            return first
+        return (first,) + tuple(NULL_KEY if key is None else key for key in rest)
+
+    def exact_value(self, row):
+        if self.computed:
+            values = tuple(index_key(self._cell(row, position)) for position in range(len(self.columns)))
+            return values[0] if len(values) == 1 else values
+        if len(self.columns) == 1:
+            return index_key(row.get(self.column))
+        return tuple(index_key(row.get(col)) for col in self.columns)
+
+    def _cell(self, row, position):
+        """The cell of a key column, or the value of a key expression"""
+        expression = self.expressions[position]
+        if expression is None:
+            return row.get(self.columns[position])
+        try:
+            return expression.evaluate(row, self.schema)
+        except (TypeError, ValueError, KeyError, ArithmeticError):
+            return None
+
+    def first_key(self):
+        """Smallest key, or None when the index is empty"""
+        return self._keys[0][0] if self._size else None
+
+    def groups(self):
+        """The indexed rows as runs of equal keys, in key order"""
+        run = []
+        last = None
+        for keys, rows in zip(self._keys, self._rows):
+            for key, row in zip(keys, rows):
+                if run and key != last:
+                    yield run
+                    run = []
+                run.append(row)
+                last = key
+        if run:
+            yield run
+
+    def holder_for(self, row, exclude=None):
+        """Row other than `exclude` with the same exact values in a unique index, or None"""
+        key = self.key_of(row)
+        if key is None or (isinstance(key, tuple) and NULL_KEY in key) or not self.covers(row):
+            return None
+        exact = self.exact_value(row)
+        for candidate in self.lookup(key):
+            if candidate is not exclude and self.exact_value(candidate) == exact:
+                return candidate
+        return None
+
+    def build(self, rows):
+        self.clear()
+        if self.predicate is not None:
+            rows = [row for row in rows if self.covers(row)]
+        if self.unique:
+            seen = set()
+            for row in rows:
+                key = self.key_of(row)
+                if key is None or (isinstance(key, tuple) and NULL_KEY in key):
+                    continue
+                exact = self.exact_value(row)
+                if exact in seen:
+                    raise UniqueConstraintError(self.label, exact)
+                seen.add(exact)
+        entries = [(self.key_of(row), row) for row in rows]
+        entries = [entry for entry in entries if entry[0] is not None]
+        entries.sort(key=lambda entry: entry[0])
+        for start in range(0, len(entries), self.BLOCK_SIZE):
+            block = entries[start:start + self.BLOCK_SIZE]
+            self._keys.append([key for key, _ in block])
+            self._rows.append([row for _, row in block])
+            self._maxes.append(block[-1][0])
+        self._size = len(entries)
+
+    def add(self, row):
+        key = self.key_of(row)
+        if key is None or not self.covers(row):
+            return
+        if self.unique and self.holder_for(row) is not None:
+            raise UniqueConstraintError(self.label, self.exact_value(row))
+        if not self._maxes:
+            self._keys.append([key])
+            self._rows.append([row])
+            self._maxes.append(key)
+            self._size = 1
+            return
+        b = min(bisect_right(self._maxes, key), len(self._maxes) - 1)
+        keys = self._keys[b]
+        i = bisect_right(keys, key)
+        keys.insert(i, key)
+        self._rows[b].insert(i, row)
+        self._maxes[b] = keys[-1]
+        self._size += 1
+        if len(keys) > 2 * self.BLOCK_SIZE:
+            half = len(keys) // 2
+            self._keys.insert(b + 1, keys[half:])
+            self._rows.insert(b + 1, self._rows[b][half:])
+            del keys[half:]
+            del self._rows[b][half:]
+            self._maxes[b] = keys[-1]
+            self._maxes.insert(b + 1, self._keys[b + 1][-1])
+
+    def discard(self, row):
+        key = self.key_of(row)
+        if key is None:
+            return
+        b = bisect_left(self._maxes, key)
+        while b < len(self._maxes):
+            keys = self._keys[b]
+            if keys[0] > key:
+                return
+            i = bisect_left(keys, key)
+            while i < len(keys) and keys[i] == key:
+                if self._rows[b][i] is row:
+                    del keys[i]
+                    del self._rows[b][i]
+                    self._size -= 1
+                    if keys:
+                        self._maxes[b] = keys[-1]
+                    else:
+                        del self._keys[b], self._rows[b], self._maxes[b]
+                    return
+                i += 1
+            b += 1
+
+    def _start(self, low, inclusive):
+        """(block, position) of the first entry above low"""
+        if low is None:
+            return 0, 0
+        if inclusive:
+            b = bisect_left(self._maxes, low)
+            return b, (bisect_left(self._keys[b], low) if b < len(self._keys) else 0)
+        b = bisect_right(self._maxes, low)
+        return b, (bisect_right(self._keys[b], low) if b < len(self._keys) else 0)
+
+    def _stop(self, high, inclusive):
+        """(block, position) just past the last entry below high"""
+        if high is None:
+            return len(self._keys) - 1, len(self._keys[-1]) if self._keys else 0
+        if inclusive:
+            b = bisect_right(self._maxes, high)
+            if b == len(self._keys):
+                return b - 1, len(self._keys[b - 1]) if b else 0
+            return b, bisect_right(self._keys[b], high)
+        b = bisect_left(self._maxes, high)
+        if b == len(self._keys):
+            return b - 1, len(self._keys[b - 1]) if b else 0
+        return b, bisect_left(self._keys[b], high)
+
+    def count_range(self, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        """Number of entries in the range, without touching the rows"""
+        if not self._size:
+            return 0
+        first_block, first = self._start(low, low_inclusive)
+        last_block, last = self._stop(high, high_inclusive)
+        if first_block > last_block:
+            return 0
+        if first_block == last_block:
+            return max(0, last - first)
+        total = len(self._keys[first_block]) - first + last
+        for b in range(first_block + 1, last_block):
+            total += len(self._keys[b])
+        return total
+
+    def range(self, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        """Rows whose key lies in the range, in key order (None bounds are open)"""
+        if not self._size:
+            return []
+        first_block, first = self._start(low, low_inclusive)
+        last_block, last = self._stop(high, high_inclusive)
+        if first_block > last_block:
+            return []
+        if first_block == last_block:
+            return self._rows[first_block][first:last]
+        result = self._rows[first_block][first:]
+        for b in range(first_block + 1, last_block):
+            result.extend(self._rows[b])
+        result.extend(self._rows[last_block][:last])
+        return result
+
+    def dump(self, position):
+        """
+        Positions in table.rows of the indexed rows in key order, for saving
+        with the table. Keys made only of plain values are saved too, so
+        load() need not recompute them.
+        """
+        data = {"rows": [position[id(row)] for block in self._rows for row in block]}
+        keys = [_saved_key(key) for block in self._keys for key in block]
+        if all(key is not _UNSAVED for key in keys):
+            data["keys"] = keys
+        return data
+
+    def load(self, rows, data):
+        """Restore from dump(): the rows arrive in key order, so nothing is sorted or compared"""
+        self.clear()
+        ordered = [rows[pos] for pos in data["rows"]]
+        saved = data.get("keys")
+        if saved is None or len(saved) != len(ordered):
+            keys = [self.key_of(row) for row in ordered]
+        else:
+            keys = [_restored_key(key) for key in saved]
+        for start in range(0, len(ordered), self.BLOCK_SIZE):
+            self._rows.append(ordered[start:start + self.BLOCK_SIZE])
+            self._keys.append(keys[start:start + self.BLOCK_SIZE])
+            self._maxes.append(self._keys[-1][-1])
+        self._size = len(ordered)
+
+    def scan(self, low=None, high=None, low_inclusive=True, high_inclusive=True, reverse=False, skip=0):
+        """
+        Iterate the rows of a range in key order (or backwards) without
+        collecting them, leaving out the first `skip`: whole blocks are
+        passed over by their length, so an OFFSET costs one step per block.
+        """
+        if not self._size:
+            return
+        first_block, first = self._start(low, low_inclusive)
+        last_block, last = self._stop(high, high_inclusive)
+        blocks = range(first_block, last_block + 1)
+        for b in (reversed(blocks) if reverse else blocks):
+            rows = self._rows[b]
+            start = first if b == first_block else 0
+            stop = last if b == last_block else len(rows)
+            if stop - start <= skip:
+                skip -= max(0, stop - start)
+                continue
+            if reverse:
+                yield from reversed(rows[start:stop - skip])
+            else:
+                yield from rows[start + skip:stop]
+            skip = 0
+
+    def lookup(self, key):
+        """Rows whose key equals key (key as produced by ordered_key)"""
+        if key is None:
+            return []
+        return self.range(key, key)
+
+    def __len__(self):
+        return self._size
+
+
+# Positions of the set bits in every byte value, for turning a bitset back into rows
+_BYTE_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+
+class RowSlots:
+    """
+    Bit positions for a table's rows, shared by all of its bitmap indexes so
+    that their bitsets can be combined. A row keeps its slot for as long as
+    it lives; deleted rows leave holes until the table rebuilds the slots.
+    """
+
+    def __init__(self):
+        self.build([])
+
+    def build(self, rows):
+        self.rows = list(rows)      # slot -> row, None once the row is gone
+        self.slot_of = {id(row): slot for slot, row in enumerate(self.rows)}
+        self.live = (1 << len(self.rows)) - 1
+        self.size = len(self.rows)
+
+    def add(self, row):
+        slot = len(self.rows)
+        self.rows.append(row)
+        self.slot_of[id(row)] = slot
+        self.live |= 1 << slot
+        self.size += 1
+
+    def discard(self, row):
+        slot = self.slot_of.pop(id(row), None)
+        if slot is None:
+            return
+        self.rows[slot] = None
+        self.live &= ~(1 << slot)
+        self.size -= 1
+
+    def fragmented(self):
+        return len(self.rows) > 2 * self.size + 64
+
+
+    def rows_of(self, bits):
+        """Rows of the set bits, in slot order"""
+        rows = []
+        slots = self.rows
+        for offset, byte in enumerate(bits.to_bytes((bits.bit_length() + 7) // 8, "little")):
+            if byte:
+                base = offset << 3
+                rows.extend(slots[base + bit] for bit in _BYTE_BITS[byte])
+        return rows
+
+
+class BitmapIndex:
+    """
+    One bitset (a Python int over the table's RowSlots) per distinct value of
+    a column, for BOOLEAN and low-cardinality columns. A predicate on the
+    column is decided once per distinct value, and whole WHERE clauses are
+    combined with bitwise AND / OR / NOT before a single row is fetched.
+
+    NULL cells get a bitset of their own (key None), so NOT and IS NULL can
+    be answered too.
+    """
+    kind = "BITMAP"
+    reads = 0
+    constraint = False
+    predicate = None
+    expressions = ()
+    unique = False
+
+    def __init__(self, name, column, slots):
+        self.name = name
+        self.column = column
+        self.columns = (column,)
+        self.label = column
+        self.slots = slots
+        self.clear()
+
+    def clear(self):
+        self.bitmaps = {}    # value -> bitset of the slots holding it
+        self.cells = {}      # value -> one cell holding it, to evaluate predicates against
+
+    def key_of(self, row):
+        return index_key(row.get(self.column))
+
+    def build(self, rows):
+        self.clear()
+        # Assemble each bitset as bytes: OR-ing bits into an int one at a time is quadratic
+        width = (len(self.slots.rows) + 7) // 8
+        buffers = {}
+        for row in rows:
+            slot = self.slots.slot_of[id(row)]
+            cell = row.get(self.column)
+            key = index_key(cell)
+            buffer = buffers.get(key)
+            if buffer is None:
+                buffer = buffers[key] = bytearray(width)
+                self.cells[key] = cell
+            buffer[slot >> 3] |= 1 << (slot & 7)
+        self.bitmaps = {key: int.from_bytes(buffer, "little") for key, buffer in buffers.items()}
+
+    def add(self, row):
+        cell = row.get(self.column)
+        key = index_key(cell)
+        if key not in self.bitmaps:
+            self.bitmaps[key] = 0
+            self.cells[key] = cell
+        self.bitmaps[key] |= 1 << self.slots.slot_of[id(row)]
+
+    def discard(self, row):
+        slot = self.slots.slot_of.get(id(row))
+        key = self.key_of(row)
+        if slot is None or key not in self.bitmaps:
+            return
+        self.bitmaps[key] &= ~(1 << slot)
+        if not self.bitmaps[key]:
+            del self.bitmaps[key], self.cells[key]
+
+    def dump(self, position):
+        """
+        [position of a row holding the value, bitset bytes] per distinct value,
+        with bits standing for positions in table.rows, for saving with the
+        table. Without holes the slots already are those positions.
+        """
+        holes = self.slots.size != len(self.slots.rows)
+        data = []
+        for bits in self.bitmaps.values():
+            if holes:
+                positions = [position[id(row)] for row in self.slots.rows_of(bits)]
+                buffer = bytearray((max(positions) >> 3) + 1)
+                for pos in positions:
+                    buffer[pos >> 3] |= 1 << (pos & 7)
+                data.append([positions[0], bytes(buffer)])
+            else:
+                first = self.slots.rows[(bits & -bits).bit_length() - 1]
+                data.append([position[id(first)], bits.to_bytes((bits.bit_length() + 7) // 8, "little")])
+        return data
+
+    def load(self, rows, data):
+        """Restore from dump(); the table's slots must have been built from the same rows"""
+        self.clear()
+        for pos, raw in data:
+            row = rows[pos]
+            key = self.key_of(row)
+            self.bitmaps[key] = int.from_bytes(raw, "little")
+            self.cells[key] = row.get(self.column)
+
+    def matching(self, predicate):
+        """Bitset of the rows whose cell satisfies predicate(cell), deciding once per distinct value"""
+        bits = 0
+        for key, cell in self.cells.items():
+            if predicate(cell):
+                bits |= self.bitmaps[key]
+        return bits
+
+    def lookup(self, key):
+        return self.slots.rows_of(self.bitmaps.get(key, 0))
+
+    def __len__(self):
+        return sum(bits.bit_count() for bits in self.bitmaps.values())
+
+
+def trigram_text(value):
+    """
+    Case-folded form the trigrams are taken from. casefold() after lower()
+    maps every character on its own, so any substring of a value (in any
+    case) folds to a substring of the folded value.
+    """
+    return str(value).lower().casefold()
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """
+    For LIKE / ILIKE: the set of row slots (over the table's RowSlots) whose
+    case-folded value contains each three-character sequence. A pattern's
+    literal runs name trigrams every match must contain, and intersecting
+    their sets leaves the candidate rows; LIKE is still evaluated on those,
+    since the trigrams ignore case and where in the value they occur.
+    NULL cells are not indexed.
+    """
+    kind = "TRIGRAM"
+    reads = 0
+    constraint = False
+    predicate = None
+    expressions = ()
+    unique = False
+
+    def __init__(self, name, column, slots):
+        self.name = name
+        self.column = column
+        self.columns = (column,)
+        self.label = column
+        self.slots = slots
+        self.clear()
+
+    def clear(self):
+        self.grams = {}      # trigram -> set of slots
+        self._size = 0
+
+    def key_of(self, row):
+        cell = index_key(row.get(self.column))
+        return None if cell is None else trigram_text(cell)
+
+    def build(self, rows):
+        self.clear()
+        grams = self.grams
+        slot_of = self.slots.slot_of
+        for row in rows:
+            text = self.key_of(row)
+            if text is None:
+                continue
+            slot = slot_of[id(row)]
+            self._size += 1
+            for gram in trigrams(text):
+                holders = grams.get(gram)
+                if holders is None:
+                    grams[gram] = {slot}
+                else:
+                    holders.add(slot)
+
+    def add(self, row):
+        text = self.key_of(row)
+        if text is None:
+            return
+        slot = self.slots.slot_of[id(row)]
+        self._size += 1
+        for gram in trigrams(text):
+            self.grams.setdefault(gram, set()).add(slot)
+
+    def discard(self, row):
+        text = self.key_of(row)
+        slot = self.slots.slot_of.get(id(row))
+        if text is None or slot is None:
+            return
+        self._size -= 1
+        for gram in trigrams(text):
+            holders = self.grams.get(gram)
+            if holders is not None:
+                holders.discard(slot)
+                if not holders:
+                    del self.grams[gram]
+
+    def search(self, required):
+        """Rows (in slot order) whose value contains every trigram in required"""
+        sets = sorted((self.grams.get(gram, ()) for gram in required), key=len)
+        if not sets or not sets[0]:
+            return []
+        found = set(sets[0]).intersection(*sets[1:])
+        rows = self.slots.rows
+        return [rows[slot] for slot in sorted(found)]
+
+    def dump(self, position):
+        """The indexed row count and [trigram, positions in table.rows] per trigram, for saving with the table"""
+        rows = self.slots.rows
+        grams = [[gram, [position[id(rows[slot])] for slot in holders]] for gram, holders in self.grams.items()]
+        return {"size": self._size, "grams": grams}
+
+    def load(self, rows, data):
+        """Restore from dump(); the table's slots must have been built from the same rows"""
+        self.clear()
+        slot_of = self.slots.slot_of
+        slots = [slot_of[id(row)] for row in rows]
+        for gram, positions in data["grams"]:
+            self.grams[gram] = {slots[pos] for pos in positions}
+        self._size = data["size"]
+
+    def __len__(self):
+        return self._size
+
+
+# Words too common to be worth indexing or searching for
+STOP_WORDS = frozenset("""
+a an and are as at be but by for from has have in is it its of on or that the this to was were will with
+""".split())
+
+WORD = re.compile(r"\w+")
+
+
+def fulltext_words(value):
+    """The words of a text, case-folded, with stop words left out"""
+    return [word for word in WORD.findall(str(value).casefold()) if word not in STOP_WORDS]
+
+
+def query_terms(text):
+    """The distinct words MATCH searches for, in the fixed order relevance() adds them up"""
+    return sorted(set(fulltext_words(text)))
+
+
+def relevance(counts, length, terms):
+    """
+    Score of a text of `length` words holding counts[word] of each word: one
+    point plus the log of its frequency per query term found, over the square
+    root of the length so that a short text saying the same scores higher.
+    0.0 when no term occurs.
+    """
+    score = 0.0
+    for term in terms:
+        frequency = counts.get(term)
+        if frequency:
+            score += 1 + math.log(frequency)
+    return score / math.sqrt(length) if score else 0.0
+
+
+class FullTextIndex:
+    """
+    An inverted index for MATCH: per word, the postings {slot: occurrences}
+    of the rows (over the table's RowSlots) whose text holds it, and the
+    word count of every indexed row. A search touches only the postings of
+    its terms, and the scores it computes are those MATCH evaluates to.
+    NULL cells are not indexed.
+    """
+    kind = "FULLTEXT"
+    reads = 0
+    constraint = False
+    predicate = None
+    expressions = ()
+    unique = False
+
+    def __init__(self, name, column, slots):
+        self.name = name
+        self.column = column
+        self.columns = (column,)
+        self.label = column
+        self.slots = slots
+        self.clear()
+
+    def clear(self):
+        self.postings = {}   # word -> {slot: occurrences}
+        self.lengths = {}    # slot -> word count
+
+    def key_of(self, row):
+        cell = index_key(row.get(self.column))
+        return None if cell is None else fulltext_words(cell)
+
+    def build(self, rows):
+        self.clear()
+        for row in rows:
+            self.add(row)
+
+    def add(self, row):
+        words = self.key_of(row)
+        if words is None:
+            return
+        slot = self.slots.slot_of[id(row)]
+        self.lengths[slot] = len(words)
+        postings = self.postings
+        for word, frequency in Counter(words).items():
+            posting = postings.get(word)
+            if posting is None:
+                postings[word] = {slot: frequency}
+            else:
+                posting[slot] = frequency
+
+    def discard(self, row):
+        slot = self.slots.slot_of.get(id(row))
+        if slot is None or self.lengths.pop(slot, None) is None:
+            return
+        for word in set(self.key_of(row)):
+            posting = self.postings.get(word)
+            if posting is not None:
+                posting.pop(slot, None)
+                if not posting:
+                    del self.postings[word]
+
+    def scores(self, terms):
+        """{slot: relevance} of the rows holding any of terms (as given by query_terms())"""
+        totals = {}
+        for term in terms:
+            for slot, frequency in self.postings.get(term, {}).items():
+                totals[slot] = totals.get(slot, 0.0) + (1 + math.log(frequency))
+        lengths = self.lengths
+        return {slot: score / math.sqrt(lengths[slot]) for slot, score in totals.items()}
+
+    def search(self, terms):
+        """Rows (in slot order) holding any of terms"""
+        found = set()
+        for term in terms:
+            found.update(self.postings.get(term, ()))
+        rows = self.slots.rows
+        return [rows[slot] for slot in sorted(found)]
+
+    def count(self, terms):
+        if len(terms) == 1:
+            return len(self.postings.get(terms[0], ()))
+        return len(set().union(*(self.postings.get(term, ()) for term in terms)))
+
+    def top(self, terms, k):
+        """
+        The k rows of highest relevance for terms, best first, ties in slot
+        order. Only the rows holding a term are scored, and a heap keeps the
+        best k of them instead of sorting them all.
+        """
+        best = heapq.nsmallest(k, self.scores(terms).items(), key=lambda item: (-item[1], item[0]))
+        rows = self.slots.rows
+        return [rows[slot] for slot, _ in best]
+
+    def dump(self, position):
+        """[word, positions in table.rows, occurrences] per word and the word counts, for saving with the table"""
+        rows = self.slots.rows
+        postings = [[word, [position[id(rows[slot])] for slot in posting], list(posting.values())]
+                    for word, posting in self.postings.items()]
+        lengths = [[position[id(rows[slot])], length] for slot, length in self.lengths.items()]
+        return {"lengths": lengths, "postings": postings}
+
+    def load(self, rows, data):
+        """Restore from dump(); the table's slots must have been built from the same rows"""
+        self.clear()
+        slot_of = self.slots.slot_of
+        slots = [slot_of[id(row)] for row in rows]
+        for pos, length in data["lengths"]:
+            self.lengths[slots[pos]] = length
+        for word, positions, frequencies in data["postings"]:
+            self.postings[word] = {slots[pos]: frequency for pos, frequency in zip(positions, frequencies)}
+
+    def __len__(self):
+        return len(self.lengths)
+
+
+def bloom_key(value):
+    """
+    Bytes a Bloom filter hashes for a value, alike for every value that '='
+    or IN can find equal to it: text case-folded, and 1, 1.0 and TRUE as one
+    number. repr() keeps the bytes the same from one process to the next.
+    """
+    value = ordered_key(value)
+    if isinstance(value, bool) or (isinstance(value, float) and value.is_integer()):
+        value = int(value)
+    return repr(value).encode()
+
+
+class BloomIndex:
+    """
+    A Bloom filter over the values of a column: about ten bits per row, far
+    less than a hash index, answering "certainly not here" for '=' and IN
+    so that the scan for a value no row holds is skipped. Any other answer
+    is "maybe" and the query scans as before, which makes false positives
+    (1% at capacity) and bits left behind by deleted rows harmless.
+
+    Bits cannot be cleared, so the table rebuilds the filter once it grows
+    past its capacity or deleted rows account for most of it.
+    """
+    kind = "BLOOM"
+    reads = 0
+    constraint = False
+    predicate = None
+    expressions = ()
+    unique = False
+    ERROR_RATE = 0.01
+
+    def __init__(self, name, column):
+        self.name = name
+        self.column = column
+        self.columns = (column,)
+        self.label = column
+        self.clear()
+
+    def clear(self, capacity=1024):
+        self.capacity = capacity
+        self.size = math.ceil(-capacity * math.log(self.ERROR_RATE) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.added = 0      # values ever added, including those of rows since deleted
+        self.live = 0
+
+    def key_of(self, row):
+        cell = index_key(row.get(self.column))
+        return None if cell is None else bloom_key(cell)
+
+    def _positions(self, key):
+        # Double hashing: two 64-bit halves of one digest give every position
+        digest = blake2b(key, digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        step = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * step) % self.size for i in range(self.hashes)]
+
+    def _set(self, key):
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def build(self, rows):
+        keys = [key for key in map(self.key_of, rows) if key is not None]
+        self.clear(max(1024, 2 * len(keys)))
+        for key in keys:
+            self._set(key)
+        self.added = self.live = len(keys)
+
+    def add(self, row):
+        key = self.key_of(row)
+        if key is None:
+            return
+        self._set(key)
+        self.added += 1
+        self.live += 1
+
+    def discard(self, row):
+        if self.key_of(row) is not None:
+            self.live -= 1
+
+    def needs_rebuild(self):
+        return self.added > self.capacity or self.added > 2 * self.live + 1024
+
+    def might_contain(self, value):
+        """False only if no row holds value (NULL is never held)"""
+        if value is None:
+            return False
+        bits = self.bits
+        return all(bits[position >> 3] >> (position & 7) & 1 for position in self._positions(bloom_key(value)))
+
+    def dump(self, position):
+        """The filter's bits and counters, for saving with the table"""
+        return {"capacity": self.capacity, "added": self.added, "live": self.live, "bits": bytes(self.bits)}
+
+    def load(self, rows, data):
+        """Restore from dump()"""
+        self.clear(data["capacity"])
+        if len(data["bits"]) != len(self.bits):
+            raise ValueError(f"Bloom index '{self.name}' has a damaged bit array")
+        self.bits = bytearray(data["bits"])
+        self.added = data["added"]
+        self.live = data["live"]
+
+    def __len__(self):
+        return self.live
+
+
+class CrackerColumn:
+    """
+    A copy of one column (its ordered keys, each next to its row) that range
+    filters reorganise as they read it: adaptive indexing, or "database
+    cracking". Cracking at a bound partitions the one piece of the copy the
+    bound falls in around it, and remembers where the bound now splits the
+    copy. A range is then the slice between its two bounds, and every query
+    leaves smaller pieces behind, so that repeated ranges on the column
+    approach the cost of an ordered index without anyone creating one.
+
+    A bound is (key, side): side 0 splits keys < key from the rest, side 1
+    keys <= key. NULL cells are left out, as no range holds them. The copy
+    belongs to one table version and is thrown away once a write changes
+    the rows (see Table.cracker()).
+    """
+
+    def __init__(self, column, rows, version):
+        self.column = column
+        self.version = version
+        self.keys = []
+        self.rows = []
+        for row in rows:
+            key = cell_ordered_key(row.get(column))
+            if key is not None:
+                self.keys.append(key)
+                self.rows.append(row)
+        self.bounds = []        # sorted (key, side) bounds cracked so far
+        self.positions = []     # where the keys after each bound begin
+
+    def range(self, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        """Rows whose key lies in the range (None bounds are open), cracking the copy at both ends"""
+        start = 0 if low is None else self.crack((low, 0 if low_inclusive else 1))
+        stop = len(self.keys) if high is None else self.crack((high, 1 if high_inclusive else 0))
+        return self.rows[start:stop] if start < stop else []
+
+    def crack(self, bound):
+        """Position in the copy where bound splits it, partitioning the piece it falls in if need be"""
+        i = bisect_left(self.bounds, bound)
+        if i < len(self.bounds) and self.bounds[i] == bound:
+            return self.positions[i]
+        start = self.positions[i - 1] if i else 0
+        stop = self.positions[i] if i < len(self.positions) else len(self.keys)
+        key, side = bound
+        below_keys, below_rows, above_keys, above_rows = [], [], [], []
+        for cell_key, row in zip(self.keys[start:stop], self.rows[start:stop]):
+            if cell_key < key or (side and cell_key == key):
+                below_keys.append(cell_key)
+                below_rows.append(row)
+            else:
+                above_keys.append(cell_key)
+                above_rows.append(row)
+        self.keys[start:stop] = below_keys + above_keys
+        self.rows[start:stop] = below_rows + above_rows
+        position = start + len(below_keys)
+        self.bounds.insert(i, bound)
+        self.positions.insert(i, position)
+        return position
+
+    def __len__(self):
+        return len(self.keys)
@@ -0,0 +1,125 @@
+"""
+Deep-size estimation for tables: how many bytes a Table costs in RAM,
+broken down per column and per row.
+
+Sizes come from sys.getsizeof() over the object graph (gc.get_referents),
+counting every object once. Classes, modules and functions are shared by
+the whole process and are never attributed to a table.
+"""
+
+import gc
+import sys
+from types import ModuleType, FunctionType, BuiltinFunctionType, MethodType
+
+_SHARED = (type, ModuleType, FunctionType, BuiltinFunctionType, MethodType)
+
+# Table attributes reported on their own line rather than as metadata
+_ROW_ATTRIBUTES = {"rows"}
+# Structures over the rows that answer lookups: indexes (including those a
+# background rebuild is still filling), their shared row slots, cracker columns
+_INDEX_ATTRIBUTES = {"_indexes", "_stale", "row_slots", "crackers"}
+# Results derived from the rows and kept to skip work: running column totals
+_CACHE_ATTRIBUTES = {"totals"}
+# The thread rebuilding indexes after a load is not table data
+_TRANSIENT_ATTRIBUTES = {"_pending"}
+
+
+def deep_sizeof(obj, seen=None):
+    """Bytes used by obj and everything it references that was not already in `seen`"""
+    if seen is None:
+        seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if current is None or current is True or current is False or isinstance(current, _SHARED):
+            continue
+        key = id(current)
+        if key in seen:
+            continue
+        seen.add(key)
+        total += sys.getsizeof(current)
+        stack.extend(gc.get_referents(current))
+    return total
+
+
+def _cell_cache(cell, seen):
+    """Bytes of derived per-cell caches (e.g. the case-folded shadow of a string cell)"""
+    folded = getattr(cell, "_folded", None)
+    if folded is None or folded is getattr(cell, "value", None):
+        return 0
+    return deep_sizeof(folded, seen)
+
+
+def table_memory(table):
+    """
+    Memory report for one table:
+
+        {"table", "rows", "total", "row_storage", "cache", "indexes", "metadata",
+         "columns": {col: {"type", "bytes", "cache"}}}
+
+    ``row_storage`` is the row containers (list + per-row dicts); column
+    bytes are the cells themselves. ``indexes`` is the index structures
+    (and cracker columns, row slots) only, since the rows and cells they
+    point to are already counted. ``cache`` is per-cell caches plus derived
+    results kept by the table (column totals).
+    Everything else hanging off the table (schema, defaults, constraints,
+    ...) is ``metadata``.
+    """
+    seen = set()
+    rows = table.rows
+    columns = {col: {"type": getattr(col_type, "__name__", str(col_type)), "bytes": 0, "cache": 0}
+               for col, col_type in table.schema.items()}
+
+    # Caches first so they are not folded into the cell sizes below
+    for row in rows:
+        for col, cell in row.items():
+            if col in columns:
+                columns[col]["cache"] += _cell_cache(cell, seen)
+
+    # Column names are shared by every row; charge them once to the table itself
+    metadata = sys.getsizeof(table)
+    for col in table.schema:
+        metadata += deep_sizeof(col, seen)
+
+    row_storage = sys.getsizeof(rows)
+    seen.add(id(rows))
+    for row in rows:
+        row_storage += sys.getsizeof(row)
+        seen.add(id(row))
+        for col, cell in row.items():
+            size = deep_sizeof(cell, seen)
+            if col in columns:
+                columns[col]["bytes"] += size
+            else:
+                row_storage += size
+
+    attributes = vars(table)
+    indexes = sum(deep_sizeof(attributes[attr], seen) for attr in _INDEX_ATTRIBUTES if attr in attributes)
+
+    table_cache = sum(deep_sizeof(attributes[attr], seen) for attr in _CACHE_ATTRIBUTES if attr in attributes)
+
+    for attr, value in attributes.items():
+        if attr in _ROW_ATTRIBUTES or attr in _INDEX_ATTRIBUTES or attr in _CACHE_ATTRIBUTES or attr in _TRANSIENT_ATTRIBUTES:
+            continue
+        metadata += deep_sizeof(value, seen)
+
+    cache = sum(c["cache"] for c in columns.values()) + table_cache
+    column_bytes = sum(c["bytes"] for c in columns.values())
+    return {
+        "table": table.name,
+        "rows": len(rows),
+        "total": row_storage + column_bytes + cache + indexes + metadata,
+        "row_storage": row_storage,
+        "cache": cache,
+        "indexes": indexes,
+        "metadata": metadata,
+        "columns": columns,
+    }
+
+
+def format_bytes(size):
+    for unit in ("bytes", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:,} {unit}" if unit == "bytes" else f"{size:,.1f} {unit}"
+        size /= 1024
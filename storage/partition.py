@@ -0,0 +1,131 @@
+"""
+Table partitioning: PARTITION BY RANGE (col) and PARTITION BY HASH (col).
+
+A partitioned table keeps a single `rows` list, with every index covering
+all of it, but the rows of each partition sit together in that list,
+partitions in declaration order. A partition is therefore the slice that
+begins after the rows of the partitions before it. This lets:
+
+- the planner read only the partitions a WHERE clause can select from
+  (see exec.planner);
+- ALTER TABLE ... DROP PARTITION remove a partition's rows as one slice,
+  without evaluating anything on them;
+- the database file keep rows partition by partition, each loaded back
+  into its own slice.
+
+A RANGE partition holds the keys below its bound (VALUES LESS THAN) and at
+or above the bound of the partition before it. MAXVALUE leaves the last
+partition open. NULL sorts below every value, so NULL keys go to the first
+partition. A HASH partition holds the keys whose stable hash leaves its
+number as remainder; NULL keys again go to the first.
+"""
+import zlib
+from bisect import bisect_left, bisect_right
+from storage.index import cell_ordered_key
+
+
+def partition_hash(key):
+    """Hash of an ordered key that is the same in every run, and equal for 1 and 1.0 as '=' is"""
+    if isinstance(key, float) and key.is_integer():
+        key = int(key)
+    elif isinstance(key, int) and not isinstance(key, bool):
+        # Temporal encodings are int subclasses
+        key = int(key)
+    return zlib.crc32(repr(key).encode())
+
+
+class Partition:
+    """One partition of a table: its name, RANGE bound and row count"""
+
+    def __init__(self, name, bound=None, size=0):
+        self.name = name
+        self.bound = bound          # RANGE: exclusive upper bound as an ordered key, None for MAXVALUE
+        self.size = size            # its rows are rows[start:start + size] of the table
+
+
+class Partitioning:
+    """How a table's rows are split: kind ("RANGE" / "HASH"), column, and the partitions in row order"""
+
+    def __init__(self, kind, column, partitions):
+        self.kind = kind
+        self.column = column
+        self.partitions = partitions
+
+    def _bounds(self):
+        return [partition.bound for partition in self.partitions if partition.bound is not None]
+
+    def number_of(self, key):
+        """Number of the partition an ordered key (None for NULL) belongs to, or None when no partition takes it"""
+        if key is None:
+            return 0
+        if self.kind == "HASH":
+            return partition_hash(key) % len(self.partitions)
+        number = bisect_right(self._bounds(), key)
+        return number if number < len(self.partitions) else None
+
+    def number_of_row(self, row):
+        return self.number_of(cell_ordered_key(row.get(self.column)))
+
+    def number(self, name):
+        """Number of the partition called name; ValueError if there is none"""
+        for number, partition in enumerate(self.partitions):
+            if partition.name == name:
+                return number
+        raise ValueError(f"Partition '{name}' does not exist")
+
+    def span(self, number):
+        """(start, stop) of partition number's rows in the table's rows"""
+        start = sum(partition.size for partition in self.partitions[:number])
+        return start, start + self.partitions[number].size
+
+    def covering(self, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        """
+        Numbers of the partitions that can hold a key in the range (bounds in
+        ordered_key space, a missing one open); NULLs never fall in a range.
+        """
+        if self.kind == "HASH":
+            if low is None or low != high or not (low_inclusive and high_inclusive):
+                return range(len(self.partitions))
+            return [self.number_of(low)]
+        bounds = self._bounds()
+        last = len(self.partitions) - 1
+        first = 0 if low is None else bisect_right(bounds, low)
+        if high is None:
+            stop = last
+        elif high_inclusive:
+            stop = min(bisect_right(bounds, high), last)
+        else:
+            stop = min(bisect_left(bounds, high), last)
+        return range(first, stop + 1)
+
+    def add(self, name, bound):
+        """ADD PARTITION: a new, empty RANGE partition above the last one"""
+        if self.kind != "RANGE":
+            raise ValueError("Partitions can only be added to a table partitioned by RANGE")
+        if any(partition.name == name for partition in self.partitions):
+            raise ValueError(f"Partition '{name}' already exists")
+        top = self.partitions[-1].bound if self.partitions else None
+        if self.partitions and top is None:
+            raise ValueError(f"Partition '{self.partitions[-1].name}' already holds every key up to MAXVALUE")
+        if bound is not None and top is not None and not bound > top:
+            raise ValueError(f"VALUES LESS THAN of partition '{name}' must be above that of '{self.partitions[-1].name}'")
+        self.partitions.append(Partition(name, bound))
+
+    def drop(self, number):
+        """DROP PARTITION: forget partition number (its rows are gone); its keys now fall to the next one up"""
+        if self.kind != "RANGE":
+            raise ValueError("Partitions can only be dropped from a table partitioned by RANGE")
+        if len(self.partitions) == 1:
+            raise ValueError("Cannot drop the only partition of a table; use TRUNCATE TABLE or DROP TABLE instead")
+        del self.partitions[number]
+
+    def dump(self):
+        """Definitions for the database file (rows are added per partition by the caller)"""
+        return {"kind": self.kind, "column": self.column,
+                "partitions": [{"name": partition.name, "bound": partition.bound} for partition in self.partitions]}
+
+    @classmethod
+    def load(cls, definition, sizes):
+        partitions = [Partition(entry["name"], entry.get("bound"), size)
+                      for entry, size in zip(definition["partitions"], sizes)]
+        return cls(definition["kind"], definition["column"], partitions)
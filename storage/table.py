@@ -1,5 +1,30 @@
+import threading
+import zlib
+from bisect import bisect_left, bisect_right
+from itertools import compress, count, repeat
+from operator import is_
+import msgpack
+from storage.index import (HashIndex, OrderedIndex, BitmapIndex, TrigramIndex, FullTextIndex, BloomIndex, RowSlots,
+                           CrackerColumn, cell_ordered_key, index_key, NULL_KEY)
+from storage.aggregates import ColumnTotals, NUMERIC_TYPES
+from storage.partition import Partition, Partitioning
+from storage.serialize import deep_serialize
+from storage.deserialize import deep_deserialize
+from errors import UniqueConstraintError
+
+UNIQUE_CONSTRAINTS = ("PRIMARY KEY", "UNIQUE")
+
+
+def _checksum(version, row_count, data):
+    return zlib.crc32(msgpack.packb([version, row_count, data]))
+
+
 class Table:
-    def __init__(self, name, schema, defaults=None, auto=None, constraints = None, restrictions = None, private_constraints = None, constraints_ptr = None):
+    SMALL_DELETE = 16
+    # Index kinds addressing rows through the shared RowSlots
+    SLOT_METHODS = {"BITMAP": BitmapIndex, "TRIGRAM": TrigramIndex, "FULLTEXT": FullTextIndex}
+
+    def __init__(self, name, schema, defaults=None, auto=None, constraints = None, restrictions = None, private_constraints = None, constraints_ptr = None, generated = None, references = None):
         self.name = name
         self.schema = schema                  # dict[col_name] = SQLType class
         self.defaults = defaults or {}        # dict[col_name] = SQLType instance
@@ -9,4 +34,593 @@ class Table:
         self.restrictions = restrictions or {}
         self.private_constraints = private_constraints or {}
         self.constraints_ptr = constraints_ptr or {}
-        
\ No newline at end of file
+        self.generated = generated or {}      # dict[col_name] = expression (GENERATED ALWAYS AS ... STORED)
+        self.references = references or {}    # dict[col_name] = (parent table, parent column, deferred) (REFERENCES)
+        self.version = 0                      # bumped by every write, so saved indexes can be matched to the rows
+        self._indexes = {}                    # dict[index_name] = index over self.rows
+        self._pending = None                  # thread rebuilding stale indexes after a load
+        self._stale = []                      # indexes that thread is building
+        self.row_slots = None                 # RowSlots shared by the bitmap and trigram indexes, once there is one
+        self.cluster_key = None               # column self.rows is kept sorted by (CLUSTER / CLUSTERED BY), or None
+        self.crackers = {}                    # dict[col_name] = CrackerColumn left by range filters (adaptive indexing)
+        self.totals = {}                      # dict[col_name] = ColumnTotals kept by every write once a query asked for them
+        self.partitioning = None              # Partitioning self.rows is laid out by (PARTITION BY), or None
+        self.sync_constraint_indexes()
+
+    # ---------------- Indexes ----------------
+
+    @property
+    def indexes(self):
+        """dict[index_name] = index; waits for a background rebuild so writes always see every index"""
+        if self._pending is not None:
+            self.wait_for_indexes()
+        return self._indexes
+
+    def ready_indexes(self):
+        """The indexes usable right now, without waiting for a background rebuild (for reads)"""
+        return self._indexes
+
+    def wait_for_indexes(self):
+        pending = self._pending
+        if pending is not None:
+            pending.join()
+            self._pending = None
+            self._stale = []
+
+    def unique_columns(self):
+        columns = []
+        for col, constraint in self.constraints.items():
+            if getattr(constraint, 'value', constraint) in UNIQUE_CONSTRAINTS:
+                columns.append(col)
+        return columns
+
+    def sync_constraint_indexes(self):
+        """Create / drop the hash indexes backing PRIMARY KEY, UNIQUE and REFERENCES columns"""
+        self.version += 1
+        wanted = set(self.unique_columns())
+        # A referencing column that is also unique is looked up through its unique index
+        referencing = set(self.references) - wanted
+        for name, index in list(self.indexes.items()):
+            if index.constraint and index.column not in (wanted if index.unique else referencing):
+                del self.indexes[name]
+        for col in wanted:
+            self.unique_index(col)
+        for col in referencing:
+            self.reference_index(col)
+
+    def unique_index(self, column):
+        """Hash index enforcing uniqueness of column (built on first use), or None"""
+        for index in self.indexes.values():
+            if index.constraint and index.unique and index.column == column:
+                return index
+        if column not in self.unique_columns():
+            return None
+        index = HashIndex(f"{self.name}_{column}_key", column, unique=True, constraint=True)
+        index.build(self.rows)
+        self.indexes[index.name] = index
+        return index
+
+    def reference_index(self, column):
+        """
+        Hash index over a REFERENCES column (its unique index if it has one),
+        so that the rows pointing at a parent key are found without a scan
+        """
+        for index in self.indexes.values():
+            if index.constraint and index.column == column:
+                return index
+        index = HashIndex(f"{self.name}_{column}_fkey", column, constraint=True)
+        index.build(self.rows)
+        self.indexes[index.name] = index
+        return index
+
+    def cracker(self, column):
+        """The CrackerColumn of column, built afresh when a write has made the ones kept stale"""
+        if any(cracker.version != self.version for cracker in self.crackers.values()):
+            self.crackers = {}
+        if column not in self.crackers:
+            self.crackers[column] = CrackerColumn(column, self.rows, self.version)
+        return self.crackers[column]
+
+    # ---------------- Running aggregates ----------------
+
+    def column_totals(self, column):
+        """The ColumnTotals of column, started (or restarted, when they missed a write) from the rows"""
+        totals = self.totals.get(column)
+        if totals is None or totals.version != self.version:
+            numeric = getattr(self.schema[column], '__name__', None) in NUMERIC_TYPES
+            totals = self.totals[column] = ColumnTotals(column, numeric, self.version)
+            for row in self.rows:
+                totals.add(index_key(row.get(column)))
+        if totals.stale:
+            totals.refresh(index_key(row.get(column)) for row in self.rows)
+        return totals
+
+    def _tally(self, rows, added, columns=None):
+        """Bring the running totals of columns (default all) in step with rows added to or removed from the table"""
+        for column, totals in self.totals.items():
+            if columns is None or column in columns:
+                step = totals.add if added else totals.discard
+                for row in rows:
+                    step(index_key(row.get(column)))
+            totals.version = self.version
+
+    def create_index(self, name, columns, unique=False, method="BTREE", predicate=None, expressions=None):
+        """
+        CREATE [UNIQUE] INDEX: an ordered index over one or more columns, or
+        with USING BITMAP / TRIGRAM / FULLTEXT / BLOOM a bitmap, trigram,
+        full-text or Bloom index over a single column, built from the current
+        rows. With a WHERE predicate the ordered index is partial and
+        holds only the rows satisfying it. `expressions` runs parallel to
+        columns: an expression to index in place of that column (columns then
+        holds its label), or None.
+        """
+        index = self._make_index(name, columns, unique, method, predicate, expressions)
+        index.build(self.rows)
+        self.indexes[name] = index
+        return index
+
+    def _make_index(self, name, columns, unique=False, method="BTREE", predicate=None, expressions=None):
+        if isinstance(columns, str):
+            columns = [columns]
+        expressions = list(expressions) if expressions else [None] * len(columns)
+        if len(set(columns)) != len(columns):
+            raise ValueError(f"Index '{name}' lists the same column more than once")
+        for column, expression in zip(columns, expressions):
+            if expression is not None:
+                self._check_references(expression, f"The expression {column} of index '{name}'")
+                continue
+            if column not in self.schema:
+                raise ValueError(f"Column '{column}' does not exist in table '{self.name}'")
+            if getattr(self.schema[column], '__name__', None) == 'JSON':
+                raise ValueError(f"Column '{column}' of type JSON cannot be indexed")
+        if predicate is not None:
+            if method != "BTREE":
+                raise ValueError(f"{method.title()} index '{name}' cannot have a WHERE predicate")
+            self._check_references(predicate, f"The predicate of index '{name}'")
+        if method == "BTREE":
+            return OrderedIndex(name, columns, unique=unique, predicate=predicate, schema=self.schema,
+                                expressions=expressions)
+        if len(columns) != 1:
+            raise ValueError(f"{method.title()} index '{name}' must be on a single column")
+        if unique:
+            raise ValueError(f"{method.title()} index '{name}' cannot be UNIQUE")
+        if expressions[0] is not None:
+            raise ValueError(f"{method.title()} index '{name}' must be on a column, not an expression")
+        if method == "BLOOM":
+            return BloomIndex(name, columns[0])
+        if self.row_slots is None:
+            self.row_slots = RowSlots()
+            self.row_slots.build(self.rows)
+        return self.SLOT_METHODS[method](name, columns[0], self.row_slots)
+
+    def _check_references(self, expression, what):
+        """Raise ValueError if expression refers to a column this table does not have"""
+        try:
+            expression.evaluate(dict.fromkeys(self.schema), self.schema)
+        except KeyError:
+            raise ValueError(f"{what} refers to a column that does not exist in table '{self.name}'")
+        except (TypeError, ValueError, ArithmeticError):
+            # Only the column references matter here; NULL inputs may well be rejected
+            pass
+
+    def drop_index(self, name):
+        index = self.indexes[name]
+        if index.constraint:
+            raise ValueError(f"Cannot drop index '{name}' because the constraint on column '{index.column}' requires it")
+        del self.indexes[name]
+
+    def indexes_on(self, column):
+        """Indexes whose leading column is column"""
+        return [index for index in self.indexes.values() if index.column == column]
+
+    def indexes_using(self, column):
+        """Indexes that include column anywhere in their key, key expressions or predicate"""
+        from utilities import extract_identifiers
+        using = []
+        for index in self.indexes.values():
+            expressions = [expression for expression in index.expressions + (index.predicate,) if expression is not None]
+            if column in index.columns or any(column in extract_identifiers(expression) for expression in expressions):
+                using.append(index)
+        return using
+
+    def conflicting_rows(self, label, row):
+        """Existing rows that hold row's key in the unique index identified by label (column list)"""
+        for index in self.indexes.values():
+            if index.unique and index.label == label:
+                holder = index.holder_for(row)
+                return [] if holder is None else [holder]
+        return []
+
+    def dump_indexes(self):
+        """
+        Index definitions plus their contents as row positions, for the
+        database file. Each entry records the table version and row count it
+        was taken at, and a checksum, so that a stale or damaged entry is
+        rebuilt on load instead of trusted. Indexes still being rebuilt are
+        saved as bare definitions.
+        """
+        ready = self._indexes
+        position = None
+        entries = []
+        for index in list(ready.values()) + [index for index in self._stale if index.name not in ready]:
+            entry = {"name": index.name, "columns": list(index.columns), "kind": index.kind,
+                     "unique": index.unique, "constraint": index.constraint,
+                     "predicate": deep_serialize(index.predicate)}
+            if any(expression is not None for expression in index.expressions):
+                entry["expressions"] = deep_serialize(list(index.expressions))
+            if index.name in ready:
+                saved = getattr(index, 'saved', None)
+                if saved is None or saved["version"] != self.version:
+                    if position is None:
+                        position = {id(row): pos for pos, row in enumerate(self.rows)}
+                    data = index.dump(position)
+                    saved = index.saved = {"version": self.version, "rows": len(self.rows), "data": data,
+                                           "checksum": _checksum(self.version, len(self.rows), data)}
+                entry.update(saved)
+            entries.append(entry)
+        return entries
+
+    def restore_indexes(self, definitions):
+        """
+        Reinstall saved indexes over self.rows (with self.version already set).
+        Entries whose version, row count and checksum still match are loaded
+        as-is; the rest, and constraint indexes the file has no entry for, are
+        rebuilt by a background thread. Writes wait for that thread through
+        `indexes`; reads meanwhile use the indexes that are ready.
+        """
+        ready = {}
+        stale = []
+        for definition in definitions:
+            if definition.get("constraint"):
+                index = self._indexes.get(definition["name"])
+                if index is None:
+                    continue
+            else:
+                index = self._make_index(definition["name"], definition.get("columns") or definition["column"],
+                                         definition.get("unique", False), definition.get("kind", "BTREE"),
+                                         deep_deserialize(definition.get("predicate")),
+                                         deep_deserialize(definition.get("expressions")))
+            if self._load_index(index, definition):
+                ready[index.name] = index
+            else:
+                stale.append(index)
+        for name, index in self._indexes.items():
+            if name not in ready and index not in stale:
+                stale.append(index)
+        self._indexes = ready
+        if stale:
+            self._rebuild_in_background(stale)
+
+    def _load_index(self, index, definition):
+        data = definition.get("data")
+        if (data is None or definition.get("version") != self.version
+                or definition.get("rows") != len(self.rows)
+                or definition.get("checksum") != _checksum(self.version, len(self.rows), data)):
+            return False
+        try:
+            index.load(self.rows, data)
+        except (IndexError, KeyError, TypeError, ValueError):
+            return False
+        index.saved = {"version": self.version, "rows": len(self.rows), "data": data,
+                       "checksum": definition["checksum"]}
+        return True
+
+    def _rebuild_in_background(self, stale):
+        def rebuild():
+            built = {}
+            for index in stale:
+                try:
+                    index.build(self.rows)
+                except UniqueConstraintError as e:
+                    print(f"Warning: could not rebuild index '{index.name}': {e}")
+                    continue
+                built[index.name] = index
+            # Publish a new dict so that readers iterating the old one are unaffected
+            self._indexes = {**self._indexes, **built}
+
+        self._stale = stale
+        self._pending = threading.Thread(target=rebuild, name=f"rebuild-indexes-{self.name}", daemon=True)
+        self._pending.start()
+
+    def rebuild_indexes(self):
+        if self.row_slots is not None:
+            self.row_slots.build(self.rows)
+        for index in self.indexes.values():
+            index.build(self.rows)
+
+    def check_unique(self, row, exclude=None):
+        """Raise UniqueConstraintError if row would duplicate a key held by a row other than exclude"""
+        for index in self.indexes.values():
+            if index.unique and index.holder_for(row, exclude) is not None:
+                raise UniqueConstraintError(index.label, index.exact_value(row))
+
+    # ---------------- Clustering ----------------
+
+    def cluster_by(self, column):
+        """
+        CLUSTER ... BY / CLUSTERED BY: sort self.rows by column (NULLs first,
+        equal keys in their current order) and keep them sorted from now on,
+        so that a range of the column is one slice found by binary search.
+        """
+        if column not in self.schema:
+            raise ValueError(f"Column '{column}' does not exist in table '{self.name}'")
+        if getattr(self.schema[column], '__name__', None) == 'JSON':
+            raise ValueError(f"Table '{self.name}' cannot be clustered by column '{column}' of type JSON")
+        if self.partitioning is not None:
+            raise ValueError(f"Table '{self.name}' is partitioned, so it cannot be clustered")
+        self.cluster_key = column
+        self.version += 1
+        self.rows.sort(key=self.cluster_key_of)
+        if self.row_slots is not None:
+            # Renumber the slots so that bitmap results come back in the new order too
+            self._renumber_slots()
+
+    def cluster_key_of(self, row):
+        """Position key of row in a clustered table: its ordered key, NULL_KEY for NULL"""
+        key = cell_ordered_key(row.get(self.cluster_key))
+        return NULL_KEY if key is None else key
+
+    def cluster_slice(self, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        """
+        (start, stop) of the rows of a clustered table whose key lies in the
+        range, bounds given in ordered_key space. A missing bound is open, but
+        NULLs never fall in the range.
+        """
+        key = self.cluster_key_of
+        if low is None:
+            start = bisect_right(self.rows, NULL_KEY, key=key)
+        elif low_inclusive:
+            start = bisect_left(self.rows, low, key=key)
+        else:
+            start = bisect_right(self.rows, low, key=key)
+        if high is None:
+            stop = len(self.rows)
+        elif high_inclusive:
+            stop = bisect_right(self.rows, high, key=key)
+        else:
+            stop = bisect_left(self.rows, high, key=key)
+        return start, max(start, stop)
+
+    # ---------------- Partitioning ----------------
+
+    def partition_by(self, kind, column, definitions):
+        """
+        PARTITION BY RANGE (col) / HASH (col): lay self.rows out partition by
+        partition. For RANGE, definitions are (name, VALUES LESS THAN value or
+        None for MAXVALUE) in ascending order; for HASH, the partition names.
+        """
+        if column not in self.schema:
+            raise ValueError(f"Column '{column}' does not exist in table '{self.name}'")
+        if getattr(self.schema[column], '__name__', None) == 'JSON':
+            raise ValueError(f"Table '{self.name}' cannot be partitioned by column '{column}' of type JSON")
+        if self.cluster_key is not None:
+            raise ValueError(f"Table '{self.name}' is clustered, so it cannot be partitioned")
+        if not definitions:
+            raise ValueError(f"Table '{self.name}' needs at least one partition")
+        if kind == "HASH":
+            partitioning = Partitioning(kind, column, [Partition(name) for name in definitions])
+        else:
+            partitioning = Partitioning(kind, column, [])
+            for name, value in definitions:
+                partitioning.add(name, self.partition_bound(column, value))
+        if len({partition.name for partition in partitioning.partitions}) != len(partitioning.partitions):
+            raise ValueError(f"Table '{self.name}' lists the same partition more than once")
+        numbers = [self._partition_number(row, partitioning) for row in self.rows]
+        self.partitioning = partitioning
+        self.version += 1
+        for number in numbers:
+            partitioning.partitions[number].size += 1
+        # Stable, so rows keep their order within each partition
+        order = sorted(range(len(self.rows)), key=numbers.__getitem__)
+        self.rows[:] = [self.rows[position] for position in order]
+        if self.row_slots is not None:
+            self._renumber_slots()
+
+    def partition_bound(self, column, value):
+        """Ordered key of a VALUES LESS THAN value of column (None for MAXVALUE)"""
+        if value is None:
+            return None
+        return cell_ordered_key(self.schema[column](value))
+
+    def add_partition(self, name, value):
+        """ALTER TABLE ... ADD PARTITION name VALUES LESS THAN (value): a new, empty RANGE partition on top"""
+        if self.partitioning is None:
+            raise ValueError(f"Table '{self.name}' is not partitioned")
+        self.partitioning.add(name, self.partition_bound(self.partitioning.column, value))
+        self.version += 1
+
+    def partition_rows(self, name):
+        """The rows of the partition called name"""
+        if self.partitioning is None:
+            raise ValueError(f"Table '{self.name}' is not partitioned")
+        start, stop = self.partitioning.span(self.partitioning.number(name))
+        return self.rows[start:stop]
+
+    def drop_partition(self, name):
+        """
+        ALTER TABLE ... DROP PARTITION: remove a RANGE partition and its rows,
+        taken out as one slice of self.rows with nothing evaluated on them and
+        no other partition visited. When it held most of the table, the
+        indexes are rebuilt from the remaining rows rather than having each
+        dropped row taken out. Returns the dropped rows.
+        """
+        if self.partitioning is None:
+            raise ValueError(f"Table '{self.name}' is not partitioned")
+        number = self.partitioning.number(name)
+        start, stop = self.partitioning.span(number)
+        self.partitioning.drop(number)
+        doomed = self.rows[start:stop]
+        self.version += 1
+        del self.rows[start:stop]
+        if len(doomed) > len(self.rows):
+            self.totals = {}
+            self.rebuild_indexes()
+            return doomed
+        self._tally(doomed, False)
+        for index in self.indexes.values():
+            for row in doomed:
+                index.discard(row)
+        if self.row_slots is not None:
+            for row in doomed:
+                self.row_slots.discard(row)
+            if self.row_slots.fragmented():
+                self._renumber_slots()
+        self._refresh_filters()
+        return doomed
+
+    def _partition_number(self, row, partitioning=None):
+        """Number of the partition row belongs to; ValueError when no partition takes its key"""
+        partitioning = partitioning or self.partitioning
+        number = partitioning.number_of_row(row)
+        if number is None:
+            value = getattr(row.get(partitioning.column), 'value', None)
+            raise ValueError(f"No partition of table '{self.name}' holds {partitioning.column} = {value}")
+        return number
+
+    def _place(self, row, partition=None):
+        """
+        Add row to self.rows: at the end of its partition (number `partition`)
+        when the table is partitioned, after the rows with a key not above its
+        own when it is clustered
+        """
+        if partition is not None:
+            target = self.partitioning.partitions[partition]
+            stop = self.partitioning.span(partition)[1]
+            self.rows.insert(stop, row)
+            target.size += 1
+            return
+        if self.cluster_key is None:
+            self.rows.append(row)
+            return
+        key = self.cluster_key_of(row)
+        if not self.rows or not key < self.cluster_key_of(self.rows[-1]):
+            # Appending in key order (a SERIAL id, a timestamp) is the common case
+            self.rows.append(row)
+        else:
+            self.rows.insert(bisect_right(self.rows, key, key=self.cluster_key_of), row)
+
+    # ---------------- Row mutation ----------------
+    # All writes go through these so every index stays in step with self.rows
+
+    def insert_row(self, row):
+        partition = self._partition_number(row) if self.partitioning is not None else None
+        self.check_unique(row)
+        self.version += 1
+        self._tally([row], True)
+        if self.row_slots is not None:
+            self.row_slots.add(row)
+        for index in self.indexes.values():
+            index.add(row)
+        self._place(row, partition)
+        self._refresh_filters()
+
+    def update_row(self, row, new_values):
+        """Apply new_values to row in place; nothing is modified if a unique key would collide"""
+        updated = dict(row)
+        updated.update(new_values)
+        partition = moved_to = None
+        if self.partitioning is not None:
+            partition = self._partition_number(row)
+            moved_to = self._partition_number(updated)
+        self.check_unique(updated, exclude=row)
+        self.version += 1
+        self._tally([row], False, new_values)
+        changed = [index for index in self.indexes.values()
+                   if index.key_of(row) != index.key_of(updated)
+                   or (index.predicate is not None and index.covers(row) != index.covers(updated))]
+        for index in changed:
+            index.discard(row)
+        moved = (partition != moved_to or
+                 self.cluster_key is not None and self.cluster_key_of(row) != self.cluster_key_of(updated))
+        if moved:
+            del self.rows[self._position(row)]
+        if partition is not None and moved:
+            self.partitioning.partitions[partition].size -= 1
+        row.update(new_values)
+        self._tally([row], True, new_values)
+        for index in changed:
+            index.add(row)
+        if moved:
+            self._place(row, moved_to)
+        self._refresh_filters()
+
+    def delete_rows(self, doomed):
+        if not doomed:
+            return
+        self.version += 1
+        self._tally(doomed, False)
+        for index in self.indexes.values():
+            for row in doomed:
+                index.discard(row)
+        if self.row_slots is not None:
+            for row in doomed:
+                self.row_slots.discard(row)
+        if self.partitioning is not None:
+            self._delete_partitioned(doomed)
+        elif len(doomed) <= self.SMALL_DELETE:
+            # A few rows (typically found through an index): locate each one instead of rebuilding the list
+            for row in doomed:
+                del self.rows[self._position(row)]
+        else:
+            doomed_ids = {id(row) for row in doomed}
+            self.rows[:] = [row for row in self.rows if id(row) not in doomed_ids]
+        if self.row_slots is not None and self.row_slots.fragmented():
+            # Mostly holes: renumber the slots and rebuild the bitsets over them
+            self._renumber_slots()
+        self._refresh_filters()
+
+    def _delete_partitioned(self, doomed):
+        """Take doomed out of self.rows, visiting only the partitions that hold them"""
+        by_partition = {}
+        for row in doomed:
+            by_partition.setdefault(self._partition_number(row), []).append(row)
+        for number, rows in by_partition.items():
+            partition = self.partitioning.partitions[number]
+            if len(rows) <= self.SMALL_DELETE:
+                for row in rows:
+                    del self.rows[self._position(row)]
+                    partition.size -= 1
+                continue
+            start, stop = self.partitioning.span(number)
+            doomed_ids = {id(row) for row in rows}
+            self.rows[start:stop] = [row for row in self.rows[start:stop] if id(row) not in doomed_ids]
+            partition.size -= len(rows)
+
+    def _renumber_slots(self):
+        self.row_slots.build(self.rows)
+        for index in self.indexes.values():
+            if index.kind in self.SLOT_METHODS:
+                index.build(self.rows)
+
+    def _refresh_filters(self):
+        """Rebuild the Bloom indexes that are over capacity or mostly bits of deleted rows"""
+        for index in self.indexes.values():
+            if index.kind == "BLOOM" and index.needs_rebuild():
+                index.build(self.rows)
+
+    def _position(self, row):
+        # Identity search that stays in C (list.index() would call SQLType.__eq__ on every cell);
+        # in a clustered table only the rows sharing row's key need searching
+        start = 0
+        rows = self.rows
+        if self.partitioning is not None:
+            start, stop = self.partitioning.span(self._partition_number(row))
+            rows = rows[start:stop]
+        elif self.cluster_key is not None:
+            key = self.cluster_key_of(row)
+            start, stop = self.cluster_slice(key, key)
+            rows = rows[start:stop]
+        return start + next(compress(count(), map(is_, rows, repeat(row))))
+
+    def truncate(self):
+        indexes = self.indexes
+        self.version += 1
+        self.rows = []
+        self.totals = {}
+        if self.partitioning is not None:
+            for partition in self.partitioning.partitions:
+                partition.size = 0
+        if self.row_slots is not None:
+            self.row_slots.build(self.rows)
+        for index in indexes.values():
+            index.clear()
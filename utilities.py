@@ -49,6 +49,8 @@ def extract_identifiers(expr):
         return extract_identifiers(expr.expression)
     elif isinstance(expr, Extract):
         return extract_identifiers(expr.expression)
+    elif isinstance(expr, JsonExtract):
+        return extract_identifiers(expr.expression)
     elif isinstance(expr, CaseWhen):
         ids = []
         for exp in expr.expressions:
@@ -72,6 +74,13 @@ def extract_identifiers(expr):
         ids = extract_identifiers(expr.expression)
         ids.extend(extract_identifiers(expr.pattern_expression))
         return ids
+    elif isinstance(expr, Match):
+        return extract_identifiers(expr.expression)
+    elif isinstance(expr, RowValue):
+        ids = []
+        for item in expr.items:
+            ids.extend(extract_identifiers(item))
+        return ids
     elif isinstance(expr, IsNullCondition):
         return extract_identifiers(expr.expression)
     elif isinstance(expr, NegationCondition):
@@ -180,7 +189,9 @@ def generate_schema(rows):
         sample_val = samples[0]
         
         # Important: Check bool BEFORE int because isinstance(True, int) returns True in Python!
-        if isinstance(sample_val, bool):
+        if isinstance(sample_val, TemporalValue):
+            schema[col] = temporal_types[type(sample_val)]
+        elif isinstance(sample_val, bool):
             schema[col] = BOOLEAN
         elif isinstance(sample_val, int):
             schema[col] = INT